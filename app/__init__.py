@@ -3,10 +3,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
 from config import Config
+from app.services.database import RoutingSession
 import os
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
 
@@ -19,17 +20,29 @@ def create_app(config_class=Config):
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Initialize extensions with app
+    from app.services import database
+    database.init_app(app)
     db.init_app(app)
+    database.init_engines(app)
     login_manager.init_app(app)
     mail.init_app(app)
     
+    from app.services import assets, cache, metrics, portfolio, query_budget, scheduler, search
+    query_budget.init_app(app)
+    metrics.init_app(app)
+    cache.init_app(app)
+    portfolio.init_app(app)
+    assets.init_app(app)
+    search.init_app(app)
+    
     # Login manager configuration
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
     # Register blueprints
-    from app.routes import auth, main, properties, tenants, leases, payments, maintenance
+    from app.routes import auth, main, properties, tenants, leases, payments, maintenance, imports, notifications, reports
+    from app.routes import assets as asset_routes, metrics as metrics_routes, search as search_routes
     
     app.register_blueprint(auth.bp)
     app.register_blueprint(main.bp)
@@ -38,14 +51,26 @@ def create_app(config_class=Config):
     app.register_blueprint(leases.bp)
     app.register_blueprint(payments.bp)
     app.register_blueprint(maintenance.bp)
+    app.register_blueprint(imports.bp)
+    app.register_blueprint(notifications.bp)
+    app.register_blueprint(reports.bp)
+    app.register_blueprint(search_routes.bp)
+    app.register_blueprint(asset_routes.bp)
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_routes.bp)
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
     # Create database tables
     with app.app_context():
         db.create_all()
         
-        # Create default admin user if doesn't exist
+        # Create default admin user if doesn't exist (only the id is selected, so
+        # databases still missing newer columns load until `flask upgrade-db`)
         from app.models import User
-        admin = User.query.filter_by(email='admin@rental.com').first()
+        admin = db.session.scalar(db.select(User.id).where(User.email == 'admin@rental.com'))
         if not admin:
             admin = User(
                 username='admin',
@@ -57,6 +82,9 @@ def create_app(config_class=Config):
             db.session.commit()
             print("✅ Default admin created: admin@rental.com / admin123")
     
+    # Start scheduled jobs once the tables exist
+    scheduler.init_app(app)
+    
     return app
 
 # User loader for Flask-Login
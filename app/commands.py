@@ -0,0 +1,397 @@
+import click
+import functools
+from app import db
+from app.services.database import write_transactions
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, CreateTable
+
+def create_missing_indexes():
+    """Create any index declared on the models that the database lacks.
+
+    db.create_all() only creates missing tables, so databases created before an
+    index was declared need this to pick it up. Returns the names created.
+    """
+    created = []
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+def create_missing_columns():
+    """Add columns declared on the models that existing tables lack.
+
+    Only meant for new nullable columns without defaults, which is all
+    ALTER TABLE ADD COLUMN can add portably. Returns the names added.
+    """
+    created = []
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                created.append(f'{table.name}.{column.name}')
+    return created
+
+def _stale_foreign_keys(inspector, table):
+    """(declared constraint, existing name) for foreign keys whose ON DELETE action differs in the database"""
+    existing = {tuple(fk['constrained_columns']): (fk['name'], (fk.get('options') or {}).get('ondelete'))
+                for fk in inspector.get_foreign_keys(table.name)}
+    stale = []
+    for constraint in table.foreign_key_constraints:
+        name, ondelete = existing.get(tuple(column.name for column in constraint.columns), (None, None))
+        if (ondelete or '').upper() != (constraint.ondelete or '').upper():
+            stale.append((constraint, name))
+    return stale
+
+def _rebuild_sqlite_tables(tables):
+    """Recreate `tables` from the models with their rows, indexes and search triggers.
+
+    SQLite cannot alter a constraint: each table is created anew, filled from
+    the old one and renamed over it, in one transaction with foreign keys off.
+    The search triggers name other tables, so they are dropped meanwhile.
+    Returns the rows PRAGMA foreign_key_check reports afterwards.
+    """
+    from app.services.search import create_triggers, drop_triggers, index_ready
+    searchable = index_ready()
+    with db.engine.connect() as connection:
+        # Ignored inside a transaction, so set on the driver connection before BEGIN
+        driver_connection = connection.connection.driver_connection
+        driver_connection.execute('PRAGMA foreign_keys = OFF')
+        try:
+            with connection.begin():
+                drop_triggers(connection)
+                for table in tables:
+                    columns = ', '.join(column.name for column in table.columns)
+                    ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+                    connection.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ',
+                                                           f'CREATE TABLE {table.name}_rebuild ', 1))
+                    connection.exec_driver_sql(f'INSERT INTO {table.name}_rebuild ({columns}) '
+                                               f'SELECT {columns} FROM {table.name}')
+                    connection.exec_driver_sql(f'DROP TABLE {table.name}')
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name}_rebuild RENAME TO {table.name}')
+                    for index in table.indexes:
+                        index.create(connection)
+                if searchable:
+                    create_triggers(connection)
+                return connection.exec_driver_sql('PRAGMA foreign_key_check').all()
+        finally:
+            driver_connection.execute('PRAGMA foreign_keys = ON')
+
+def update_foreign_keys():
+    """Give existing foreign keys the ON DELETE actions declared on the models.
+
+    SQLite tables are rebuilt (see _rebuild_sqlite_tables); other databases
+    drop and re-add the constraint. Returns the tables changed and the rows
+    whose parent row no longer exists, which the database will not check
+    until they are written.
+    """
+    inspector = db.inspect(db.engine)
+    stale = {table: _stale_foreign_keys(inspector, table)
+             for table in db.metadata.sorted_tables if inspector.has_table(table.name)}
+    stale = {table: constraints for table, constraints in stale.items() if constraints}
+    if not stale:
+        return [], []
+    if db.engine.dialect.name == 'sqlite':
+        return [table.name for table in stale], _rebuild_sqlite_tables(list(stale))
+    with db.engine.begin() as connection:
+        for table, constraints in stale.items():
+            for constraint, name in constraints:
+                if name:
+                    connection.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT {name}'))
+                connection.execute(AddConstraint(constraint))
+    return [table.name for table in stale], []
+
+def writes(command):
+    """Run a command's transactions with BEGIN IMMEDIATE, like requests that write"""
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        with write_transactions():
+            return command(*args, **kwargs)
+    return wrapper
+
+def register_commands(app):
+    """Register the management commands on the Flask CLI"""
+
+    @app.cli.command('create-indexes')
+    @writes
+    def create_indexes_command():
+        """Add declared indexes to an existing database."""
+        created = create_missing_indexes()
+        for name in created:
+            click.echo(f'Created {name}')
+        click.echo(f'{len(created)} index(es) created.')
+    
+    @app.cli.command('upgrade-db')
+    @writes
+    def upgrade_db_command():
+        """Add declared columns, indexes and foreign key actions to an existing database."""
+        for name in create_missing_columns():
+            click.echo(f'Added column {name}')
+        tables, orphans = update_foreign_keys()
+        for name in tables:
+            click.echo(f'Updated foreign keys of {name}')
+        if orphans:
+            click.echo(f'Warning: {len(orphans)} row(s) point to deleted rows; '
+                       f'see PRAGMA foreign_key_check', err=True)
+        for name in create_missing_indexes():
+            click.echo(f'Created {name}')
+        from app.services.notifications import recount_unread
+        recount_unread()
+        from app.services.portfolio import rebuild_summaries, summaries_missing
+        if summaries_missing():
+            click.echo(f'Rebuilt portfolio summaries for {rebuild_summaries()} owner(s)')
+        db.session.commit()  # end the check's transaction; the search index uses its own connection
+        from app.services.search import index_ready, rebuild_index
+        if not index_ready():
+            indexed = rebuild_index()
+            if indexed is not None:
+                click.echo(f'Created search index ({indexed} document(s))')
+        click.echo('Database is up to date.')
+    
+    @app.cli.command('rebuild-summaries')
+    @writes
+    def rebuild_summaries_command():
+        """Recompute portfolio_summaries from the source tables."""
+        from app.services.portfolio import rebuild_summaries
+        count = rebuild_summaries()
+        click.echo(f'Rebuilt portfolio summaries for {count} owner(s).')
+    
+    @app.cli.command('rebuild-search-index')
+    @writes
+    def rebuild_search_index_command():
+        """Recreate the full-text search index and its triggers from the source tables."""
+        from app.services.search import rebuild_index
+        indexed = rebuild_index()
+        if indexed is None:
+            raise click.ClickException('This database has no FTS5 support; search uses LIKE queries instead.')
+        click.echo(f'Indexed {indexed} document(s).')
+    
+    @app.cli.command('import-data')
+    @click.argument('kind', type=click.Choice(['properties', 'tenants', 'leases', 'payments']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--owner', 'owner_email', help='Import into this owner\'s portfolio only.')
+    @click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+                  help='Write every rejected row to this CSV file.')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows per batch transaction.')
+    @writes
+    def import_data_command(kind, path, owner_email, errors_path, chunk_size):
+        """Bulk import records from a CSV or XLSX file."""
+        import csv
+        from app.models import User
+        from app.services.importer import ImportReport, import_file
+        
+        owner_id = None
+        if owner_email:
+            owner = User.query.filter_by(email=owner_email).first()
+            if owner is None:
+                raise click.ClickException(f'No user with email {owner_email}')
+            owner_id = owner.id
+        
+        errors_file = open(errors_path, 'w', newline='') if errors_path else None
+        try:
+            writer = None
+            if errors_file:
+                writer = csv.writer(errors_file)
+                writer.writerow(['row', 'error'])
+            with open(path, 'rb') as stream:
+                report = import_file(kind, stream, path, owner_id=owner_id,
+                                     report=ImportReport(error_writer=writer), chunk_size=chunk_size)
+        finally:
+            if errors_file:
+                errors_file.close()
+        
+        click.echo(f'Imported {report.imported} {kind}, {report.failed} row(s) rejected.')
+        if not errors_path:
+            for row_number, message in report.errors[:20]:
+                click.echo(f'  row {row_number}: {message}')
+            if report.failed > 20:
+                click.echo('  ... use --errors FILE for the full report')
+    
+    @app.cli.command('generate-invoices')
+    @click.option('--date', 'run_date', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='Generate as if today were this date.')
+    @click.option('--lead-days', type=int, help='Invoice rent falling due within this many days.')
+    def generate_invoices_command(run_date, lead_days):
+        """Create pending payments for rent coming due on active leases."""
+        from app.services.invoicing import generate_invoices
+        from app.services.scheduler import run_job
+        run = run_job('generate_invoices', generate_invoices, today=run_date.date() if run_date else None,
+                      lead_days=lead_days if lead_days is not None else app.config['INVOICE_LEAD_DAYS'])
+        if run is None:
+            raise click.ClickException('Another worker is generating invoices right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Invoice generation failed: {run.error}')
+        click.echo(f'Created {run.rows_affected} invoice(s) in {run.duration_ms:.0f} ms.')
+    
+    @app.cli.command('sweep')
+    @click.option('--date', 'run_date', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='Sweep as if today were this date.')
+    def sweep_command(run_date):
+        """Expire ended leases, mark late payments overdue and reconcile property status."""
+        import json
+        from app.services.scheduler import run_job
+        from app.services.sweeper import sweep
+        run = run_job('sweep', sweep, today=run_date.date() if run_date else None,
+                      notice_days=app.config.get('LEASE_EXPIRY_NOTICE_DAYS', 30))
+        if run is None:
+            raise click.ClickException('Another worker is sweeping right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Sweep failed: {run.error}')
+        for step, count in json.loads(run.details).items():
+            click.echo(f'{step}: {count}')
+        click.echo(f'Done in {run.duration_ms:.0f} ms.')
+    
+    @app.cli.command('deliver-email')
+    def deliver_email_command():
+        """Send the emails waiting in the outbox."""
+        from app.services.outbox import deliver_outbox
+        from app.services.scheduler import run_job
+        run = run_job('deliver_email', deliver_outbox)
+        if run is None:
+            raise click.ClickException('Another worker is delivering email right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Delivery failed: {run.error}')
+        click.echo(run.details)
+    
+    @app.cli.command('mail-worker')
+    @click.option('--interval', default=5, show_default=True, help='Seconds to wait when the outbox is empty.')
+    def mail_worker_command(interval):
+        """Drain the email outbox continuously (run as its own process)."""
+        import time
+        from app.services.scheduler import deliver_email_job
+        click.echo('Mail worker started; Ctrl+C to stop.')
+        while True:
+            run = deliver_email_job()
+            handled = run.rows_affected if run is not None else 0
+            db.session.remove()
+            if not handled:
+                time.sleep(interval)
+    
+    @app.cli.command('smtp-sink')
+    @click.option('--host', default='localhost', show_default=True)
+    @click.option('--port', default=1025, show_default=True)
+    def smtp_sink_command(host, port):
+        """Run a local SMTP server that prints every message it receives."""
+        from app.services.smtp_sink import SMTPSink
+        
+        def show(message):
+            click.echo(f'--- To: {message["To"]}  Subject: {message["Subject"]}')
+            click.echo(message.get_payload(decode=True).decode(errors='replace'))
+        
+        click.echo(f'SMTP sink listening on {host}:{port}; Ctrl+C to stop.')
+        with SMTPSink(host, port, on_message=show) as server:
+            server.serve_forever()
+    
+    @app.cli.command('image-worker')
+    @click.option('--interval', default=5, show_default=True, help='Seconds to wait when no photo is pending.')
+    def image_worker_command(interval):
+        """Render uploaded property photos continuously (run as its own process)."""
+        import time
+        from app.services.scheduler import process_images_job
+        click.echo('Image worker started; Ctrl+C to stop.')
+        while True:
+            run = process_images_job()
+            handled = run.rows_affected if run is not None else 0
+            db.session.remove()
+            if not handled:
+                time.sleep(interval)
+    
+    @app.cli.command('process-images')
+    @click.option('--adopt-legacy', is_flag=True, help='First move photos uploaded before the image pipeline into it.')
+    @writes
+    def process_images_command(adopt_legacy):
+        """Render the renditions of every pending property photo."""
+        from app.services.images import adopt_legacy_images, process_pending_images
+        from app.services.scheduler import run_job
+        if adopt_legacy:
+            click.echo(f'Adopted {adopt_legacy_images()} legacy photo(s).')
+        run = run_job('process_images', process_pending_images, max_batches=None)
+        if run is None:
+            raise click.ClickException('Another worker is processing images right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Processing failed: {run.error}')
+        click.echo(run.details)
+    
+    @app.cli.command('collect-images')
+    @click.option('--grace-hours', default=1, show_default=True, help='Keep files used more recently than this.')
+    def collect_images_command(grace_hours):
+        """Delete photo files that no property references any more."""
+        from datetime import timedelta
+        from app.services.images import collect_garbage
+        from app.services.scheduler import run_job
+        run = run_job('collect_images', collect_garbage, grace=timedelta(hours=grace_hours))
+        if run is None:
+            raise click.ClickException('Another worker is collecting images right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Collection failed: {run.error}')
+        click.echo(run.details)
+    
+    @app.cli.command('remove-files')
+    def remove_files_command():
+        """Delete the receipts and photos queued by deleted rows."""
+        from app.services.deletion import remove_files
+        from app.services.scheduler import run_job
+        run = run_job('remove_files', remove_files)
+        if run is None:
+            raise click.ClickException('Another worker is removing files right now.')
+        if run.status != 'success':
+            raise click.ClickException(f'Removal failed: {run.error}')
+        click.echo(run.details)
+    
+    @app.cli.command('delete-user')
+    @click.argument('email')
+    @click.confirmation_option(prompt='Delete this user with all their properties, leases and payments?')
+    @writes
+    def delete_user_command(email):
+        """Delete a user with everything they own or rent."""
+        from app.models import User
+        from app.services.deletion import delete_user
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}')
+        batched = delete_user(user)
+        click.echo(f'Deleted {email}' + (' (history removed in batches).' if batched else '.'))
+    
+    @app.cli.command('build-assets')
+    @click.option('--check', is_flag=True, help='Only verify that the committed bundle matches the templates.')
+    def build_assets_command(check):
+        """Build the fingerprinted CSS and icon bundle into app/static/dist."""
+        from app.services.assets import AssetError, build
+        try:
+            manifest, unknown = build(check=check)
+        except AssetError as e:
+            raise click.ClickException(str(e))
+        for name in unknown:
+            click.echo(f'Warning: no style for class {name}', err=True)
+        for name, filename in sorted(manifest.items()):
+            click.echo(f'{name} -> {filename}')
+        click.echo('Bundle is up to date.' if check else 'Bundle built.')
+    
+    @app.cli.command('sync-replica')
+    @click.option('--interval', type=int, help='Keep copying every this many seconds, to mimic replication lag.')
+    def sync_replica_command(interval):
+        """Copy the primary SQLite database to the replica file (local testing of DATABASE_REPLICA_URL)."""
+        import time
+        from app.services.database import REPLICA_BIND, copy_to_replica
+        if REPLICA_BIND not in db.engines:
+            raise click.ClickException('DATABASE_REPLICA_URL is not set.')
+        while True:
+            try:
+                copy_to_replica()
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            click.echo(f'Copied the primary to {db.engines[REPLICA_BIND].url.database}.')
+            if not interval:
+                return
+            time.sleep(interval)
@@ -15,12 +15,17 @@ class User(UserMixin, db.Model):
     phone = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    unread_notifications = db.Column(db.Integer, default=0)  # maintained by services.notifications
     
     # Relationships
-    properties = db.relationship('Property', backref='owner', lazy=True, cascade='all, delete-orphan')
+    # Dependent rows are deleted (or unassigned) by the database's ON DELETE actions
+    properties = db.relationship('Property', backref='owner', lazy=True, cascade='all, delete-orphan',
+                                 passive_deletes=True)
     maintenance_requests = db.relationship('MaintenanceRequest', backref='assigned_staff', lazy=True,
-                                          foreign_keys='MaintenanceRequest.assigned_staff_id')
-    notifications = db.relationship('Notification', backref='user', lazy=True, cascade='all, delete-orphan')
+                                          foreign_keys='MaintenanceRequest.assigned_staff_id',
+                                          passive_deletes=True)
+    notifications = db.relationship('Notification', backref='user', lazy=True, cascade='all, delete-orphan',
+                                    passive_deletes=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -34,25 +39,32 @@ class User(UserMixin, db.Model):
 class Property(db.Model):
     """Property model"""
     __tablename__ = 'properties'
+    __table_args__ = (
+        db.Index('ix_properties_owner_status', 'owner_id', 'availability_status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     property_type = db.Column(db.String(50), nullable=False)
     address = db.Column(db.String(200), nullable=False)
-    city = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False, index=True)
     state = db.Column(db.String(100), nullable=False)
     rent_amount = db.Column(db.Float, nullable=False)
-    availability_status = db.Column(db.String(20), default='available')
+    availability_status = db.Column(db.String(20), default='available', index=True)
     description = db.Column(db.Text)
     bedrooms = db.Column(db.Integer)
     bathrooms = db.Column(db.Integer)
     area_sqft = db.Column(db.Float)
     image_path = db.Column(db.String(200))
+    image_hash = db.Column(db.String(64), db.ForeignKey('images.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    leases = db.relationship('Lease', backref='property', lazy=True, cascade='all, delete-orphan')
-    maintenance_requests = db.relationship('MaintenanceRequest', backref='property', lazy=True)
+    leases = db.relationship('Lease', backref='property', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
+    maintenance_requests = db.relationship('MaintenanceRequest', backref='property', lazy=True,
+                                           cascade='all, delete-orphan', passive_deletes=True)
+    image = db.relationship('StoredImage')
     
     def __repr__(self):
         return f'<Property {self.address}>'
@@ -62,16 +74,20 @@ class Tenant(db.Model):
     __tablename__ = 'tenants'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     national_id = db.Column(db.String(50), nullable=False)
     emergency_contact = db.Column(db.String(100))
     occupation = db.Column(db.String(100))
     move_in_date = db.Column(db.Date)
     
     # Relationships
-    user = db.relationship('User', backref='tenant_profile', foreign_keys=[user_id])
-    leases = db.relationship('Lease', backref='tenant', lazy=True, cascade='all, delete-orphan')
-    maintenance_requests = db.relationship('MaintenanceRequest', backref='tenant_relation', lazy=True)
+    user = db.relationship('User', foreign_keys=[user_id],
+                           backref=db.backref('tenant_profile', cascade='all, delete-orphan',
+                                              passive_deletes=True))
+    leases = db.relationship('Lease', backref='tenant', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
+    maintenance_requests = db.relationship('MaintenanceRequest', backref='tenant_relation', lazy=True,
+                                           cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Tenant {self.user.username}>'
@@ -79,20 +95,26 @@ class Tenant(db.Model):
 class Lease(db.Model):
     """Lease agreement model"""
     __tablename__ = 'leases'
+    __table_args__ = (
+        db.Index('ix_leases_property_status', 'property_id', 'status'),
+        db.Index('ix_leases_status_end_date', 'status', 'end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id', ondelete='CASCADE'), nullable=False)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False, index=True)
     start_date = db.Column(db.Date, nullable=False)
-    end_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False, index=True)
     monthly_rent = db.Column(db.Float, nullable=False)
     security_deposit = db.Column(db.Float)
     terms_conditions = db.Column(db.Text)
     status = db.Column(db.String(20), default='active')
+    expiry_notice_for = db.Column(db.Date)  # end_date the expiry notification was sent for
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    payments = db.relationship('Payment', backref='lease', lazy=True, cascade='all, delete-orphan')
+    payments = db.relationship('Payment', backref='lease', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
     
     def __repr__(self):
         return f'<Lease {self.id}>'
@@ -100,16 +122,25 @@ class Lease(db.Model):
 class Payment(db.Model):
     """Payment model"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_lease_status', 'lease_id', 'status'),
+        db.Index('ix_payments_status_due_date', 'status', 'due_date'),
+        # Covers the reports' scans over a due-date range without visiting the table
+        db.Index('ix_payments_due_date_report', 'due_date', 'lease_id', 'status', 'amount', 'paid_date'),
+        # One generated invoice per lease and billing period; manual payments leave period empty
+        db.Index('uq_payments_lease_period', 'lease_id', 'period', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    lease_id = db.Column(db.Integer, db.ForeignKey('leases.id'), nullable=False)
+    lease_id = db.Column(db.Integer, db.ForeignKey('leases.id', ondelete='CASCADE'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
-    due_date = db.Column(db.Date)
+    due_date = db.Column(db.Date, index=True)
+    period = db.Column(db.Date)  # first day of the billing month, set on generated invoices
     paid_date = db.Column(db.Date)
     payment_method = db.Column(db.String(50))
     status = db.Column(db.String(20), default='pending')
     receipt_path = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<Payment {self.id}>'
@@ -117,16 +148,20 @@ class Payment(db.Model):
 class MaintenanceRequest(db.Model):
     """Maintenance request model"""
     __tablename__ = 'maintenance_requests'
+    __table_args__ = (
+        db.Index('ix_maintenance_requests_property_status', 'property_id', 'status'),
+        db.Index('ix_maintenance_requests_status_created_at', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
-    assigned_staff_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id', ondelete='CASCADE'), nullable=False)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False, index=True)
+    assigned_staff_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
     request_type = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     priority = db.Column(db.String(20), default='medium')
     status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     resolved_at = db.Column(db.DateTime)
     
     def __repr__(self):
@@ -135,13 +170,125 @@ class MaintenanceRequest(db.Model):
 class Notification(db.Model):
     """Notification model"""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read'),
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     notification_type = db.Column(db.String(50), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Notification {self.id}>'
\ No newline at end of file
+        return f'<Notification {self.id}>'
+
+class PortfolioSummary(db.Model):
+    """Per-owner dashboard counters, maintained incrementally by app.services.portfolio"""
+    __tablename__ = 'portfolio_summaries'
+    
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_properties = db.Column(db.Integer, nullable=False, default=0)
+    available_properties = db.Column(db.Integer, nullable=False, default=0)
+    occupied_properties = db.Column(db.Integer, nullable=False, default=0)
+    active_leases = db.Column(db.Integer, nullable=False, default=0)
+    total_rent = db.Column(db.Float, nullable=False, default=0)
+    pending_payments = db.Column(db.Integer, nullable=False, default=0)
+    pending_maintenance = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PortfolioSummary {self.owner_id}>'
+
+class JobLock(db.Model):
+    """Lease-style lock so a scheduled job runs in one worker at a time"""
+    __tablename__ = 'job_locks'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(200))
+    locked_until = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<JobLock {self.name}>'
+
+class JobRun(db.Model):
+    """One execution of a scheduled job"""
+    __tablename__ = 'job_runs'
+    __table_args__ = (
+        db.Index('ix_job_runs_job_started', 'job_name', 'started_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    rows_affected = db.Column(db.Integer)
+    details = db.Column(db.Text)  # JSON breakdown of rows_affected, for jobs that report one
+    error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<JobRun {self.job_name} {self.started_at}>'
+
+class OutboxEmail(db.Model):
+    """Email queued in the same transaction as the change that triggered it, sent by the mail worker"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<OutboxEmail {self.id} {self.status}>'
+
+class StoredImage(db.Model):
+    """Uploaded photo stored once per SHA-256 of its content, with resized renditions"""
+    __tablename__ = 'images'
+    __table_args__ = (
+        db.Index('ix_images_status_created', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.String(64), primary_key=True)  # hex SHA-256 of the original
+    extension = db.Column(db.String(10), nullable=False)
+    size_bytes = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    processed_at = db.Column(db.DateTime)
+    
+    @property
+    def original_path(self):
+        return f'uploads/originals/{self.id[:2]}/{self.id}.{self.extension}'
+    
+    def rendition_path(self, size, image_format):
+        return f'uploads/renditions/{self.id[:2]}/{self.id}-{size}.{image_format}'
+    
+    def __repr__(self):
+        return f'<StoredImage {self.id[:12]} {self.status}>'
+
+class FileRemoval(db.Model):
+    """Uploaded file whose row was deleted, queued in the same transaction and removed by the files worker"""
+    __tablename__ = 'file_removals'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(200), nullable=False)  # static path, 'uploads/...'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FileRemoval {self.path}>'
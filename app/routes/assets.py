@@ -0,0 +1,37 @@
+from flask import Blueprint, request, send_file, abort, current_app
+from app.services.assets import DIST_DIR, load_manifest
+import mimetypes
+import os
+
+bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+ONE_YEAR = 365 * 24 * 3600
+
+# Precompressed variant suffix by Accept-Encoding token, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+@bp.route('/<path:filename>')
+def serve(filename):
+    """Serve a fingerprinted build output, precompressed when the client accepts it"""
+    manifest = load_manifest() if current_app.debug else current_app.extensions['asset_manifest']
+    if filename not in manifest.values():
+        abort(404)
+
+    path, encoding, suffix = os.path.join(DIST_DIR, filename), None, ''
+    for name, variant in ENCODINGS:
+        if name in request.accept_encodings and os.path.exists(path + variant):
+            path, encoding, suffix = path + variant, name, variant
+            break
+    if not os.path.exists(path):
+        abort(404)
+
+    # The name already carries the content hash, so it doubles as the ETag
+    content_hash = filename.rsplit('.', 2)[1]
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True,
+                         etag=content_hash + suffix, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
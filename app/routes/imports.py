@@ -0,0 +1,50 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response
+from flask_login import login_required
+from app.services.importer import IMPORTERS, IMPORT_EXTENSIONS, import_file
+from app.services.scoping import current_owner_id
+import csv
+import io
+
+bp = Blueprint('imports', __name__, url_prefix='/import')
+
+def allowed_import(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMPORT_EXTENSIONS
+
+@bp.route('/', methods=['GET', 'POST'])
+@login_required
+def import_data():
+    """Bulk import properties, tenants, leases or payments from a CSV/XLSX file"""
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        file = request.files.get('file')
+        if kind not in IMPORTERS:
+            flash('Choose what kind of records to import.', 'error')
+            return redirect(url_for('imports.import_data'))
+        if not file or not file.filename or not allowed_import(file.filename):
+            flash('Upload a .csv or .xlsx file.', 'error')
+            return redirect(url_for('imports.import_data'))
+        
+        try:
+            report = import_file(kind, file.stream, file.filename, owner_id=current_owner_id())
+        except Exception as e:
+            flash(f'Error reading file: {str(e)}', 'error')
+            return redirect(url_for('imports.import_data'))
+        
+        if report.imported:
+            flash(f'Imported {report.imported} {kind}.', 'success')
+        if report.failed:
+            flash(f'{report.failed} row(s) were not imported; see the error report below.', 'error')
+        return render_template('imports/import.html', importers=IMPORTERS, kind=kind, report=report)
+    
+    return render_template('imports/import.html', importers=IMPORTERS, kind=request.args.get('kind'))
+
+@bp.route('/template/<kind>.csv')
+@login_required
+def download_template(kind):
+    """Header-only CSV with the columns an import of `kind` accepts"""
+    if kind not in IMPORTERS:
+        return redirect(url_for('imports.import_data'))
+    output = io.StringIO()
+    csv.writer(output).writerow(IMPORTERS[kind].columns)
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={kind}_template.csv'})
@@ -1,24 +1,96 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from app import db
-from app.models import Lease, Property, Tenant
+from app.models import Lease, Property, Tenant, User
+from app.services import deletion
+from app.services.export import EXPORT_FORMATS, export_response
+from app.services.occupancy import lease_conflict
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id, scope_to_owner
+from app.services.pagination import paginate, parse_date_arg
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime
 
 bp = Blueprint('leases', __name__, url_prefix='/leases')
 
+# Columns the list view may be sorted by
+SORT_COLUMNS = {
+    'created_at': Lease.created_at,
+    'start_date': Lease.start_date,
+    'end_date': Lease.end_date,
+    'monthly_rent': Lease.monthly_rent,
+    'status': Lease.status,
+}
+
+# Columns written by the export, named like the import columns where they overlap
+EXPORT_COLUMNS = (
+    ('id', Lease.id),
+    ('property_address', Property.address),
+    ('city', Property.city),
+    ('tenant_name', User.username),
+    ('tenant_email', User.email),
+    ('start_date', Lease.start_date),
+    ('end_date', Lease.end_date),
+    ('monthly_rent', Lease.monthly_rent),
+    ('security_deposit', Lease.security_deposit),
+    ('status', Lease.status),
+    ('created_at', Lease.created_at),
+)
+
+def filtered_leases():
+    """Leases on the user's properties, narrowed by the list filters in the request"""
+    query = scope_to_owner(Lease.query.join(Property), Lease.property_id, current_owner_id())
+    
+    # Filters
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Lease.status == status)
+    city = request.args.get('city')
+    if city:
+        query = query.filter(Property.city == city)
+    ends_from = parse_date_arg('ends_from')
+    if ends_from:
+        query = query.filter(Lease.end_date >= ends_from)
+    ends_to = parse_date_arg('ends_to')
+    if ends_to:
+        query = query.filter(Lease.end_date <= ends_to)
+    return query
+
 @bp.route('/')
 @login_required
+@query_budget(8)
 def list_leases():
     """List all leases"""
-    if current_user.role == 'admin':
-        leases = Lease.query.all()
-    else:
-        # Get leases for user's properties
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        leases = Lease.query.filter(Lease.property_id.in_(property_ids)).all() if property_ids else []
+    query = filtered_leases()
+    
+    # Card totals over the whole filtered set, not just the current page
+    status_counts = dict(query.with_entities(Lease.status, func.count(Lease.id)).group_by(Lease.status).all())
+    totals = {
+        'count': sum(status_counts.values()),
+        'active': status_counts.get('active', 0),
+        'expired': status_counts.get('expired', 0),
+        'active_rent': query.filter(Lease.status == 'active')
+                            .with_entities(func.coalesce(func.sum(Lease.monthly_rent), 0)).scalar(),
+    }
     
-    return render_template('leases/list.html', leases=leases)
+    # Rows show the property and tenant, so load them alongside each lease
+    query = query.options(
+        contains_eager(Lease.property),
+        joinedload(Lease.tenant).joinedload(Tenant.user),
+    )
+    page = paginate(query, SORT_COLUMNS, Lease.id, default_sort='created_at')
+    
+    return render_template('leases/list.html', leases=page, totals=totals)
+
+@bp.route('/export.<export_format>')
+@login_required
+def export_leases(export_format):
+    """Download the filtered leases as CSV or XLSX"""
+    if export_format not in EXPORT_FORMATS:
+        abort(404)
+    query = filtered_leases().join(Lease.tenant).join(Tenant.user).order_by(Lease.id)
+    return export_response(query, EXPORT_COLUMNS, 'leases', export_format)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -47,6 +119,12 @@ def add_lease():
                 status=request.form.get('status', 'active')
             )
             
+            # A property holds one lease at a time
+            conflict = lease_conflict(property_id, lease.start_date, lease.end_date, lease.status)
+            if conflict:
+                flash(conflict, 'error')
+                return render_template('leases/add.html')
+            
             # Update property status if lease is active
             if lease.status == 'active':
                 property.availability_status = 'occupied'
@@ -61,15 +139,8 @@ def add_lease():
             db.session.rollback()
             flash(f'Error creating lease: {str(e)}', 'error')
     
-    # Get available properties and tenants
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-    
-    tenants = Tenant.query.all()
-    
-    return render_template('leases/add.html', properties=properties, tenants=tenants)
+    # Properties and tenants are picked through search.lookup, not listed here
+    return render_template('leases/add.html')
 
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -86,10 +157,24 @@ def edit_lease(id):
         try:
             old_status = lease.status
             
-            lease.property_id = int(request.form.get('property_id'))
+            # The picker offers only the user's properties; check the posted one too
+            property = Property.query.get_or_404(int(request.form.get('property_id')))
+            if current_user.role != 'admin' and property.owner_id != current_user.id:
+                flash('You do not have permission to move this lease to that property.', 'error')
+                return redirect(url_for('leases.list_leases'))
+            
+            # Checked before any field changes, so the lease itself is not flushed by the query
+            start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.form.get('end_date'), '%Y-%m-%d').date()
+            conflict = lease_conflict(property.id, start_date, end_date, request.form.get('status'), exclude_id=lease.id)
+            if conflict:
+                flash(conflict, 'error')
+                return render_template('leases/edit.html', lease=lease)
+            
+            lease.property_id = property.id
             lease.tenant_id = int(request.form.get('tenant_id'))
-            lease.start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d').date()
-            lease.end_date = datetime.strptime(request.form.get('end_date'), '%Y-%m-%d').date()
+            lease.start_date = start_date
+            lease.end_date = end_date
             lease.monthly_rent = float(request.form.get('monthly_rent'))
             lease.security_deposit = float(request.form.get('security_deposit', 0))
             lease.terms_conditions = request.form.get('terms_conditions')
@@ -110,15 +195,7 @@ def edit_lease(id):
             db.session.rollback()
             flash(f'Error updating lease: {str(e)}', 'error')
     
-    # Get properties and tenants
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-    
-    tenants = Tenant.query.all()
-    
-    return render_template('leases/edit.html', lease=lease, properties=properties, tenants=tenants)
+    return render_template('leases/edit.html', lease=lease)
 
 @bp.route('/view/<int:id>')
 @login_required
@@ -149,8 +226,7 @@ def delete_lease(id):
         if lease.status == 'active':
             lease.property.availability_status = 'available'
         
-        db.session.delete(lease)
-        db.session.commit()
+        deletion.delete_lease(lease)
         
         flash('Lease deleted successfully!', 'success')
     except Exception as e:
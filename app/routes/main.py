@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app import db
-from app.models import Property, Tenant, Lease, Payment, MaintenanceRequest
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from app.services import dashboard as dashboard_service
+from app.services.cache import LANDING_KEY, cached, dashboard_key
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id
 
 bp = Blueprint('main', __name__)
 
@@ -11,54 +12,31 @@ bp = Blueprint('main', __name__)
 def index():
     """Landing page"""
     # Get some stats for landing page
-    total_properties = Property.query.count()
-    available_properties = Property.query.filter_by(availability_status='available').count()
+    counts = cached(LANDING_KEY, dashboard_service.get_landing_counts)
     
     return render_template('index.html', 
-                         total_properties=total_properties,
-                         available_properties=available_properties)
+                         total_properties=counts['total_properties'],
+                         available_properties=counts['available_properties'])
 
 @bp.route('/dashboard')
 @login_required
+@query_budget(10)
 def dashboard():
     """Main dashboard"""
-    # Get user's properties
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-        leases = Lease.query.all()
-        payments = Payment.query.all()
-        maintenance_requests = MaintenanceRequest.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        leases = Lease.query.filter(Lease.property_id.in_(property_ids)).all() if property_ids else []
-        payments = Payment.query.join(Lease).filter(Lease.property_id.in_(property_ids)).all() if property_ids else []
-        maintenance_requests = MaintenanceRequest.query.filter(MaintenanceRequest.property_id.in_(property_ids)).all() if property_ids else []
+    # Admins see the whole portfolio, owners only their own properties
+    owner_id = current_owner_id()
     
-    # Calculate statistics
-    stats = {
-        'total_properties': len(properties),
-        'available_properties': len([p for p in properties if p.availability_status == 'available']),
-        'occupied_properties': len([p for p in properties if p.availability_status == 'occupied']),
-        'active_leases': len([l for l in leases if l.status == 'active']),
-        'total_rent': sum([l.monthly_rent for l in leases if l.status == 'active']),
-        'pending_payments': len([p for p in payments if p.status == 'pending']),
-        'pending_maintenance': len([m for m in maintenance_requests if m.status == 'pending']),
-    }
+    # Counters (including leases expiring within 30 days) are cached per owner scope
+    stats = cached(dashboard_key(owner_id), lambda: dashboard_service.get_stats(owner_id))
     
     # Recent activities
-    recent_payments = sorted(payments, key=lambda x: x.created_at, reverse=True)[:5]
-    recent_maintenance = sorted(maintenance_requests, key=lambda x: x.created_at, reverse=True)[:5]
-    
-    # Upcoming lease expirations (within 30 days)
-    today = datetime.now().date()
-    expiring_soon = [l for l in leases if l.end_date and l.end_date <= today + timedelta(days=30) and l.end_date >= today]
+    recent_payments = dashboard_service.get_recent_payments(owner_id)
+    recent_maintenance = dashboard_service.get_recent_maintenance(owner_id)
     
     return render_template('dashboard.html',
                          stats=stats,
                          recent_payments=recent_payments,
-                         recent_maintenance=recent_maintenance,
-                         expiring_leases=expiring_soon)
+                         recent_maintenance=recent_maintenance)
 
 @bp.route('/profile')
 @login_required
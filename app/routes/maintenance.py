@@ -1,24 +1,99 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from app import db
-from app.models import MaintenanceRequest, Property, Tenant
-from datetime import datetime
+from app.models import MaintenanceRequest, Property, Tenant, User
+from app.services.export import EXPORT_FORMATS, export_response
+from app.services.notifications import admin_ids, fan_out
+from app.services.outbox import queue_email
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id, scope_to_owner
+from app.services.pagination import paginate, parse_date_arg
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
+from datetime import datetime, timedelta
 
 bp = Blueprint('maintenance', __name__, url_prefix='/maintenance')
 
+# Columns the list view may be sorted by
+SORT_COLUMNS = {
+    'created_at': MaintenanceRequest.created_at,
+    'request_type': MaintenanceRequest.request_type,
+    'priority': MaintenanceRequest.priority,
+    'status': MaintenanceRequest.status,
+}
+
+# Columns written by the export
+EXPORT_COLUMNS = (
+    ('id', MaintenanceRequest.id),
+    ('property_address', Property.address),
+    ('city', Property.city),
+    ('tenant_name', User.username),
+    ('tenant_email', User.email),
+    ('request_type', MaintenanceRequest.request_type),
+    ('description', MaintenanceRequest.description),
+    ('priority', MaintenanceRequest.priority),
+    ('status', MaintenanceRequest.status),
+    ('created_at', MaintenanceRequest.created_at),
+    ('resolved_at', MaintenanceRequest.resolved_at),
+)
+
+def filtered_requests():
+    """Maintenance requests on the user's properties, narrowed by the list filters in the request"""
+    query = scope_to_owner(MaintenanceRequest.query.join(Property), MaintenanceRequest.property_id,
+                           current_owner_id())
+    
+    # Filters
+    status = request.args.get('status')
+    if status:
+        query = query.filter(MaintenanceRequest.status == status)
+    priority = request.args.get('priority')
+    if priority:
+        query = query.filter(MaintenanceRequest.priority == priority)
+    city = request.args.get('city')
+    if city:
+        query = query.filter(Property.city == city)
+    created_from = parse_date_arg('created_from')
+    if created_from:
+        query = query.filter(MaintenanceRequest.created_at >= created_from)
+    created_to = parse_date_arg('created_to')
+    if created_to:
+        query = query.filter(MaintenanceRequest.created_at < created_to + timedelta(days=1))
+    return query
+
 @bp.route('/')
 @login_required
+@query_budget(8)
 def list_requests():
     """List all maintenance requests"""
-    if current_user.role == 'admin':
-        requests = MaintenanceRequest.query.all()
-    else:
-        # Get requests for user's properties
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        requests = MaintenanceRequest.query.filter(MaintenanceRequest.property_id.in_(property_ids)).all() if property_ids else []
+    query = filtered_requests()
+    
+    # Card totals over the whole filtered set, not just the current page
+    status_counts = dict(query.with_entities(MaintenanceRequest.status, func.count(MaintenanceRequest.id))
+                         .group_by(MaintenanceRequest.status).all())
+    totals = {
+        'count': sum(status_counts.values()),
+        'pending': status_counts.get('pending', 0),
+        'in_progress': status_counts.get('in_progress', 0),
+        'resolved': status_counts.get('resolved', 0),
+    }
     
-    return render_template('maintenance/list.html', requests=requests)
+    # Cards show the property address, so load it alongside each request
+    query = query.options(contains_eager(MaintenanceRequest.property))
+    page = paginate(query, SORT_COLUMNS, MaintenanceRequest.id, default_sort='created_at')
+    
+    return render_template('maintenance/list.html', requests=page, totals=totals)
+
+@bp.route('/export.<export_format>')
+@login_required
+def export_requests(export_format):
+    """Download the filtered maintenance history as CSV or XLSX"""
+    if export_format not in EXPORT_FORMATS:
+        abort(404)
+    query = (filtered_requests()
+             .join(MaintenanceRequest.tenant_relation)
+             .join(Tenant.user)
+             .order_by(MaintenanceRequest.id))
+    return export_response(query, EXPORT_COLUMNS, 'maintenance', export_format)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -50,6 +125,12 @@ def add_request():
                 maintenance_request.assigned_staff_id = int(assigned_staff_id)
             
             db.session.add(maintenance_request)
+            
+            # Owner, admins and assigned staff hear about it, except whoever filed it
+            recipients = [property_obj.owner_id, *admin_ids(), maintenance_request.assigned_staff_id]
+            fan_out('maintenance_request', [user_id for user_id in recipients if user_id != current_user.id],
+                    f'New {maintenance_request.priority} priority {maintenance_request.request_type} '
+                    f'request for {property_obj.address}.')
             db.session.commit()
             
             flash('Maintenance request created successfully!', 'success')
@@ -59,15 +140,8 @@ def add_request():
             db.session.rollback()
             flash(f'Error creating maintenance request: {str(e)}', 'error')
     
-    # Get properties and tenants
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-    
-    tenants = Tenant.query.all()
-    
-    return render_template('maintenance/add.html', properties=properties, tenants=tenants)
+    # Properties and tenants are picked through search.lookup, not listed here
+    return render_template('maintenance/add.html')
 
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -82,7 +156,13 @@ def edit_request(id):
     
     if request.method == 'POST':
         try:
-            maintenance_request.property_id = int(request.form.get('property_id'))
+            # The picker offers only the user's properties; check the posted one too
+            property_obj = Property.query.get_or_404(int(request.form.get('property_id')))
+            if current_user.role != 'admin' and property_obj.owner_id != current_user.id:
+                flash('You do not have permission to move this request to that property.', 'error')
+                return redirect(url_for('maintenance.list_requests'))
+            
+            maintenance_request.property_id = property_obj.id
             maintenance_request.tenant_id = int(request.form.get('tenant_id'))
             maintenance_request.request_type = request.form.get('request_type')
             maintenance_request.description = request.form.get('description')
@@ -100,6 +180,11 @@ def edit_request(id):
             if assigned_staff_id:
                 maintenance_request.assigned_staff_id = int(assigned_staff_id)
             
+            if old_status != maintenance_request.status:
+                tenant = maintenance_request.tenant_relation
+                queue_email(tenant.user.email, 'Maintenance request update', 'maintenance_update.txt',
+                            tenant=tenant, maintenance_request=maintenance_request)
+            
             db.session.commit()
             flash('Maintenance request updated successfully!', 'success')
             return redirect(url_for('maintenance.list_requests'))
@@ -108,15 +193,7 @@ def edit_request(id):
             db.session.rollback()
             flash(f'Error updating maintenance request: {str(e)}', 'error')
     
-    # Get properties and tenants
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-    
-    tenants = Tenant.query.all()
-    
-    return render_template('maintenance/edit.html', request=maintenance_request, properties=properties, tenants=tenants)
+    return render_template('maintenance/edit.html', request=maintenance_request)
 
 @bp.route('/view/<int:id>')
 @login_required
@@ -0,0 +1,15 @@
+from flask import Blueprint, Response, request, abort, current_app
+from flask_login import current_user
+from app.services.metrics import render_metrics
+import hmac
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics')
+def metrics():
+    """Request histograms in the Prometheus text format; needs METRICS_TOKEN as a bearer token or an admin login"""
+    token = current_app.config.get('METRICS_TOKEN')
+    scraper = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not scraper and not (current_user.is_authenticated and current_user.role == 'admin'):
+        abort(401)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
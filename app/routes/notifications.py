@@ -0,0 +1,88 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, current_app, jsonify, abort
+from flask_login import login_required, current_user
+from app import db
+from app.models import Notification
+from app.services.notifications import mark_all_read, mark_read, unread_count
+from app.services.pagination import paginate
+import time
+
+bp = Blueprint('notifications', __name__, url_prefix='/notifications')
+
+SORT_COLUMNS = {'created_at': Notification.created_at}
+
+@bp.route('/')
+@login_required
+def list_notifications():
+    """List the current user's notifications, newest first"""
+    query = Notification.query.filter(Notification.user_id == current_user.id)
+    if request.args.get('unread'):
+        query = query.filter(Notification.is_read.is_(False))
+    page = paginate(query, SORT_COLUMNS, Notification.id, default_sort='created_at')
+    return render_template('notifications/list.html', notifications=page)
+
+@bp.route('/<int:id>/read', methods=['POST'])
+@login_required
+def read_notification(id):
+    """Mark one notification read"""
+    try:
+        mark_read(current_user.id, id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating notification: {str(e)}', 'error')
+    return redirect(request.referrer or url_for('notifications.list_notifications'))
+
+@bp.route('/read-all', methods=['POST'])
+@login_required
+def read_all():
+    """Mark all of the current user's notifications read"""
+    try:
+        count = mark_all_read(current_user.id)
+        db.session.commit()
+        flash(f'Marked {count} notification(s) as read.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating notifications: {str(e)}', 'error')
+    return redirect(url_for('notifications.list_notifications'))
+
+@bp.route('/unread')
+@login_required
+def unread():
+    """The current user's unread count, polled by the navigation badge"""
+    return jsonify(unread=unread_count(current_user.id))
+
+@bp.route('/stream')
+@login_required
+def stream():
+    """Server-sent events carrying the unread count whenever it changes.
+
+    Each poll is a primary-key read of the cached counter. The stream holds a
+    worker for up to NOTIFICATION_STREAM_TIMEOUT seconds, so it is only served
+    with NOTIFICATION_STREAM_ENABLED (threaded or async workers); the browser's
+    EventSource reconnects by itself when it closes.
+    """
+    if not current_app.config['NOTIFICATION_STREAM_ENABLED']:
+        abort(404)
+    app = current_app._get_current_object()
+    user_id = current_user.id
+    interval = app.config.get('NOTIFICATION_STREAM_INTERVAL', 5)
+    timeout = app.config.get('NOTIFICATION_STREAM_TIMEOUT', 55)
+    
+    def events():
+        yield f'retry: {interval * 1000}\n\n'
+        last = None
+        deadline = time.monotonic() + timeout
+        while True:
+            with app.app_context():
+                count = unread_count(user_id)
+            if count != last:
+                last = count
+                yield f'event: unread\ndata: {count}\n\n'
+            else:
+                yield ': keep-alive\n\n'
+            if time.monotonic() + interval > deadline:
+                return
+            time.sleep(interval)
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
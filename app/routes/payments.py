@@ -1,24 +1,99 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from app import db
-from app.models import Payment, Lease, Property
+from app.models import Payment, Lease, Property, Tenant, User
+from app.services.export import EXPORT_FORMATS, export_response
+from app.services.outbox import queue_email
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id, scope_to_owner
+from app.services.pagination import paginate, parse_date_arg
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime
 
 bp = Blueprint('payments', __name__, url_prefix='/payments')
 
+# Columns the list view may be sorted by
+SORT_COLUMNS = {
+    'created_at': Payment.created_at,
+    'due_date': Payment.due_date,
+    'paid_date': Payment.paid_date,
+    'amount': Payment.amount,
+    'status': Payment.status,
+}
+
+# Columns written by the export, named like the import columns where they overlap
+EXPORT_COLUMNS = (
+    ('id', Payment.id),
+    ('lease_id', Payment.lease_id),
+    ('property_address', Property.address),
+    ('city', Property.city),
+    ('tenant_name', User.username),
+    ('tenant_email', User.email),
+    ('amount', Payment.amount),
+    ('due_date', Payment.due_date),
+    ('paid_date', Payment.paid_date),
+    ('payment_method', Payment.payment_method),
+    ('status', Payment.status),
+    ('created_at', Payment.created_at),
+)
+
+def lease_label_options():
+    """Loader options for lease dropdowns labelled with property address and tenant name"""
+    return (joinedload(Lease.property), joinedload(Lease.tenant).joinedload(Tenant.user))
+
+def filtered_payments():
+    """Payments on the user's properties, narrowed by the list filters in the request"""
+    query = scope_to_owner(Payment.query.join(Lease).join(Property), Lease.property_id, current_owner_id())
+    
+    # Filters
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Payment.status == status)
+    city = request.args.get('city')
+    if city:
+        query = query.filter(Property.city == city)
+    due_from = parse_date_arg('due_from')
+    if due_from:
+        query = query.filter(Payment.due_date >= due_from)
+    due_to = parse_date_arg('due_to')
+    if due_to:
+        query = query.filter(Payment.due_date <= due_to)
+    return query
+
 @bp.route('/')
 @login_required
+@query_budget(8)
 def list_payments():
     """List all payments"""
-    if current_user.role == 'admin':
-        payments = Payment.query.all()
-    else:
-        # Get payments for user's properties
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        payments = Payment.query.join(Lease).filter(Lease.property_id.in_(property_ids)).all() if property_ids else []
+    query = filtered_payments()
     
-    return render_template('payments/list.html', payments=payments)
+    # Card totals over the whole filtered set, not just the current page
+    status_counts = dict(query.with_entities(Payment.status, func.count(Payment.id)).group_by(Payment.status).all())
+    totals = {
+        'count': sum(status_counts.values()),
+        'paid': status_counts.get('paid', 0),
+        'pending': status_counts.get('pending', 0),
+        'amount': query.with_entities(func.coalesce(func.sum(Payment.amount), 0)).scalar(),
+    }
+    
+    # Rows show the property and tenant, so load them alongside each payment
+    query = query.options(
+        contains_eager(Payment.lease).contains_eager(Lease.property),
+        contains_eager(Payment.lease).joinedload(Lease.tenant).joinedload(Tenant.user),
+    )
+    page = paginate(query, SORT_COLUMNS, Payment.id, default_sort='created_at')
+    
+    return render_template('payments/list.html', payments=page, totals=totals)
+
+@bp.route('/export.<export_format>')
+@login_required
+def export_payments(export_format):
+    """Download the filtered payments as CSV or XLSX"""
+    if export_format not in EXPORT_FORMATS:
+        abort(404)
+    query = filtered_payments().join(Lease.tenant).join(Tenant.user).order_by(Payment.id)
+    return export_response(query, EXPORT_COLUMNS, 'payments', export_format)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -45,6 +120,10 @@ def add_payment():
             )
             
             db.session.add(payment)
+            
+            # Queued in the same transaction; the mail worker sends it after commit
+            queue_email(lease.tenant.user.email, 'Payment recorded', 'payment_recorded.txt',
+                        tenant=lease.tenant, lease=lease, payment=payment)
             db.session.commit()
             
             flash('Payment recorded successfully!', 'success')
@@ -55,12 +134,10 @@ def add_payment():
             flash(f'Error recording payment: {str(e)}', 'error')
     
     # Get leases
-    if current_user.role == 'admin':
-        leases = Lease.query.filter_by(status='active').all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        leases = Lease.query.filter(Lease.property_id.in_(property_ids), Lease.status == 'active').all() if property_ids else []
+    leases = (scope_to_owner(Lease.query, Lease.property_id, current_owner_id())
+              .options(*lease_label_options())
+              .filter(Lease.status == 'active')
+              .all())
     
     return render_template('payments/add.html', leases=leases)
 
@@ -98,12 +175,9 @@ def edit_payment(id):
             flash(f'Error updating payment: {str(e)}', 'error')
     
     # Get leases
-    if current_user.role == 'admin':
-        leases = Lease.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
-        property_ids = [p.id for p in properties]
-        leases = Lease.query.filter(Lease.property_id.in_(property_ids)).all() if property_ids else []
+    leases = (scope_to_owner(Lease.query, Lease.property_id, current_owner_id())
+              .options(*lease_label_options())
+              .all())
     
     return render_template('payments/edit.html', payment=payment, leases=leases)
 
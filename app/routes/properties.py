@@ -2,27 +2,66 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app import db
 from app.models import Property
-from werkzeug.utils import secure_filename
-import os
+from app.services import deletion
+from app.services.images import allowed_image, store_upload
+from app.services.occupancy import timeline, timeline_period
+from app.services.pagination import paginate
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id, property_query
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('properties', __name__, url_prefix='/properties')
 
-# Allowed file extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+def save_image(property):
+    """Attach the uploaded photo, if any, to `property`"""
+    file = request.files.get('image')
+    if file and file.filename and allowed_image(file.filename):
+        image = store_upload(file.stream, file.filename)
+        property.image = image
+        property.image_path = image.original_path
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Columns the list view may be sorted by
+SORT_COLUMNS = {
+    'created_at': Property.created_at,
+    'rent_amount': Property.rent_amount,
+    'city': Property.city,
+    'address': Property.address,
+}
 
 @bp.route('/')
 @login_required
+@query_budget(6)
 def list_properties():
     """List all properties"""
-    if current_user.role == 'admin':
-        properties = Property.query.all()
-    else:
-        properties = Property.query.filter_by(owner_id=current_user.id).all()
+    query = property_query(current_owner_id())
     
-    return render_template('properties/list.html', properties=properties)
+    # Filters
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Property.availability_status == status)
+    property_type = request.args.get('property_type')
+    if property_type:
+        query = query.filter(Property.property_type == property_type)
+    city = request.args.get('city')
+    if city:
+        query = query.filter(Property.city == city)
+    
+    # Card totals over the whole filtered set, not just the current page
+    status_counts = dict(query.with_entities(Property.availability_status, func.count(Property.id))
+                         .group_by(Property.availability_status).all())
+    totals = {
+        'count': sum(status_counts.values()),
+        'available': status_counts.get('available', 0),
+        'occupied': status_counts.get('occupied', 0),
+        'maintenance': status_counts.get('maintenance', 0),
+    }
+    
+    # Cards show the photo's thumbnail rendition
+    query = query.options(joinedload(Property.image))
+    page = paginate(query, SORT_COLUMNS, Property.id, default_sort='created_at')
+    
+    return render_template('properties/list.html', properties=page, totals=totals)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -30,19 +69,6 @@ def add_property():
     """Add new property"""
     if request.method == 'POST':
         try:
-            # Handle file upload
-            image_path = None
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    # Create unique filename
-                    import uuid
-                    filename = f"{uuid.uuid4()}_{filename}"
-                    filepath = os.path.join('app/static/uploads', filename)
-                    file.save(filepath)
-                    image_path = f"uploads/{filename}"
-            
             # Create property
             property = Property(
                 owner_id=current_user.id,
@@ -55,9 +81,9 @@ def add_property():
                 description=request.form.get('description'),
                 bedrooms=int(request.form.get('bedrooms', 0)),
                 bathrooms=int(request.form.get('bathrooms', 0)),
-                area_sqft=float(request.form.get('area_sqft', 0)),
-                image_path=image_path
+                area_sqft=float(request.form.get('area_sqft', 0))
             )
+            save_image(property)
             
             db.session.add(property)
             db.session.commit()
@@ -84,22 +110,8 @@ def edit_property(id):
     
     if request.method == 'POST':
         try:
-            # Handle file upload
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename and allowed_file(file.filename):
-                    # Delete old image if exists
-                    if property.image_path:
-                        old_path = os.path.join('app/static', property.image_path)
-                        if os.path.exists(old_path):
-                            os.remove(old_path)
-                    
-                    filename = secure_filename(file.filename)
-                    import uuid
-                    filename = f"{uuid.uuid4()}_{filename}"
-                    filepath = os.path.join('app/static/uploads', filename)
-                    file.save(filepath)
-                    property.image_path = f"uploads/{filename}"
+            # A replaced photo is left for the image garbage collector
+            save_image(property)
             
             # Update property fields
             property.property_type = request.form.get('property_type')
@@ -129,7 +141,9 @@ def edit_property(id):
 def view_property(id):
     """View property details"""
     property = Property.query.get_or_404(id)
-    return render_template('properties/view.html', property=property)
+    start, end = timeline_period()
+    return render_template('properties/view.html', property=property,
+                           timeline=timeline(property.id, start, end), timeline_days=(end - start).days + 1)
 
 @bp.route('/delete/<int:id>', methods=['POST'])
 @login_required
@@ -143,14 +157,8 @@ def delete_property(id):
         return redirect(url_for('properties.list_properties'))
     
     try:
-        # Delete associated image if exists
-        if property.image_path:
-            image_path = os.path.join('app/static', property.image_path)
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        
-        db.session.delete(property)
-        db.session.commit()
+        # The photo may be shared; the image garbage collector removes it once unused
+        deletion.delete_property(property)
         
         flash('Property deleted successfully!', 'success')
     except Exception as e:
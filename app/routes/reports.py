@@ -0,0 +1,105 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask_login import login_required
+from app.services import forecast as forecasting, occupancy as occupancy_service, reports
+from app.services.export import EXPORT_FORMATS, export_response
+from app.services.pagination import parse_date_arg
+from app.services.query_budget import query_budget
+from app.services.scoping import current_owner_id
+from datetime import date, timedelta
+
+bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+def report_args():
+    """Grouping and month range from the request, falling back to the last twelve months"""
+    group = request.args.get('group')
+    if group not in reports.GROUPS:
+        group = 'property'
+    start, end = reports.default_period()
+    start = reports.parse_month(request.args.get('from')) or start
+    end = reports.parse_month(request.args.get('to')) or end
+    if start > end:
+        flash('The start month is after the end month; showing them the other way round.', 'error')
+        start, end = end, start
+    return group, start, end
+
+@bp.route('/')
+@login_required
+def index():
+    """Reports start at aged receivables"""
+    return redirect(url_for('reports.receivables'))
+
+@bp.route('/receivables')
+@login_required
+@query_budget(6)
+def receivables():
+    """Unpaid rent by how long it is past due"""
+    group, _, _ = report_args()
+    as_of = parse_date_arg('as_of')
+    report = reports.aged_receivables(current_owner_id(), group, as_of)
+    return render_template('reports/receivables.html', report=report, group=group)
+
+@bp.route('/rent-roll')
+@login_required
+@query_budget(6)
+def rent_roll():
+    """Rent billed vs collected per property, owner or city"""
+    group, start, end = report_args()
+    report = reports.rent_roll(current_owner_id(), group, start, end)
+    return render_template('reports/rent_roll.html', report=report, group=group)
+
+@bp.route('/rent-roll.<export_format>')
+@login_required
+def export_rent_roll(export_format):
+    """Stream the rent roll with one row per group and month, for ranges too long to show on a page"""
+    if export_format not in EXPORT_FORMATS:
+        abort(404)
+    group, start, end = report_args()
+    query, columns = reports.rent_roll_export(current_owner_id(), group, start, end)
+    return export_response(query, columns, 'rent-roll', export_format)
+
+@bp.route('/collection')
+@login_required
+@query_budget(5)
+def collection():
+    """Collection rate per month with a rolling twelve-month rate"""
+    _, start, end = report_args()
+    series = reports.collection_series(current_owner_id(), start, end)
+    return render_template('reports/collection.html', series=series,
+                           start=start.strftime('%Y-%m'), end=end.strftime('%Y-%m'))
+
+def forecast_args():
+    """Grouping and renewal assumptions from the request; blanks and bad values keep the configured defaults"""
+    group = request.args.get('group')
+    if group not in forecasting.GROUPS:
+        group = forecasting.GROUPS[0]
+    renewal = request.args.get('renewal', type=float)
+    if renewal is not None and not 0 <= renewal <= 100:
+        flash('Renewal probability must be between 0 and 100%.', 'error')
+        renewal = None
+    downtime = request.args.get('downtime', type=int)
+    if downtime is not None and not 0 <= downtime <= 24:
+        flash('Downtime must be between 0 and 24 months.', 'error')
+        downtime = None
+    return group, forecasting.assumptions(None if renewal is None else renewal / 100, downtime)
+
+@bp.route('/forecast')
+@login_required
+@query_budget(4)
+def forecast():
+    """Expected rent, expiring leases and vacancy over the coming months"""
+    group, settings = forecast_args()
+    report = forecasting.forecast(current_owner_id(), group, settings)
+    return render_template('reports/forecast.html', report=report, group=group, settings=settings,
+                           groups=forecasting.GROUPS)
+
+@bp.route('/occupancy')
+@login_required
+@query_budget(4)
+def occupancy():
+    """Occupancy on a day and occupied vs vacant days per property over a period"""
+    _, start, end = report_args()
+    owner_id = current_owner_id()
+    on_day = occupancy_service.occupancy_on(parse_date_arg('as_of') or date.today(), owner_id)
+    report = occupancy_service.vacancy(owner_id, start, reports.add_months(end, 1) - timedelta(days=1))
+    return render_template('reports/occupancy.html', on_day=on_day, report=report,
+                           start=start.strftime('%Y-%m'), end=end.strftime('%Y-%m'))
@@ -0,0 +1,70 @@
+from flask import Blueprint, render_template, request, url_for, jsonify, abort
+from flask_login import login_required
+from app.services.scoping import current_owner_id
+from app.services.search import KINDS, lookup as run_lookup, search as run_search, typeahead as run_typeahead
+
+bp = Blueprint('search', __name__, url_prefix='/search')
+
+PER_PAGE = 20
+TYPEAHEAD_LIMIT = 8
+MAX_TYPEAHEAD_LIMIT = 20
+MIN_TYPEAHEAD_LENGTH = 2
+LOOKUP_LIMIT = 10
+
+# Kinds the form pickers look up, and whether they offer only the user's own
+# rows; any tenant may be put on a lease or request, as the forms always allowed
+LOOKUP_KINDS = {'property': True, 'tenant': False}
+
+# Where each kind of result links to
+RESULT_ENDPOINTS = {
+    'property': 'properties.view_property',
+    'tenant': 'tenants.view_tenant',
+    'maintenance': 'maintenance.view_request',
+}
+
+def result_url(result):
+    return url_for(RESULT_ENDPOINTS[result.kind], id=result.id)
+
+@bp.route('/')
+@login_required
+def search():
+    """Ranked search across properties, tenants and maintenance requests"""
+    query_text = request.args.get('q', '').strip()
+    kind = request.args.get('kind') if request.args.get('kind') in KINDS else None
+    page = request.args.get('page', 1, type=int)
+    page = page if page > 0 else 1
+    
+    # One extra row tells whether there is a next page without counting matches
+    results = run_search(query_text, current_owner_id(), kind, limit=PER_PAGE + 1, offset=(page - 1) * PER_PAGE)
+    return render_template('search/results.html', query_text=query_text, kind=kind, kinds=list(KINDS),
+                           results=results[:PER_PAGE], page=page, has_next=len(results) > PER_PAGE,
+                           result_url=result_url)
+
+@bp.route('/typeahead')
+@login_required
+def typeahead():
+    """Prefix suggestions as JSON for the search box"""
+    query_text = request.args.get('q', '').strip()
+    if len(query_text) < MIN_TYPEAHEAD_LENGTH:
+        return jsonify(results=[])
+    kind = request.args.get('kind') if request.args.get('kind') in KINDS else None
+    limit = min(max(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), 1), MAX_TYPEAHEAD_LIMIT)
+    results = run_typeahead(query_text, current_owner_id(), kind, limit)
+    return jsonify(results=[{'kind': result.kind, 'id': result.id, 'label': result.label,
+                             'detail': result.detail, 'url': result_url(result)} for result in results])
+
+@bp.route('/lookup/<kind>')
+@login_required
+def lookup(kind):
+    """A page of options as JSON for the property and tenant pickers on forms"""
+    if kind not in LOOKUP_KINDS:
+        abort(404)
+    limit = min(max(request.args.get('limit', LOOKUP_LIMIT, type=int), 1), MAX_TYPEAHEAD_LIMIT)
+    owner_id = current_owner_id() if LOOKUP_KINDS[kind] else None
+    
+    # `next` is the cursor for the following page: pass it back as `before`
+    results = run_lookup(kind, request.args.get('q', '').strip(), owner_id, limit + 1,
+                         request.args.get('before', type=int))
+    return jsonify(results=[{'id': result.id, 'label': result.label, 'detail': result.detail}
+                            for result in results[:limit]],
+                   next=results[limit - 1].id if len(results) > limit else None)
@@ -1,17 +1,55 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app import db
-from app.models import Tenant, User
+from app.models import Tenant, User, Lease
+from app.services import deletion
+from app.services.pagination import paginate, parse_date_arg
+from app.services.query_budget import query_budget
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from datetime import datetime
 
 bp = Blueprint('tenants', __name__, url_prefix='/tenants')
 
+# Columns the list view may be sorted by
+SORT_COLUMNS = {
+    'created_at': User.created_at,
+    'username': User.username,
+    'move_in_date': Tenant.move_in_date,
+    'occupation': Tenant.occupation,
+}
+
 @bp.route('/')
 @login_required
+@query_budget(8)
 def list_tenants():
     """List all tenants"""
-    tenants = Tenant.query.all()
-    return render_template('tenants/list.html', tenants=tenants)
+    query = Tenant.query.join(Tenant.user)
+    
+    # Filters
+    occupation = request.args.get('occupation')
+    if occupation:
+        query = query.filter(Tenant.occupation == occupation)
+    moved_in_from = parse_date_arg('moved_in_from')
+    if moved_in_from:
+        query = query.filter(Tenant.move_in_date >= moved_in_from)
+    moved_in_to = parse_date_arg('moved_in_to')
+    if moved_in_to:
+        query = query.filter(Tenant.move_in_date <= moved_in_to)
+    
+    # Card totals over the whole filtered set, not just the current page
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    active_lease_tenants = db.select(Lease.tenant_id).where(Lease.status == 'active')
+    totals = {
+        'count': query.count(),
+        'with_active_lease': query.filter(Tenant.id.in_(active_lease_tenants)).count(),
+        'new_this_month': query.filter(User.created_at >= month_start).count(),
+    }
+    
+    # Rows show the user account and count active leases per tenant
+    query = query.options(contains_eager(Tenant.user), selectinload(Tenant.leases))
+    page = paginate(query, SORT_COLUMNS, Tenant.id, default_sort='created_at')
+    
+    return render_template('tenants/list.html', tenants=page, totals=totals)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -98,7 +136,10 @@ def edit_tenant(id):
 @login_required
 def view_tenant(id):
     """View tenant details"""
-    tenant = Tenant.query.get_or_404(id)
+    tenant = Tenant.query.options(
+        joinedload(Tenant.user),
+        selectinload(Tenant.leases).joinedload(Lease.property),
+    ).get_or_404(id)
     return render_template('tenants/view.html', tenant=tenant)
 
 @bp.route('/delete/<int:id>', methods=['POST'])
@@ -109,12 +150,11 @@ def delete_tenant(id):
     
     try:
         # Check if tenant has active leases
-        if tenant.leases and any(l.status == 'active' for l in tenant.leases):
+        if Lease.query.filter_by(tenant_id=tenant.id, status='active').first():
             flash('Cannot delete tenant with active leases.', 'error')
             return redirect(url_for('tenants.list_tenants'))
         
-        db.session.delete(tenant)
-        db.session.commit()
+        deletion.delete_tenant(tenant)
         
         flash('Tenant deleted successfully!', 'success')
     except Exception as e:
@@ -0,0 +1,210 @@
+"""Self-hosted CSS and icon bundle.
+
+`flask build-assets` scans the templates for the class names they use and
+writes one purged stylesheet and a subsetted icon font, named by content hash
+and precompressed, to app/static/dist:
+
+    app.<hash>.css  app.<hash>.css.gz  app.<hash>.css.br
+    icons.<hash>.woff2
+    manifest.json   (logical name -> hashed file name)
+
+Everything is built from vendored inputs in app/assets, so no network access
+is needed. Templates link the bundle with `asset_url('app.css')`.
+"""
+from flask import current_app, url_for
+from app.services.utility_css import generate
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+DIST_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'dist')
+SOURCES = ['src/preflight.css', 'src/app.css']
+FONT_AWESOME_CSS = 'vendor/fontawesome/font-awesome-4.7.0.min.css'
+FONT_AWESOME_FONT = 'vendor/fontawesome/fontawesome-webfont-4.7.0.ttf'
+
+# Classes only ever built at runtime (Jinja expressions, classList calls)
+SAFELIST = {'hidden', 'text-left', 'text-right', 'fa-sort-up', 'fa-sort-down'}
+
+# The templates use Font Awesome 6 names; these are their 4.7 equivalents
+ICON_ALIASES = {
+    'calendar-alt': 'calendar', 'calendar-times': 'calendar-times-o', 'chart-bar': 'bar-chart',
+    'chart-line': 'line-chart', 'chart-pie': 'pie-chart', 'check-double': 'check', 'clock': 'clock-o', 'cloud-upload-alt': 'cloud-upload',
+    'dollar-sign': 'usd', 'edit': 'pencil-square-o', 'file-alt': 'file-text-o', 'file-contract': 'file-text',
+    'file-csv': 'file-text-o', 'file-excel': 'file-excel-o', 'file-import': 'upload', 'file-signature': 'pencil',
+    'handshake': 'handshake-o', 'map-marker-alt': 'map-marker', 'money-bill-wave': 'money', 'pkr-sign': 'money',
+    'ruler-combined': 'arrows-alt', 'save': 'floppy-o', 'sign-in-alt': 'sign-in', 'sign-out-alt': 'sign-out',
+    'tools': 'wrench', 'user-check': 'user', 'user-edit': 'user', 'user-tag': 'tag',
+}
+ICON_MODIFIERS = {
+    'fa-spin': 'animation:fa-spin 2s infinite linear',
+    'fa-fw': 'width:1.28571429em;text-align:center',
+}
+ICON_FONT_FAMILY = 'RentalHubIcons'
+ICON_RULE = re.compile(r'((?:\.fa-[a-z0-9-]+:before,?)+)\{content:"\\(f[0-9a-f]+)"\}')
+CLASS_TOKEN = re.compile(r'[-\w:./]+')
+
+class AssetError(Exception):
+    pass
+
+def _read(path, mode='r'):
+    with open(os.path.join(ASSETS_DIR, path), mode) as source:
+        return source.read()
+
+def scan_templates(folder=TEMPLATES_DIR):
+    """Every token in the templates that could be a class name, plus SAFELIST"""
+    candidates = set(SAFELIST)
+    for path in glob.glob(os.path.join(folder, '**', '*.html'), recursive=True):
+        with open(path, encoding='utf-8') as template:
+            tokens = (token.rstrip(':.') for token in CLASS_TOKEN.findall(template.read()))
+            # 'fa-sort-' from fa-sort-{{ ... }} and the like: covered by SAFELIST
+            candidates.update(token for token in tokens if not token.endswith('-'))
+    return candidates
+
+def minify(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return re.sub(r'\s+', ' ', css).replace(';}', '}').strip() + '\n'
+
+def _fingerprint(name, content):
+    stem, extension = name.rsplit('.', 1)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}.{extension}'
+
+# Icons
+
+def _codepoints():
+    codepoints = {}
+    for selectors, codepoint in ICON_RULE.findall(_read(FONT_AWESOME_CSS)):
+        for name in re.findall(r'\.fa-([a-z0-9-]+):before', selectors):
+            codepoints[name] = int(codepoint, 16)
+    return codepoints
+
+def _icon_font(codepoints):
+    """Subset the vendored font to `codepoints`; returns (bytes, css format)"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    try:
+        import brotli  # noqa: F401 -- needed by fontTools for WOFF2
+        flavor = 'woff2'
+    except ImportError:
+        flavor = 'woff'
+    options = subset.Options()
+    options.flavor = flavor
+    options.layout_features = []
+    options.name_IDs = []
+    options.notdef_outline = True
+    options.drop_tables += ['FFTM']
+    font = TTFont(os.path.join(ASSETS_DIR, FONT_AWESOME_FONT), recalcTimestamp=False)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.flavor = flavor
+    font.save(output)
+    return output.getvalue(), flavor
+
+def build_icons(candidates):
+    """Returns (css, font bytes, font file name, unknown icon names)"""
+    codepoints = _codepoints()
+    used, unknown = {}, []
+    for candidate in sorted(candidates):
+        if not candidate.startswith('fa-') or candidate in ICON_MODIFIERS:
+            continue
+        name = candidate[3:]
+        codepoint = codepoints.get(ICON_ALIASES.get(name, name))
+        if codepoint is None:
+            unknown.append(candidate)
+        else:
+            used[candidate] = codepoint
+    font, flavor = _icon_font(sorted(set(used.values())))
+    font_name = _fingerprint(f'icons.{flavor}', font)
+    rules = [
+        f'@font-face{{font-family:{ICON_FONT_FAMILY};src:url({font_name}) format("{flavor}");'
+        'font-weight:normal;font-style:normal;font-display:block}',
+        f'.fa,.fas,.fab{{display:inline-block;font:normal normal normal 14px/1 {ICON_FONT_FAMILY};'
+        'font-size:inherit;text-rendering:auto;-webkit-font-smoothing:antialiased;-moz-osx-font-smoothing:grayscale}',
+    ]
+    rules += [f'.{name}{{{declarations}}}' for name, declarations in ICON_MODIFIERS.items() if name in candidates]
+    if 'fa-spin' in candidates:
+        rules.append('@keyframes fa-spin{0%{transform:rotate(0deg)}100%{transform:rotate(359deg)}}')
+    rules += [f'.{name}:before{{content:"\\{codepoint:x}"}}' for name, codepoint in used.items()]
+    return '\n'.join(rules) + '\n', font, font_name, unknown
+
+# Build
+
+def _compressed(content):
+    """Precompressed variants by suffix; gzip without a timestamp so builds are reproducible"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['.br'] = brotli.compress(content, quality=11)
+    except ImportError:
+        current_app.logger.warning('brotli is not installed; skipping .br variants')
+    return variants
+
+def compile_bundle(template_folder=TEMPLATES_DIR):
+    """Build every output in memory; returns (files, manifest, unknown class names)"""
+    candidates = scan_templates(template_folder)
+    utilities, unknown = generate(candidates)
+    icons_css, font, font_name, unknown_icons = build_icons(candidates)
+    css = minify('\n'.join([_read(source) for source in SOURCES] + [icons_css, utilities])).encode()
+    css_name = _fingerprint('app.css', css)
+
+    files = {font_name: font, css_name: css}
+    files.update({css_name + suffix: data for suffix, data in _compressed(css).items()})
+    manifest = {'app.css': css_name, 'icons.' + font_name.rsplit('.', 1)[1]: font_name}
+    return files, manifest, sorted(unknown + unknown_icons)
+
+def build(check=False, dist=DIST_DIR):
+    """Write the bundle to `dist` and remove outputs of earlier builds.
+
+    With `check`, nothing is written; AssetError is raised if the committed
+    bundle is out of date with the templates. Returns (manifest, unknown).
+    """
+    files, manifest, unknown = compile_bundle()
+    manifest_path = os.path.join(dist, 'manifest.json')
+    if check:
+        if load_manifest(manifest_path) != manifest or not all(
+                os.path.exists(os.path.join(dist, name)) for name in files):
+            raise AssetError('The asset bundle is out of date; run flask build-assets.')
+        return manifest, unknown
+
+    os.makedirs(dist, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(dist, name), 'wb') as output:
+            output.write(content)
+    with open(manifest_path, 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+        output.write('\n')
+    for entry in os.scandir(dist):
+        if entry.is_file() and entry.name != 'manifest.json' and entry.name not in files:
+            os.remove(entry.path)
+    return manifest, unknown
+
+# Serving
+
+def load_manifest(path=os.path.join(DIST_DIR, 'manifest.json')):
+    try:
+        with open(path) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+def asset_url(name):
+    """URL of the fingerprinted build of `name`, e.g. asset_url('app.css')"""
+    manifest = current_app.extensions['asset_manifest']
+    if current_app.debug:
+        manifest = load_manifest()
+    if name not in manifest:
+        raise AssetError(f'{name} is not in the asset manifest; run flask build-assets.')
+    return url_for('assets.serve', filename=manifest[name])
+
+def init_app(app):
+    app.extensions['asset_manifest'] = load_manifest()
+    app.jinja_env.globals['asset_url'] = asset_url
@@ -0,0 +1,229 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+import json
+import threading
+import time
+
+from app.models import Property, Lease, Payment, MaintenanceRequest
+from app.services.database import primary_reads
+
+# Keys
+LANDING_KEY = 'landing'
+
+def dashboard_key(owner_id):
+    """Cache key for the dashboard stats of an owner scope (None = admin / whole portfolio)"""
+    return 'dashboard:all' if owner_id is None else f'dashboard:owner:{owner_id}'
+
+def reports_key(owner_id):
+    """Cache key holding the version of an owner scope's cached reports (see services.reports)"""
+    return 'reports:all' if owner_id is None else f'reports:owner:{owner_id}'
+
+class MemoryCache:
+    """In-process cache with per-entry TTL and LRU eviction.
+
+    Each gunicorn worker holds its own copy; invalidations only reach the
+    worker that performed the write, so entries in other workers live until
+    their TTL runs out. Use the redis backend when that is not acceptable.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """Cache shared by every worker, stored as JSON in Redis.
+
+    Expiry uses Redis TTLs; LRU eviction is left to the server's
+    maxmemory-policy (e.g. allkeys-lru). Requires the `redis` package.
+    """
+
+    def __init__(self, url, default_ttl=60, prefix='rental:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or self.default_ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+def create_backend(config):
+    """Build the cache backend named by CACHE_BACKEND"""
+    backend = config.get('CACHE_BACKEND', 'memory')
+    ttl = config.get('CACHE_DEFAULT_TTL', 60)
+    if backend == 'memory':
+        return MemoryCache(max_entries=config.get('CACHE_MAX_ENTRIES', 1024), default_ttl=ttl)
+    if backend == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], default_ttl=ttl)
+    raise ValueError(f'Unknown CACHE_BACKEND {backend!r}')
+
+def get_cache():
+    """The current app's cache backend, or None outside an app context"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('cache')
+
+def cached(key, factory, ttl=None):
+    """Return the cached value for `key`, computing and storing it with `factory` on a miss.
+
+    Misses are computed from the primary: other users would otherwise be
+    served a lagging replica's numbers until the entry expires.
+    """
+    cache = get_cache()
+    if cache is None:
+        return factory()
+    value = cache.get(key)
+    if value is None:
+        with primary_reads():
+            value = factory()
+        cache.set(key, value, ttl)
+    return value
+
+# Invalidation
+
+WATCHED_MODELS = (Property, Lease, Payment, MaintenanceRequest)
+
+class _Unresolved(Exception):
+    """An attribute needed to find the owner was not loaded"""
+
+def _values(obj, attribute):
+    """Current and pre-flush values of an attribute, without triggering a load"""
+    state = inspect(obj)
+    if attribute not in state.dict:
+        raise _Unresolved(attribute)
+    values = {state.dict[attribute], *(state.attrs[attribute].history.deleted or ())}
+    values.discard(None)
+    return values
+
+def _affected_owners(session, objects):
+    """Owner ids touched by the flushed objects; None when some could not be resolved"""
+    owners, property_ids, lease_ids = set(), set(), set()
+    property_owners, lease_properties = {}, {}
+
+    try:
+        for obj in objects:
+            if isinstance(obj, Property):
+                owners |= _values(obj, 'owner_id')
+                property_owners[obj.id] = obj.owner_id
+            elif isinstance(obj, Lease):
+                property_ids |= _values(obj, 'property_id')
+                lease_properties[obj.id] = obj.property_id
+            elif isinstance(obj, MaintenanceRequest):
+                property_ids |= _values(obj, 'property_id')
+            elif isinstance(obj, Payment):
+                lease_ids |= _values(obj, 'lease_id')
+    except _Unresolved:
+        return None
+
+    connection = session.connection()
+    unknown_leases = lease_ids - set(lease_properties)
+    if unknown_leases:
+        rows = connection.execute(select(Lease.id, Lease.property_id).where(Lease.id.in_(unknown_leases)))
+        lease_properties.update(dict(rows.all()))
+    if not lease_ids <= set(lease_properties):
+        return None
+    property_ids |= {lease_properties[lease_id] for lease_id in lease_ids}
+
+    unknown_properties = property_ids - set(property_owners)
+    if unknown_properties:
+        rows = connection.execute(select(Property.id, Property.owner_id)
+                                  .where(Property.id.in_(unknown_properties)))
+        property_owners.update(dict(rows.all()))
+    if not property_ids <= set(property_owners):
+        return None
+    return owners | {property_owners[property_id] for property_id in property_ids}
+
+def _collect_invalidations(session, flush_context):
+    objects = [obj for obj in (*session.new, *session.dirty, *session.deleted)
+               if isinstance(obj, WATCHED_MODELS)]
+    if not objects or get_cache() is None:
+        return
+    pending = session.info.setdefault('cache_invalidations', {'keys': set(), 'clear': False})
+    owners = _affected_owners(session, objects)
+    if owners is None:
+        pending['clear'] = True
+        return
+    pending['keys'].update((dashboard_key(None), reports_key(None)))
+    pending['keys'].update(dashboard_key(owner_id) for owner_id in owners)
+    pending['keys'].update(reports_key(owner_id) for owner_id in owners)
+    if any(isinstance(obj, Property) for obj in objects):
+        pending['keys'].add(LANDING_KEY)
+
+def _apply_invalidations(session):
+    pending = session.info.pop('cache_invalidations', None)
+    cache = get_cache()
+    if not pending or cache is None:
+        return
+    if pending['clear']:
+        cache.clear()
+    elif pending['keys']:
+        cache.delete(*pending['keys'])
+
+def invalidate(owner_ids, landing=False):
+    """Drop dashboard and report entries for `owner_ids` (and the landing counts) after a bulk write"""
+    cache = get_cache()
+    if cache is None:
+        return
+    keys = {dashboard_key(None), reports_key(None), *(dashboard_key(owner_id) for owner_id in owner_ids),
+            *(reports_key(owner_id) for owner_id in owner_ids)}
+    if landing:
+        keys.add(LANDING_KEY)
+    cache.delete(*keys)
+
+def _discard_invalidations(session, previous_transaction=None):
+    session.info.pop('cache_invalidations', None)
+
+def init_app(app):
+    """Attach the configured cache backend and invalidate it on committed writes"""
+    app.extensions['cache'] = create_backend(app.config)
+    if not event.contains(Session, 'after_flush', _collect_invalidations):
+        event.listen(Session, 'after_flush', _collect_invalidations)
+        event.listen(Session, 'after_commit', _apply_invalidations)
+        event.listen(Session, 'after_soft_rollback', _discard_invalidations)
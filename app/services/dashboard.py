@@ -0,0 +1,40 @@
+from app import db
+from app.models import Property, Lease, Payment, MaintenanceRequest
+from app.services.portfolio import get_summary
+from app.services.scoping import scope_to_owner
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
+from datetime import datetime, timedelta
+
+def get_stats(owner_id=None, expiring_within=30):
+    """Dashboard counters: the owner's portfolio summary plus leases expiring soon"""
+    stats = get_summary(owner_id)
+    
+    today = datetime.now().date()
+    stats['expiring_leases'] = (
+        scope_to_owner(db.session.query(func.count(Lease.id)), Lease.property_id, owner_id)
+        .filter(Lease.end_date >= today, Lease.end_date <= today + timedelta(days=expiring_within))
+        .scalar()
+    )
+    return stats
+
+def get_landing_counts():
+    """Portfolio-wide property counts shown on the landing page"""
+    counts = dict(db.session.query(Property.availability_status, func.count(Property.id))
+                  .group_by(Property.availability_status).all())
+    return {
+        'total_properties': sum(counts.values()),
+        'available_properties': counts.get('available', 0),
+    }
+
+def get_recent_payments(owner_id=None, limit=5):
+    """Most recently recorded payments"""
+    query = scope_to_owner(Payment.query.join(Lease), Lease.property_id, owner_id)
+    query = query.options(contains_eager(Payment.lease).joinedload(Lease.property))
+    return query.order_by(Payment.created_at.desc(), Payment.id.desc()).limit(limit).all()
+
+def get_recent_maintenance(owner_id=None, limit=5):
+    """Most recently opened maintenance requests"""
+    query = scope_to_owner(MaintenanceRequest.query, MaintenanceRequest.property_id, owner_id)
+    query = query.options(joinedload(MaintenanceRequest.property))
+    return query.order_by(MaintenanceRequest.created_at.desc(), MaintenanceRequest.id.desc()).limit(limit).all()
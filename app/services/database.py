@@ -0,0 +1,206 @@
+"""Engine profile: connection pool settings and per-connection tuning.
+
+Every engine gets the DB_POOL_* settings. SQLite connections switch to WAL
+(readers no longer block the writer or each other) with the SQLITE_* pragmas
+and enforce foreign keys, so ON DELETE CASCADE works as on other databases.
+PostgreSQL sessions get a statement timeout and are checked before use.
+
+pysqlite's own transaction handling is replaced by explicit BEGINs, which
+also makes SAVEPOINTs work. Transactions that will write start with BEGIN
+IMMEDIATE so they take the write lock up front (under 'auto': non-GET
+requests, and jobs and commands inside `write_transactions()`): a deferred transaction that
+reads and then writes fails with `database is locked` straight away if
+another writer committed in between, instead of waiting out busy_timeout.
+
+With DATABASE_REPLICA_URL set, RoutingSession sends the reads of GET/HEAD/
+OPTIONS requests, and of `replica_reads()` blocks, to a 'replica' bind.
+Everything else uses the primary, as do the requests of a user who wrote
+(by flushing, or with an INSERT/UPDATE/DELETE through session.execute())
+within the last REPLICA_STALENESS_WINDOW seconds, so they see their own
+writes even while the replica lags behind. Values computed for the cache are
+read inside `primary_reads()`, so a lagging replica never fills it.
+"""
+from flask import current_app, g, has_app_context, has_request_context, request, session as browser_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+import sqlite3
+import time
+
+# Requests that only read, and work outside requests not marked as writing, start a deferred transaction under 'auto'
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+TRANSACTION_MODES = {'auto', 'deferred', 'immediate'}
+REPLICA_BIND = 'replica'
+# Browser session key: until this timestamp the user's reads stay on the primary
+PRIMARY_UNTIL = '_db_primary_until'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_primary_reads = ContextVar('primary_reads', default=False)
+_writes = ContextVar('writes', default=False)
+
+def _in_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(config, url=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database at `url` (default: the app's)"""
+    url = make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    if _in_memory(url):
+        return {}  # Flask-SQLAlchemy gives these one shared connection
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server connections can be dropped by the server or a proxy while idle
+        options.update(pool_pre_ping=True, pool_recycle=config['DB_POOL_RECYCLE'])
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"}
+    return options
+
+def sqlite_pragmas(config):
+    return [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('temp_store', 'MEMORY'),
+        ('foreign_keys', 'ON'),
+    ]
+
+def _sqlite_connect(pragmas, dbapi_connection, connection_record):
+    # Autocommit at the driver level; _sqlite_begin opens every transaction
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas:
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+def _wants_write_lock(mode):
+    if mode == 'auto':
+        if has_request_context():
+            return request.method not in READ_ONLY_METHODS
+        return _writes.get()
+    return mode == 'immediate'
+
+@contextmanager
+def write_transactions():
+    """Start transactions with BEGIN IMMEDIATE inside the block, for jobs and commands that write"""
+    token = _writes.set(True)
+    try:
+        yield
+    finally:
+        _writes.reset(token)
+
+def _sqlite_begin(mode, connection):
+    connection.exec_driver_sql('BEGIN IMMEDIATE' if _wants_write_lock(mode) else 'BEGIN')
+
+def configure_engine(engine, config):
+    """Install the per-connection listeners for `engine`; call before it connects"""
+    if engine.dialect.name != 'sqlite':
+        return
+    mode = config['SQLITE_TRANSACTION_MODE'].lower()
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f'SQLITE_TRANSACTION_MODE must be one of {sorted(TRANSACTION_MODES)}, not {mode!r}')
+    pragmas = sqlite_pragmas(config)
+    if _in_memory(engine.url):
+        pragmas = [(name, value) for name, value in pragmas if name != 'journal_mode']
+    event.listen(engine, 'connect', partial(_sqlite_connect, pragmas))
+    event.listen(engine, 'begin', partial(_sqlite_begin, mode))
+
+# Read replica
+
+class RoutingSession(Session):
+    """Session that reads from the replica bind when _reads_from_replica allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) \
+                and not self.info.get('wrote') and _reads_from_replica():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _reads_from_replica():
+    if _primary_reads.get():
+        return False
+    if _replica_reads.get():
+        return True
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return False
+    return browser_session.get(PRIMARY_UNTIL, 0) <= time.time()
+
+@contextmanager
+def replica_reads():
+    """Read from the replica inside the block, e.g. for reports run outside a request"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to compute values that are cached for everyone"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+def _mark_write(session, flush_context=None):
+    # Later reads in this session must see the written rows, which only the primary has
+    session.info['wrote'] = True
+    if has_app_context():
+        g.db_wrote = True
+
+def _mark_dml(orm_execute_state):
+    # INSERT/UPDATE/DELETE sent through session.execute() never flush, so after_flush misses them
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write(orm_execute_state.session)
+
+def _pin_to_primary(response):
+    if g.get('db_wrote'):
+        browser_session[PRIMARY_UNTIL] = time.time() + current_app.config['REPLICA_STALENESS_WINDOW']
+    return response
+
+def copy_to_replica():
+    """Copy the primary SQLite database over the replica file; a local stand-in for replication"""
+    engines = current_app.extensions['sqlalchemy'].engines
+    primary, replica = engines[None], engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise ValueError('Only SQLite databases can be copied; replicate other databases with their own tools.')
+    replica.dispose()
+    source, target = sqlite3.connect(primary.url.database), sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+def init_app(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS and the replica bind; options set in the config take precedence"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config),
+                                                **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {
+            **(app.config.get('SQLALCHEMY_BINDS') or {}),
+            REPLICA_BIND: {'url': replica_url, **engine_options(app.config, replica_url)},
+        }
+
+def init_engines(app):
+    """Tune the engines Flask-SQLAlchemy created for `app` and start routing reads"""
+    with app.app_context():
+        engines = app.extensions['sqlalchemy'].engines
+        for engine in engines.values():
+            configure_engine(engine, app.config)
+        if REPLICA_BIND in engines:
+            if not event.contains(RoutingSession, 'after_flush', _mark_write):
+                event.listen(RoutingSession, 'after_flush', _mark_write)
+                event.listen(RoutingSession, 'do_orm_execute', _mark_dml)
+            app.after_request(_pin_to_primary)
@@ -0,0 +1,152 @@
+"""Deleting properties, tenants, leases and users together with their history.
+
+The database removes the leases, payments and maintenance requests below a
+deleted row itself (ON DELETE CASCADE; SQLite enforces it through the
+foreign_keys pragma), and the relationships are passive, so nothing is
+loaded just to be deleted. When some part of the history is longer than
+DELETE_BATCH_SIZE rows it is cleared first, one batch per transaction, so no
+single delete holds the write lock for long; the owners' portfolio
+summaries are recomputed when the row itself goes.
+
+Files are never removed inside the request: receipts and pre-pipeline photos
+of the deleted rows are queued in file_removals in the same transaction, and
+`remove_files` deletes them afterwards in the background. Content-addressed
+photos may be shared and are left to images.collect_garbage.
+"""
+from flask import current_app
+from app import db
+from app.models import Property, Tenant, Lease, Payment, MaintenanceRequest, Notification, FileRemoval
+from app.services import cache, portfolio
+from sqlalchemy import DateTime, delete, insert, literal, or_, select
+from datetime import datetime
+import os
+
+# Queueing files
+
+def _queue_files(properties=None, payments=None):
+    """Queue pre-pipeline photos of the `properties` and receipts of the `payments` (criteria) for removal"""
+    now = literal(datetime.utcnow(), DateTime)
+    sources = []
+    if properties is not None:
+        sources.append(select(Property.image_path, now)
+                       .where(properties, Property.image_path.isnot(None), Property.image_hash.is_(None)))
+    if payments is not None:
+        sources.append(select(Payment.receipt_path, now).where(payments, Payment.receipt_path.isnot(None)))
+    for source in sources:
+        db.session.execute(insert(FileRemoval).from_select(['path', 'created_at'], source))
+
+# Deleting
+
+def _history(properties=None, tenants=None):
+    """(model, criterion) for the rows below the given property and tenant ids, children first"""
+    def below(*columns):
+        return or_(*(column.in_(ids) for column, ids in zip(columns, (properties, tenants)) if ids is not None))
+
+    leases = below(Lease.property_id, Lease.tenant_id)
+    return [
+        (Payment, Payment.lease_id.in_(select(Lease.id).where(leases))),
+        (MaintenanceRequest, below(MaintenanceRequest.property_id, MaintenanceRequest.tenant_id)),
+        (Lease, leases),
+    ]
+
+def _exceeds(model, criterion, size):
+    return db.session.execute(select(model.id).where(criterion).offset(size).limit(1)).first() is not None
+
+def _delete_in_batches(model, criterion, batch_size):
+    """Delete the matching rows `batch_size` at a time, committing each batch; returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = db.session.scalars(select(model.id).where(criterion).order_by(model.id).limit(batch_size)).all()
+        if not ids:
+            return deleted
+        if model is Payment:
+            _queue_files(payments=Payment.id.in_(ids))
+        elif model is Property:
+            _queue_files(properties=Property.id.in_(ids))
+        db.session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+
+def _delete(obj, history, owners, properties=None):
+    """Delete `obj`, clearing a long `history` in batches first; returns True when it was batched"""
+    batch_size = current_app.config['DELETE_BATCH_SIZE']
+    batched = any(_exceeds(model, criterion, batch_size) for model, criterion in history)
+    if batched:
+        for model, criterion in history:
+            _delete_in_batches(model, criterion, batch_size)
+    _queue_files(properties, history[0][1])
+    db.session.delete(obj)
+    db.session.flush()
+    if batched:
+        # The flush only sees what is left, so recompute from the source tables
+        portfolio.recompute_owners(db.session.connection(), owners)
+    db.session.commit()
+    cache.invalidate(owners, landing=True)
+    return batched
+
+def delete_property(property):
+    """Delete a property with its leases, payments and maintenance requests"""
+    return _delete(property, _history(properties=[property.id]), {property.owner_id},
+                   properties=Property.id == property.id)
+
+def delete_tenant(tenant):
+    """Delete a tenant profile with its leases, payments and maintenance requests"""
+    owners = portfolio.affected_owners(db.session.connection(), tenants=[tenant.id])
+    return _delete(tenant, _history(tenants=[tenant.id]), owners)
+
+def delete_lease(lease):
+    """Delete a lease with its payments"""
+    return _delete(lease, [(Payment, Payment.lease_id == lease.id)], {lease.property.owner_id})
+
+def delete_user(user):
+    """Delete a user with their properties, tenant profiles, notifications and everything below them"""
+    properties = select(Property.id).where(Property.owner_id == user.id)
+    tenants = select(Tenant.id).where(Tenant.user_id == user.id)
+    owners = portfolio.affected_owners(db.session.connection(), tenants=tenants) - {user.id}
+    history = _history(properties, tenants) + [
+        (Property, Property.owner_id == user.id),
+        (Notification, Notification.user_id == user.id),
+    ]
+    return _delete(user, history, owners, properties=Property.owner_id == user.id)
+
+# Removing queued files
+
+def _upload_path(static_path):
+    """Filesystem path of an 'uploads/...' static path, or None if it points outside the upload folder"""
+    folder = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    if not static_path.startswith('uploads/'):
+        return None
+    path = os.path.realpath(os.path.join(folder, static_path.split('/', 1)[1]))
+    return path if path.startswith(folder + os.sep) else None
+
+def has_queued_files():
+    """Cheap check the workers make before starting (and recording) a removal run"""
+    return db.session.execute(select(FileRemoval.id).limit(1)).first() is not None
+
+def remove_files(batch_size=500):
+    """Delete the queued files, skipping any a property or payment points to again; returns counts"""
+    counts = {'removed': 0, 'missing': 0, 'kept': 0}
+    while True:
+        rows = db.session.execute(select(FileRemoval.id, FileRemoval.path)
+                                  .order_by(FileRemoval.id).limit(batch_size)).all()
+        if not rows:
+            return counts
+        paths = {row.path for row in rows}
+        referenced = set(db.session.scalars(select(Property.image_path).where(Property.image_path.in_(paths))))
+        referenced |= set(db.session.scalars(select(Payment.receipt_path).where(Payment.receipt_path.in_(paths))))
+        for path in paths:
+            filename = _upload_path(path)
+            if path in referenced or filename is None:
+                counts['kept'] += 1
+                continue
+            try:
+                os.remove(filename)
+                counts['removed'] += 1
+            except FileNotFoundError:
+                counts['missing'] += 1
+        db.session.execute(delete(FileRemoval).where(FileRemoval.id.in_([row.id for row in rows])))
+        db.session.commit()
+        if len(rows) < batch_size:
+            return counts
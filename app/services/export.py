@@ -0,0 +1,65 @@
+from flask import Response, stream_with_context
+from datetime import date, datetime
+import csv
+import io
+import tempfile
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+YIELD_PER = 1000
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def stream_rows(query, columns):
+    """Yield plain row tuples for `columns`, fetched YIELD_PER at a time.
+
+    yield_per keeps only one batch in memory and, on PostgreSQL, switches to
+    a server-side cursor, so rows start arriving before the query completes.
+    """
+    labelled = [column.label(name) for name, column in columns]
+    yield from query.with_entities(*labelled).yield_per(YIELD_PER)
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _xlsx_chunks(header, rows, title):
+    # An xlsx file is a zip archive, so the whole workbook has to be written before
+    # any of it can be sent; write-only mode spills rows to a temp file meanwhile.
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(header)
+    for row in rows:
+        sheet.append(list(row))
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+def export_response(query, columns, name, export_format):
+    """Stream `query` as a CSV or XLSX download with one column per (header, column) pair"""
+    header = [label for label, _ in columns]
+    rows = stream_rows(query, columns)
+    filename = f'{name}-{date.today().isoformat()}.{export_format}'
+    if export_format == 'xlsx':
+        body, mimetype = _xlsx_chunks(header, rows, name.capitalize()), XLSX_MIMETYPE
+    else:
+        body, mimetype = _csv_chunks(header, rows), 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -0,0 +1,173 @@
+"""Rent and vacancy forecast, projected with NumPy over every unit at once.
+
+All active leases (and the properties without one) are read in a single
+query into columnar arrays. The projection then works on (units x months)
+matrices: a lease pays its contracted rent through its end month; after
+that, the unit follows the expected occupancy of a renewal process that only
+depends on the months since expiry. At each expiry the tenant renews with
+probability `renewal` for another `term` months at the rent plus `uplift`;
+otherwise the unit stands empty for `downtime` months and is re-let at the
+property's asking rent. Those occupancy curves are built once per forecast
+with one step per month, and looked up for every unit by fancy indexing, so
+no Python loop runs per unit and month.
+"""
+from flask import current_app
+from sqlalchemy import and_, extract, select
+from datetime import date
+import numpy as np
+
+from app import db
+from app.models import User, Property, Lease
+from app.services.reports import REPORT_ROWS, add_months, cached_report
+
+GROUPS = ('city', 'property_type', 'owner')
+MEASURES = ('contracted', 'expected', 'expiring_rent', 'expiring_leases', 'vacant')
+
+# Loading
+
+def _month_number(column):
+    """SQL expression: year * 12 + month - 1 of the date in `column` (NULL for no date)"""
+    return extract('year', column) * 12 + extract('month', column) - 1
+
+def load_units(owner_id=None):
+    """Columnar arrays with one entry per active lease, plus one per property without an active lease.
+
+    Dates come back as month numbers computed in SQL, which is much cheaper
+    than building a date object per lease.
+    """
+    query = (select(Property.owner_id, Property.city, Property.property_type, Property.rent_amount,
+                    _month_number(Lease.start_date), _month_number(Lease.end_date), Lease.monthly_rent)
+             .outerjoin(Lease, and_(Lease.property_id == Property.id, Lease.status == 'active')))
+    if owner_id is not None:
+        query = query.where(Property.owner_id == owner_id)
+    rows = db.session.execute(query).all()
+    owners, cities, types, asking, starts, ends, rents = zip(*rows) if rows else ((),) * 7
+    ends = np.array(ends, dtype=np.float64)  # NULL (no lease) becomes NaN
+    leased = ~np.isnan(ends)
+    return {
+        'owner': np.array(owners, dtype=np.int64),
+        'city': np.array(cities, dtype=object),
+        'property_type': np.array(types, dtype=object),
+        'asking': np.array(asking, dtype=np.float64),
+        'start': np.nan_to_num(np.array(starts, dtype=np.float64)).astype(np.int64),
+        'end': np.where(leased, ends, 0).astype(np.int64),
+        'rent': np.nan_to_num(np.array(rents, dtype=np.float64)),
+        'leased': leased,
+    }
+
+# Projection
+
+def occupancy_curves(months, renewal, downtime, term):
+    """Expected occupancy by months since a lease ended, for a leased and a vacant unit.
+
+    Returns (incumbent, newcomer), each shaped (2, months): row 0 starts with
+    an expiry, row 1 with an empty unit. `incumbent` is the chance the
+    original tenant is still renting, `newcomer` that a new tenant is.
+    """
+    incumbent = np.zeros((2, months))
+    incumbent[0] = renewal ** (1 + np.arange(months) // term)
+    occupied = np.zeros((2, months + downtime + term))
+    for row, first_renewal in enumerate((renewal, 0.0)):
+        expiries = np.zeros(months + downtime + term)
+        expiries[0] = 1.0
+        for month in range(months):
+            share = expiries[month]
+            if not share:
+                continue
+            renewed = share * (renewal if month else first_renewal)
+            occupied[row, month:month + term] += renewed
+            occupied[row, month + downtime:month + downtime + term] += share - renewed
+            expiries[month + term] += renewed
+            expiries[month + downtime + term] += share - renewed
+    return incumbent, occupied[:, :months] - incumbent
+
+def project(units, start, months, renewal, downtime, term=12, uplift=0.0):
+    """(units x months) matrices of rent and vacancy from the month of `start`"""
+    first = start.year * 12 + start.month - 1
+    calendar = first + np.arange(months)
+    # Leases that ran out before `start` but are still active are treated as ending the month before
+    end = np.where(units['leased'], np.maximum(units['end'], first - 1), first - 1)
+    since = calendar[None, :] - end[:, None] - 1  # months since expiry; negative while the lease runs
+    running = since < 0
+    incumbent, newcomer = occupancy_curves(months, renewal, downtime, term)
+    curve = (~units['leased']).astype(np.intp)[:, None]
+    after = np.maximum(since, 0)
+    incumbent, newcomer = incumbent[curve, after], newcomer[curve, after]
+    rent = units['rent'][:, None]
+    contracted = np.where(running & (calendar[None, :] >= units['start'][:, None]), rent, 0.0)
+    expected = np.where(running, contracted,
+                        rent * (1 + uplift) * incumbent + units['asking'][:, None] * newcomer)
+    expiring = since == -1
+    return {
+        'contracted': contracted,
+        'expected': expected,
+        'expiring_rent': np.where(expiring, rent, 0.0),
+        'expiring_leases': expiring.astype(np.float64),
+        'vacant': np.where(running, 0.0, 1 - incumbent - newcomer),
+    }
+
+def summarize(units, projection, group):
+    """Per-group monthly sums of each measure, as (keys, unit counts, {measure: (groups x months)})"""
+    keys, codes = np.unique(units[group], return_inverse=True)
+    months = projection['expected'].shape[1]
+    cells = (codes[:, None] * months + np.arange(months)).ravel()  # (group, month) cell of every entry
+    sums = {name: np.bincount(cells, weights=projection[name].ravel(), minlength=len(keys) * months)
+            .reshape(len(keys), months) for name in MEASURES}
+    return keys, np.bincount(codes, minlength=len(keys)), sums
+
+# Report
+
+def assumptions(renewal=None, downtime=None):
+    """Forecast settings, with the configured defaults for anything not given"""
+    config = current_app.config
+    return {
+        'renewal': config['FORECAST_RENEWAL_PROBABILITY'] if renewal is None else renewal,
+        'downtime': config['FORECAST_DOWNTIME_MONTHS'] if downtime is None else downtime,
+        'term': config['FORECAST_RENEWAL_TERM_MONTHS'],
+        'uplift': config['FORECAST_RENEWAL_UPLIFT'],
+        'months': config['FORECAST_MONTHS'],
+    }
+
+def _labels(group, keys):
+    if group != 'owner':
+        return [str(key) for key in keys]
+    names = dict(db.session.query(User.id, User.username).filter(User.id.in_(keys.tolist())))
+    return [names.get(key, f'Owner #{key}') for key in keys.tolist()]
+
+def _money(values):
+    return [round(value, 2) for value in values.tolist()]
+
+def forecast(owner_id=None, group='city', settings=None, start=None, limit=REPORT_ROWS):
+    """Expected rent, expiring leases and vacancy per month, in total and per group"""
+    if group not in GROUPS:
+        raise ValueError(f'group must be one of {GROUPS}, not {group!r}')
+    settings = settings or assumptions()
+    start = (start or date.today()).replace(day=1)
+
+    def build():
+        units = load_units(owner_id)
+        projection = project(units, start, settings['months'], settings['renewal'],
+                             settings['downtime'], settings['term'], settings['uplift'])
+        keys, counts, sums = summarize(units, projection, group)
+        yearly = np.add.reduceat(sums['expected'], np.arange(0, settings['months'], 12), axis=1)
+        ranked = np.argsort(-sums['expected'].sum(axis=1), kind='stable')[:limit]
+        labels = _labels(group, keys[ranked])
+        totals = {name: sums[name].sum(axis=0) for name in MEASURES}
+        return {
+            'months': [add_months(start, offset).strftime('%Y-%m') for offset in range(settings['months'])],
+            'units': int(counts.sum()),
+            'groups': len(keys),
+            'totals': {name: _money(values) for name, values in totals.items()},
+            'rows': [{
+                'key': key.item() if isinstance(key, np.generic) else key,
+                'label': label,
+                'units': int(counts[index]),
+                'years': _money(yearly[index]),
+                'expected': round(float(sums['expected'][index].sum()), 2),
+                'expiring_rent': round(float(sums['expiring_rent'][index].sum()), 2),
+                'vacancy_rate': round(float(sums['vacant'][index].mean() / counts[index]), 4),
+            } for index, key, label in zip(ranked.tolist(), keys[ranked], labels)],
+        }
+
+    params = (group, start, limit, *(settings[name] for name in sorted(settings)))
+    return cached_report(owner_id, 'forecast', params, build)
@@ -0,0 +1,282 @@
+"""Content-addressed property photos.
+
+Uploads are streamed to disk while hashing, stored once per SHA-256 digest,
+and resized into fixed renditions by a background worker:
+
+    uploads/originals/ab/<digest>.<ext>
+    uploads/renditions/ab/<digest>-<size>.<webp|jpg>
+
+The same stored image can back several properties, so requests never delete
+files; `collect_garbage` removes what no property references any more.
+"""
+from flask import current_app
+from app import db
+from app.models import Payment, Property, StoredImage
+from sqlalchemy import delete, exists, select, update
+from datetime import datetime, timedelta
+import hashlib
+import importlib
+import itertools
+import os
+import tempfile
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+
+# Rendition -> bounding box; thumb is cropped to fill the list cards
+RENDITIONS = {
+    'thumb': (400, 300),
+    'medium': (800, 600),
+    'full': (1600, 1200),
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+CHUNK_SIZE = 64 * 1024
+ORIENTATION_TAG = 0x0112  # EXIF orientations 5-8 are rotated a quarter turn
+GC_GRACE = timedelta(hours=1)
+
+def allowed_image(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+def _file_path(static_path):
+    """Filesystem path of an 'uploads/...' static path"""
+    return os.path.join(_upload_folder(), static_path.split('/', 1)[1])
+
+def _stream_to_temp(stream):
+    """Copy the upload to a temp file in chunks, hashing as it goes; returns (path, digest, size)"""
+    folder = os.path.join(_upload_folder(), 'tmp')
+    os.makedirs(folder, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    handle, path = tempfile.mkstemp(dir=folder)
+    try:
+        with os.fdopen(handle, 'wb') as temp:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
+
+def _verify(path):
+    """Reject files that are not images Pillow can read (header check only)"""
+    from PIL import Image
+    with Image.open(path) as image:
+        image.verify()
+
+def store_upload(stream, filename):
+    """Save an uploaded image once per content hash; returns its StoredImage.
+
+    Runs in the caller's transaction. Uploading content that is already stored
+    reuses the row (and its renditions) instead of processing it again.
+    """
+    extension = filename.rsplit('.', 1)[1].lower()
+    extension = 'jpg' if extension == 'jpeg' else extension
+    temp_path, digest, size = _stream_to_temp(stream)
+    try:
+        _verify(temp_path)
+    except Exception:
+        os.remove(temp_path)
+        raise ValueError('The uploaded file is not a valid image.')
+
+    # Insert-or-touch without a savepoint: last_used_at keeps the garbage
+    # collector away from content that is being reused
+    now = datetime.utcnow()
+    _insert_if_missing(id=digest, extension=extension, size_bytes=size, status='pending',
+                       created_at=now, last_used_at=now)
+    db.session.execute(update(StoredImage).where(StoredImage.id == digest).values(last_used_at=now)
+                       .execution_options(synchronize_session=False))
+    image = db.session.get(StoredImage, digest)
+    original = _file_path(image.original_path)
+    os.makedirs(os.path.dirname(original), exist_ok=True)
+    os.replace(temp_path, original)
+    return image
+
+def _insert_if_missing(**values):
+    """INSERT ... ON CONFLICT DO NOTHING where the dialect has it, so concurrent
+    uploads of the same content do not fail the second request"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert
+        db.session.execute(dialect_insert(StoredImage).values(**values).on_conflict_do_nothing())
+    elif db.session.get(StoredImage, values['id']) is None:
+        db.session.add(StoredImage(**values))
+        db.session.flush()
+
+# Rendering
+
+def _save_rendition(image, path, options):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=folder)
+    os.close(handle)
+    try:
+        image.save(temp_path, **options)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+def render(image):
+    """Write every rendition of `image` and record its dimensions"""
+    from PIL import Image, ImageOps
+    with Image.open(_file_path(image.original_path)) as source:
+        width, height = source.size
+        if source.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+            width, height = height, width
+        image.width, image.height = width, height
+        # Let the JPEG decoder scale down while decoding instead of at full size
+        source.draft('RGB', RENDITIONS['full'])
+        picture = ImageOps.exif_transpose(source).convert('RGB')
+    for size, box in RENDITIONS.items():
+        if size == 'thumb':
+            resized = ImageOps.fit(picture, box, Image.LANCZOS)
+        else:
+            resized = picture.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+        for image_format, options in FORMATS.items():
+            _save_rendition(resized, _file_path(image.rendition_path(size, image_format)), options)
+
+def has_pending_images():
+    return db.session.execute(select(StoredImage.id)
+                              .where(StoredImage.status == 'pending').limit(1)).first() is not None
+
+def process_pending_images(batch_size=20, max_batches=50):
+    """Render pending images, committing after each; returns counts per outcome.
+
+    `max_batches` bounds one scheduled run (None drains the queue).
+    """
+    counts = {'processed': 0, 'failed': 0}
+    batches = itertools.count() if max_batches is None else range(max_batches)
+    for _ in batches:
+        images = db.session.scalars(select(StoredImage)
+                                    .where(StoredImage.status == 'pending')
+                                    .order_by(StoredImage.created_at)
+                                    .limit(batch_size)).all()
+        if not images:
+            break
+        for image in images:
+            try:
+                render(image)
+                image.status = 'ready'
+                counts['processed'] += 1
+            except Exception as e:
+                current_app.logger.warning(f'Image {image.id} could not be processed: {e}')
+                image.status = 'failed'
+                image.error = str(e)[:1000]
+                counts['failed'] += 1
+            image.processed_at = datetime.utcnow()
+            db.session.commit()
+        if len(images) < batch_size:
+            break
+    return counts
+
+# Garbage collection
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _stored_files(image_id, extension):
+    image = StoredImage(id=image_id, extension=extension)
+    paths = [image.original_path]
+    paths += [image.rendition_path(size, image_format) for size in RENDITIONS for image_format in FORMATS]
+    return [_file_path(path) for path in paths]
+
+def _collect_stored(cutoff, batch_size):
+    """Delete unreferenced image rows in batches, then their files"""
+    unreferenced = (~exists().where(Property.image_hash == StoredImage.id)) & (StoredImage.last_used_at < cutoff)
+    removed = 0
+    while True:
+        rows = db.session.execute(select(StoredImage.id, StoredImage.extension)
+                                  .where(unreferenced).limit(batch_size)).all()
+        if not rows:
+            return removed
+        # Conditional delete: a row reused since the select survives
+        db.session.execute(delete(StoredImage)
+                           .where(StoredImage.id.in_([row.id for row in rows]), unreferenced)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        surviving = set(db.session.scalars(select(StoredImage.id)
+                                           .where(StoredImage.id.in_([row.id for row in rows]))))
+        for row in rows:
+            if row.id not in surviving:
+                removed += sum(_remove(path) for path in _stored_files(row.id, row.extension))
+        if len(rows) < batch_size:
+            return removed
+
+def _collect_loose(cutoff):
+    """Remove stale temp files and pre-pipeline uploads or receipts no property or payment points to"""
+    removed = 0
+    folder = _upload_folder()
+    referenced = set(db.session.scalars(select(Property.image_path).where(Property.image_path.isnot(None))))
+    referenced |= set(db.session.scalars(select(Payment.receipt_path).where(Payment.receipt_path.isnot(None))))
+    candidates = [(entry, f'uploads/{entry.name}') for entry in os.scandir(folder) if entry.is_file()]
+    temp_folder = os.path.join(folder, 'tmp')
+    if os.path.isdir(temp_folder):
+        candidates += [(entry, None) for entry in os.scandir(temp_folder) if entry.is_file()]
+    for entry, static_path in candidates:
+        if static_path in referenced or datetime.utcfromtimestamp(entry.stat().st_mtime) >= cutoff:
+            continue
+        removed += _remove(entry.path)
+    return removed
+
+def _collect_untracked(cutoff):
+    """Remove content files without an images row, e.g. from a rolled-back upload"""
+    removed = 0
+    for kind in ('originals', 'renditions'):
+        root = os.path.join(_upload_folder(), kind)
+        if not os.path.isdir(root):
+            continue
+        for prefix in os.scandir(root):
+            if not prefix.is_dir():
+                continue
+            files = [entry for entry in os.scandir(prefix.path) if entry.is_file()]
+            digests = {entry.name.split('.')[0].split('-')[0] for entry in files}
+            known = set(db.session.scalars(select(StoredImage.id).where(StoredImage.id.in_(digests))))
+            for entry in files:
+                if (entry.name.split('.')[0].split('-')[0] not in known
+                        and datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff):
+                    removed += _remove(entry.path)
+    return removed
+
+def collect_garbage(grace=GC_GRACE, batch_size=500):
+    """Delete image files and rows that no property references any more.
+
+    Covers images orphaned by property deletes (including cascades from a
+    deleted owner) and replaced uploads. Anything used within `grace` is kept
+    so uploads in flight are never collected. Returns counts of files removed.
+    """
+    cutoff = datetime.utcnow() - grace
+    return {
+        'stored_files': _collect_stored(cutoff, batch_size),
+        'loose_files': _collect_loose(cutoff),
+        'untracked_files': _collect_untracked(cutoff),
+    }
+
+def adopt_legacy_images():
+    """Move pre-pipeline uploads (image_path without image_hash) into the pipeline"""
+    adopted = 0
+    properties = Property.query.filter(Property.image_path.isnot(None), Property.image_hash.is_(None)).all()
+    for property in properties:
+        path = _file_path(property.image_path)
+        if not os.path.exists(path) or not allowed_image(path):
+            continue
+        try:
+            with open(path, 'rb') as stream:
+                image = store_upload(stream, path)
+        except ValueError:
+            continue
+        property.image_hash = image.id
+        property.image_path = image.original_path
+        db.session.commit()
+        adopted += 1
+    return adopted
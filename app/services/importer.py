@@ -0,0 +1,511 @@
+from app import db
+from app.models import User, Property, Tenant, Lease, Payment
+from app.services import cache, occupancy, portfolio
+from sqlalchemy import func, insert, or_, select, update
+from werkzeug.security import generate_password_hash
+from collections import defaultdict
+from datetime import date, datetime
+from itertools import islice
+import csv
+import io
+import os
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+DEFAULT_TENANT_PASSWORD = 'changeme123'
+IMPORT_EXTENSIONS = {'csv', 'xlsx'}
+
+PROPERTY_TYPES = ('apartment', 'house', 'condo', 'townhouse', 'studio')
+PROPERTY_STATUSES = ('available', 'occupied', 'maintenance')
+LEASE_STATUSES = ('active', 'expired', 'terminated')
+PAYMENT_STATUSES = ('pending', 'paid', 'overdue')
+PAYMENT_METHODS = ('cash', 'bank_transfer', 'check', 'online')
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message goes into the error report"""
+
+# Reading files
+
+def read_rows(stream, filename):
+    """Yield (row_number, {column: value}) from a CSV or XLSX file one row at a time.
+
+    The first row holds the column names. CSV values are strings; XLSX cells
+    keep their types (numbers, datetimes). Blank rows are skipped.
+    """
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            yield from _with_header(csv.reader(text))
+        finally:
+            text.detach()
+    elif extension == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from _with_header(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError('Only .csv and .xlsx files can be imported')
+
+def _with_header(rows):
+    header = None
+    for number, values in enumerate(rows, start=1):
+        if header is None:
+            header = [str(value or '').strip().lower().replace(' ', '_') for value in values]
+            continue
+        if all(value is None or str(value).strip() == '' for value in values):
+            continue
+        yield number, dict(zip(header, values))
+
+# Parsing cell values
+
+def _text(row, column, required=False):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{column} is required')
+    return value or None
+
+def _number(row, column, cast=float, required=False):
+    value = _text(row, column, required)
+    if value is None:
+        return None
+    try:
+        return cast(float(value))
+    except ValueError:
+        raise RowError(f'{column} must be a number, got {value!r}')
+
+def _date(row, column, required=False):
+    value = row.get(column)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = _text(row, column, required)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f'{column} must be a date (YYYY-MM-DD), got {value!r}')
+
+def _choice(row, column, choices, default=None, required=False):
+    value = _text(row, column, required)
+    if value is None:
+        return default
+    value = value.lower()
+    if value not in choices:
+        raise RowError(f'{column} must be one of {", ".join(choices)}, got {value!r}')
+    return value
+
+def _key(value):
+    """Case- and whitespace-insensitive lookup key for emails and addresses"""
+    return value.strip().lower() if value else value
+
+# Report
+
+class ImportReport:
+    """Row counts and per-row errors of one import.
+
+    Only the first `max_errors` errors are kept in memory; pass `error_writer`
+    (a csv.writer) to stream every error out, e.g. for million-row files.
+    """
+
+    def __init__(self, error_writer=None, max_errors=MAX_REPORTED_ERRORS):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.error_writer = error_writer
+        self.max_errors = max_errors
+
+    @property
+    def truncated(self):
+        return self.failed > len(self.errors)
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, message))
+        if self.error_writer is not None:
+            self.error_writer.writerow([row_number, message])
+
+# Importers
+
+class Importer:
+    """Imports one kind of record: parse and validate rows, resolve foreign keys
+    with one batch lookup per chunk, then bulk insert the chunk in its own transaction.
+
+    `owner_id` scopes the import to one owner's properties (None for admins).
+    """
+    columns = ()
+    required = ()
+
+    def __init__(self, owner_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.owner_id = owner_id
+        self.chunk_size = chunk_size
+
+    def run(self, rows, report=None):
+        report = report or ImportReport()
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk, report)
+        return report
+
+    def import_chunk(self, chunk, report):
+        parsed = []
+        for number, row in chunk:
+            try:
+                parsed.append((number, self.parse(row)))
+            except RowError as e:
+                report.add_error(number, str(e))
+        if not parsed:
+            return
+
+        pending = parsed
+        try:
+            lookups = self.lookup([values for _, values in parsed])
+            records = []
+            for number, values in parsed:
+                try:
+                    records.append((number, self.resolve(values, lookups)))
+                except RowError as e:
+                    report.add_error(number, str(e))
+            pending = records
+            owners = self.insert([record for _, record in records]) if records else set()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for number, _ in pending:
+                report.add_error(number, f'not imported, the batch failed: {e}')
+            return
+        report.imported += len(records)
+        if owners:
+            cache.invalidate(owners, landing=isinstance(self, PropertyImporter))
+
+    def scoped(self, query):
+        """Restrict a query that joins Property to the importing owner's properties"""
+        return query if self.owner_id is None else query.where(Property.owner_id == self.owner_id)
+
+    def parse(self, row):
+        """Validate one row on its own; returns the values to resolve"""
+        raise NotImplementedError
+
+    def lookup(self, parsed):
+        """Batch-load everything the chunk refers to"""
+        return {}
+
+    def resolve(self, values, lookups):
+        """Turn parsed values into an insertable record using the batch lookups"""
+        return values
+
+    def insert(self, records):
+        """Bulk insert the records; returns the owner ids whose portfolios changed"""
+        raise NotImplementedError
+
+def _property_matches(lookups, values):
+    """Properties matching a row's property_address (and city, when given)"""
+    matches = lookups['properties'].get(_key(values['property_address']), [])
+    if values['city']:
+        matches = [match for match in matches if _key(match.city) == _key(values['city'])]
+    if not matches:
+        raise RowError(f'no property at {values["property_address"]!r}')
+    return matches
+
+class PropertyImporter(Importer):
+    columns = ('owner_email', 'property_type', 'address', 'city', 'state', 'rent_amount',
+               'availability_status', 'description', 'bedrooms', 'bathrooms', 'area_sqft')
+    required = ('property_type', 'address', 'city', 'state', 'rent_amount')
+
+    def parse(self, row):
+        return {
+            'owner_email': _key(_text(row, 'owner_email', required=self.owner_id is None)),
+            'property_type': _choice(row, 'property_type', PROPERTY_TYPES, required=True),
+            'address': _text(row, 'address', True),
+            'city': _text(row, 'city', True),
+            'state': _text(row, 'state', True),
+            'rent_amount': _number(row, 'rent_amount', required=True),
+            'availability_status': _choice(row, 'availability_status', PROPERTY_STATUSES, 'available'),
+            'description': _text(row, 'description'),
+            'bedrooms': _number(row, 'bedrooms', int),
+            'bathrooms': _number(row, 'bathrooms', int),
+            'area_sqft': _number(row, 'area_sqft'),
+        }
+
+    def lookup(self, parsed):
+        emails = {values['owner_email'] for values in parsed if values['owner_email']}
+        owners = {}
+        if emails:
+            rows = db.session.execute(select(User.email, User.id).where(func.lower(User.email).in_(emails)))
+            owners = {_key(email): user_id for email, user_id in rows}
+        return {'owners': owners}
+
+    def resolve(self, values, lookups):
+        email = values.pop('owner_email')
+        owner_id = lookups['owners'].get(email) if email else self.owner_id
+        if email and owner_id is None:
+            raise RowError(f'no user with email {email!r}')
+        if self.owner_id is not None and owner_id != self.owner_id:
+            raise RowError('owner_email must be your own account')
+        values['owner_id'] = owner_id
+        values['created_at'] = datetime.utcnow()
+        return values
+
+    def insert(self, records):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for record in records:
+            for field, amount in portfolio.contribution(Property, record).items():
+                deltas[record['owner_id']][field] += amount
+        portfolio.apply_deltas(db.session.connection(), deltas)
+        db.session.execute(insert(Property), records)
+        return set(deltas)
+
+class TenantImporter(Importer):
+    columns = ('username', 'email', 'phone', 'password', 'national_id', 'emergency_contact',
+               'occupation', 'move_in_date')
+    required = ('email', 'national_id')
+
+    def __init__(self, owner_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(owner_id, chunk_size)
+        # Hashing is deliberately slow, so each distinct password is hashed once per import
+        self.password_hashes = {}
+
+    def parse(self, row):
+        return {
+            'username': _text(row, 'username'),
+            'email': _text(row, 'email', True),
+            'phone': _text(row, 'phone'),
+            'password': _text(row, 'password') or DEFAULT_TENANT_PASSWORD,
+            'national_id': _text(row, 'national_id', True),
+            'emergency_contact': _text(row, 'emergency_contact'),
+            'occupation': _text(row, 'occupation'),
+            'move_in_date': _date(row, 'move_in_date'),
+        }
+
+    def lookup(self, parsed):
+        emails = {_key(values['email']) for values in parsed}
+        usernames = {values['username'] for values in parsed if values['username']}
+        rows = db.session.execute(
+            select(User.id, User.email, User.username, Tenant.id)
+            .outerjoin(Tenant, Tenant.user_id == User.id)
+            .where(or_(func.lower(User.email).in_(emails), User.username.in_(usernames))))
+        users, taken_usernames = {}, set()
+        for user_id, email, username, tenant_id in rows:
+            users[_key(email)] = (user_id, tenant_id)
+            taken_usernames.add(username)
+        return {'users': users, 'usernames': taken_usernames, 'seen': set()}
+
+    def resolve(self, values, lookups):
+        email, username = _key(values['email']), values['username']
+        if email in lookups['seen']:
+            raise RowError(f'{values["email"]} appears more than once')
+        existing = lookups['users'].get(email)
+        if existing is not None:
+            user_id, tenant_id = existing
+            if tenant_id is not None:
+                raise RowError(f'{values["email"]} is already registered as a tenant')
+            values['user_id'] = user_id
+        else:
+            if not username:
+                raise RowError('username is required for a new user')
+            if username in lookups['usernames']:
+                raise RowError(f'username {username!r} is taken')
+            lookups['usernames'].add(username)
+            values['user_id'] = None
+        lookups['seen'].add(email)
+        return values
+
+    def password_hash(self, password):
+        if password not in self.password_hashes:
+            self.password_hashes[password] = generate_password_hash(password)
+        return self.password_hashes[password]
+
+    def insert(self, records):
+        now = datetime.utcnow()
+        new_users = [{'username': record['username'], 'email': record['email'], 'phone': record['phone'],
+                      'password_hash': self.password_hash(record['password']), 'role': 'tenant',
+                      'created_at': now, 'is_active': True}
+                     for record in records if record['user_id'] is None]
+        if new_users:
+            db.session.execute(insert(User), new_users)
+            rows = db.session.execute(select(User.email, User.id)
+                                      .where(User.email.in_([user['email'] for user in new_users])))
+            user_ids = dict(rows.all())
+            for record in records:
+                if record['user_id'] is None:
+                    record['user_id'] = user_ids[record['email']]
+        db.session.execute(insert(Tenant), [
+            {'user_id': record['user_id'], 'national_id': record['national_id'],
+             'emergency_contact': record['emergency_contact'], 'occupation': record['occupation'],
+             'move_in_date': record['move_in_date']}
+            for record in records
+        ])
+        return set()
+
+class LeaseImporter(Importer):
+    columns = ('property_address', 'city', 'tenant_email', 'start_date', 'end_date', 'monthly_rent',
+               'security_deposit', 'terms_conditions', 'status')
+    required = ('property_address', 'tenant_email', 'start_date', 'end_date', 'monthly_rent')
+
+    def parse(self, row):
+        values = {
+            'property_address': _text(row, 'property_address', True),
+            'city': _text(row, 'city'),
+            'tenant_email': _key(_text(row, 'tenant_email', True)),
+            'start_date': _date(row, 'start_date', True),
+            'end_date': _date(row, 'end_date', True),
+            'monthly_rent': _number(row, 'monthly_rent', required=True),
+            'security_deposit': _number(row, 'security_deposit') or 0,
+            'terms_conditions': _text(row, 'terms_conditions'),
+            'status': _choice(row, 'status', LEASE_STATUSES, 'active'),
+        }
+        if values['end_date'] < values['start_date']:
+            raise RowError('end_date is before start_date')
+        return values
+
+    def lookup(self, parsed):
+        addresses = {_key(values['property_address']) for values in parsed}
+        emails = {values['tenant_email'] for values in parsed}
+        properties = defaultdict(list)
+        rows = db.session.execute(self.scoped(
+            select(Property.id, Property.address, Property.city, Property.owner_id, Property.availability_status)
+            .where(func.lower(Property.address).in_(addresses))))
+        for row in rows:
+            properties[_key(row.address)].append(row)
+        rows = db.session.execute(select(User.email, Tenant.id)
+                                  .join(Tenant, Tenant.user_id == User.id)
+                                  .where(func.lower(User.email).in_(emails)))
+        tenants = {_key(email): tenant_id for email, tenant_id in rows}
+        # Existing leases of the matched properties; accepted rows are added as they resolve
+        occupied = occupancy.IntervalSet.load([row.id for matches in properties.values() for row in matches])
+        return {'properties': properties, 'tenants': tenants, 'occupied': occupied}
+
+    def resolve(self, values, lookups):
+        matches = _property_matches(lookups, values)
+        if len(matches) > 1:
+            raise RowError(f'{values["property_address"]!r} matches {len(matches)} properties; add a city column')
+        tenant_id = lookups['tenants'].get(values['tenant_email'])
+        if tenant_id is None:
+            raise RowError(f'no tenant with email {values["tenant_email"]!r}')
+        if values['status'] in occupancy.OCCUPYING:
+            occupied = lookups['occupied']
+            if occupied.overlaps(matches[0].id, values['start_date'], values['end_date']):
+                raise RowError(f'{values["property_address"]!r} already has a lease overlapping '
+                               f'{values["start_date"]} to {values["end_date"]}')
+            occupied.add(matches[0].id, values['start_date'], values['end_date'])
+        record = {field: values[field] for field in
+                  ('start_date', 'end_date', 'monthly_rent', 'security_deposit', 'terms_conditions', 'status')}
+        record.update(property_id=matches[0].id, tenant_id=tenant_id, created_at=datetime.utcnow())
+        # Kept for insert(); stripped before the rows are written
+        record['_property'] = matches[0]
+        return record
+
+    def insert(self, records):
+        deltas = defaultdict(lambda: defaultdict(int))
+        occupied = {}
+        for record in records:
+            property = record.pop('_property')
+            for field, amount in portfolio.contribution(Lease, record).items():
+                deltas[property.owner_id][field] += amount
+            # Active leases mark their property occupied, as the lease form does
+            if record['status'] == 'active' and property.availability_status != 'occupied':
+                occupied[property.id] = property
+        for property in occupied.values():
+            before = portfolio.contribution(Property, {'availability_status': property.availability_status})
+            after = portfolio.contribution(Property, {'availability_status': 'occupied'})
+            for field in before:
+                deltas[property.owner_id][field] += after[field] - before[field]
+        portfolio.apply_deltas(db.session.connection(), deltas)
+        db.session.execute(insert(Lease), records)
+        if occupied:
+            db.session.execute(update(Property)
+                               .where(Property.id.in_(occupied))
+                               .values(availability_status='occupied')
+                               .execution_options(synchronize_session=False))
+        return set(deltas)
+
+class PaymentImporter(Importer):
+    columns = ('lease_id', 'property_address', 'city', 'tenant_email', 'amount', 'due_date', 'paid_date',
+               'payment_method', 'status')
+    required = ('amount', 'lease_id or property_address + tenant_email')
+
+    def parse(self, row):
+        values = {
+            'lease_id': _number(row, 'lease_id', int),
+            'property_address': _text(row, 'property_address'),
+            'city': _text(row, 'city'),
+            'tenant_email': _key(_text(row, 'tenant_email')),
+            'amount': _number(row, 'amount', required=True),
+            'due_date': _date(row, 'due_date'),
+            'paid_date': _date(row, 'paid_date'),
+            'payment_method': _choice(row, 'payment_method', PAYMENT_METHODS),
+            'status': _choice(row, 'status', PAYMENT_STATUSES, 'pending'),
+        }
+        if values['lease_id'] is None and not (values['property_address'] and values['tenant_email']):
+            raise RowError('either lease_id or property_address and tenant_email is required')
+        return values
+
+    def lookup(self, parsed):
+        lease_ids = {values['lease_id'] for values in parsed if values['lease_id'] is not None}
+        by_name = [values for values in parsed if values['lease_id'] is None]
+        columns = (Lease.id, Lease.status, Lease.start_date, Property.owner_id, Property.address,
+                   Property.city, User.email)
+        query = (select(*columns)
+                 .join(Property, Lease.property_id == Property.id)
+                 .join(Tenant, Lease.tenant_id == Tenant.id)
+                 .join(User, Tenant.user_id == User.id))
+        leases, properties = {}, defaultdict(list)
+        if lease_ids:
+            for row in db.session.execute(self.scoped(query.where(Lease.id.in_(lease_ids)))):
+                leases[row.id] = row
+        if by_name:
+            addresses = {_key(values['property_address']) for values in by_name}
+            emails = {values['tenant_email'] for values in by_name}
+            rows = db.session.execute(self.scoped(query.where(func.lower(Property.address).in_(addresses),
+                                                              func.lower(User.email).in_(emails))))
+            for row in rows:
+                properties[_key(row.address)].append(row)
+        return {'leases': leases, 'properties': properties}
+
+    def resolve(self, values, lookups):
+        if values['lease_id'] is not None:
+            lease = lookups['leases'].get(values['lease_id'])
+            if lease is None:
+                raise RowError(f'no lease with id {values["lease_id"]}')
+        else:
+            matches = [match for match in _property_matches(lookups, values)
+                       if _key(match.email) == values['tenant_email']]
+            if not matches:
+                raise RowError(f'no lease for {values["tenant_email"]} at {values["property_address"]!r}')
+            # Prefer the active lease, then the most recent one
+            lease = max(matches, key=lambda match: (match.status == 'active', match.start_date))
+        record = {field: values[field] for field in ('amount', 'due_date', 'paid_date', 'payment_method', 'status')}
+        record.update(lease_id=lease.id, created_at=datetime.utcnow())
+        record['_owner_id'] = lease.owner_id
+        return record
+
+    def insert(self, records):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for record in records:
+            owner_id = record.pop('_owner_id')
+            for field, amount in portfolio.contribution(Payment, record).items():
+                deltas[owner_id][field] += amount
+        portfolio.apply_deltas(db.session.connection(), deltas)
+        db.session.execute(insert(Payment), records)
+        return set(deltas)
+
+IMPORTERS = {
+    'properties': PropertyImporter,
+    'tenants': TenantImporter,
+    'leases': LeaseImporter,
+    'payments': PaymentImporter,
+}
+
+def import_file(kind, stream, filename, owner_id=None, report=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import a CSV/XLSX file of `kind` records; returns the ImportReport"""
+    importer = IMPORTERS[kind](owner_id=owner_id, chunk_size=chunk_size)
+    return importer.run(read_rows(stream, filename), report)
@@ -0,0 +1,86 @@
+from app import db
+from app.models import Lease, Payment, Property
+from app.services import cache, portfolio
+from sqlalchemy import Date, and_, case, exists, extract, func, insert, literal, select, union_all
+from datetime import date, datetime, timedelta
+import calendar
+
+DEFAULT_LEAD_DAYS = 7
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def billing_months(today, lead_days):
+    """First days of the months whose due dates can fall in [today, today + lead_days]"""
+    last = today + timedelta(days=lead_days)
+    month, months = _month_start(today), []
+    while month <= last:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+def _due_date_in(month):
+    """SQL expression: the lease's due date in `month`.
+
+    Rent falls due on the day of month the lease started, moved to the last day
+    for short months (a lease starting on the 31st is due on 30 April). The
+    date is picked from a CASE over the 31 possible start days, which keeps the
+    expression portable across SQLite and PostgreSQL.
+    """
+    last_day = calendar.monthrange(month.year, month.month)[1]
+    due_dates = {day: literal(month.replace(day=min(day, last_day)), Date) for day in range(1, 32)}
+    return case(due_dates, value=extract('day', Lease.start_date))
+
+def _invoice_candidates(today, lead_days, now):
+    """SELECT of the invoices due within the lead window that do not exist yet"""
+    last = today + timedelta(days=lead_days)
+    selects = []
+    for month in billing_months(today, lead_days):
+        due_date = _due_date_in(month)
+        period = literal(month, Date)
+        already_invoiced = exists().where(Payment.lease_id == Lease.id, Payment.period == period)
+        selects.append(
+            select(Lease.id.label('lease_id'),
+                   Lease.monthly_rent.label('amount'),
+                   due_date.label('due_date'),
+                   period.label('period'),
+                   literal('pending').label('status'),
+                   literal(now, db.DateTime).label('created_at'),
+                   Property.owner_id.label('owner_id'))
+            .join(Property, Lease.property_id == Property.id)
+            .where(Lease.status == 'active',
+                   due_date >= today, due_date <= last,
+                   and_(due_date >= Lease.start_date, due_date <= Lease.end_date),
+                   ~already_invoiced))
+    return union_all(*selects).subquery('candidates')
+
+def generate_invoices(today=None, lead_days=DEFAULT_LEAD_DAYS):
+    """Create the pending Payment for every active lease whose rent falls due
+    within `lead_days` of `today`, in one INSERT ... SELECT.
+
+    Safe to run any number of times: a lease gets at most one invoice per
+    billing period (enforced by uq_payments_lease_period). Returns the number
+    of payments created.
+    """
+    today = today or date.today()
+    now = datetime.utcnow()
+    candidates = _invoice_candidates(today, lead_days, now)
+
+    # The insert bypasses session events, so fold the new pending payments into
+    # the portfolio summaries first (apply_deltas expects pre-insert tables)
+    counts = db.session.execute(select(candidates.c.owner_id, func.count())
+                                .group_by(candidates.c.owner_id)).all()
+    if not counts:
+        return 0
+    portfolio.apply_deltas(db.session.connection(),
+                           {owner_id: {'pending_payments': count} for owner_id, count in counts})
+
+    columns = ('lease_id', 'amount', 'due_date', 'period', 'status', 'created_at')
+    db.session.execute(insert(Payment).from_select(
+        columns, select(*(candidates.c[column] for column in columns))))
+    db.session.commit()
+    cache.invalidate([owner_id for owner_id, _ in counts])
+    return sum(count for _, count in counts)
@@ -0,0 +1,148 @@
+"""Per-request performance metrics.
+
+Every request records its wall time, SQL statement count and time, template
+render time and response size in histograms labelled by endpoint. They are
+served in the Prometheus text format at /metrics and summarised for the
+browser in a Server-Timing header. Both reveal how the app queries the
+database, so /metrics needs METRICS_TOKEN or an admin login, and the header
+only goes to admins and debug mode unless SERVER_TIMING_PUBLIC is set.
+
+Histograms live in process memory, so with several gunicorn workers each
+scrape sees one worker; scrape every worker, or read the totals per process.
+"""
+from flask import before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from bisect import bisect_left
+from threading import Lock
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects"""
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name, self.documentation = name, documentation
+        self.buckets, self.labels = tuple(buckets), tuple(labels)
+        self._series = {}  # label values -> [count per bucket + overflow, sum]
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_values) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._series[label_values] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:g}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Wall time spent handling the request.',
+                             DURATION_BUCKETS, ('endpoint', 'method', 'status'))
+SQL_STATEMENTS = Histogram('http_request_sql_statements', 'SQL statements issued per request.',
+                           STATEMENT_BUCKETS, ('endpoint',))
+SQL_DURATION = Histogram('http_request_sql_duration_seconds', 'Time spent executing SQL per request.',
+                         DURATION_BUCKETS, ('endpoint',))
+TEMPLATE_DURATION = Histogram('http_request_template_duration_seconds', 'Time spent rendering templates per request.',
+                              DURATION_BUCKETS, ('endpoint',))
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size, where known before streaming.',
+                          SIZE_BUCKETS, ('endpoint',))
+HISTOGRAMS = [REQUEST_DURATION, SQL_STATEMENTS, SQL_DURATION, TEMPLATE_DURATION, RESPONSE_SIZE]
+
+def render_metrics():
+    """Every histogram in the Prometheus text exposition format"""
+    return '\n'.join(line for histogram in HISTOGRAMS for line in histogram.render()) + '\n'
+
+# Timing hooks
+
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_app_context() and 'metrics' in g:
+        g.metrics['sql'] += elapsed
+
+def _sql_failed(context):
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+def _template_started(app, template, context):
+    if 'metrics' in g:
+        g.metrics['template_started'].append(time.perf_counter())
+
+def _template_finished(app, template, context):
+    if 'metrics' in g and g.metrics['template_started']:
+        g.metrics['template'] += time.perf_counter() - g.metrics['template_started'].pop()
+
+def _shows_timing():
+    if current_app.debug or current_app.config['SERVER_TIMING_PUBLIC']:
+        return True
+    # Only a user the request already loaded: reading the session here would add Vary: Cookie to static files
+    user = g.get('_login_user')
+    return user is not None and user.is_authenticated and user.role == 'admin'
+
+def _start_request():
+    g.metrics = {'started': time.perf_counter(), 'sql': 0.0, 'template': 0.0, 'template_started': []}
+
+def _finish_request(response):
+    metrics = g.pop('metrics', None)
+    if metrics is None:
+        return response
+    elapsed = time.perf_counter() - metrics['started']
+    endpoint = request.endpoint or 'unmatched'
+    statements = g.get('sql_statement_count', 0)
+
+    REQUEST_DURATION.observe(elapsed, endpoint, request.method, str(response.status_code))
+    SQL_STATEMENTS.observe(statements, endpoint)
+    SQL_DURATION.observe(metrics['sql'], endpoint)
+    TEMPLATE_DURATION.observe(metrics['template'], endpoint)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, endpoint)
+
+    if current_app.config['SERVER_TIMING_ENABLED'] and _shows_timing():
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed * 1000:.1f}',
+            f'sql;dur={metrics["sql"] * 1000:.1f};desc="{statements} statements"',
+            f'tpl;dur={metrics["template"] * 1000:.1f}',
+        ])
+    return response
+
+def init_app(app):
+    """Time every request; requires query_budget.init_app for the statement count"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _sql_started):
+        event.listen(Engine, 'before_cursor_execute', _sql_started)
+        event.listen(Engine, 'after_cursor_execute', _sql_finished)
+        event.listen(Engine, 'handle_error', _sql_failed)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
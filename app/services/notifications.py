@@ -0,0 +1,86 @@
+from app import db
+from app.models import Notification, User
+from sqlalchemy import bindparam, case, func, insert, select, update
+from collections import Counter
+from datetime import datetime
+
+# Rows per multi-row INSERT: 5 columns each stays under the 999 bound
+# parameters older SQLite builds allow per statement
+INSERT_CHUNK = 150
+
+def notify(notification_type, recipients):
+    """Create one notification per (user_id, message) in `recipients`.
+
+    Rows are written with multi-row INSERTs and each recipient's unread
+    counter is bumped by its share, all in the caller's transaction; nothing
+    is loaded into the session. Returns the number of notifications created.
+    """
+    now = datetime.utcnow()
+    rows = [{'user_id': user_id, 'notification_type': notification_type, 'message': message,
+             'is_read': False, 'created_at': now}
+            for user_id, message in recipients if user_id is not None]
+    if not rows:
+        return 0
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(Notification).values(rows[start:start + INSERT_CHUNK]))
+
+    users = User.__table__
+    db.session.execute(update(users)
+                       .where(users.c.id == bindparam('uid'))
+                       .values(unread_notifications=func.coalesce(users.c.unread_notifications, 0)
+                               + bindparam('added')),
+                       [{'uid': user_id, 'added': count}
+                        for user_id, count in Counter(row['user_id'] for row in rows).items()])
+    return len(rows)
+
+def fan_out(notification_type, user_ids, message):
+    """Send the same message to several users, skipping duplicates"""
+    return notify(notification_type, ((user_id, message) for user_id in dict.fromkeys(user_ids)))
+
+def admin_ids():
+    return db.session.scalars(select(User.id).where(User.role == 'admin')).all()
+
+def unread_count(user_id):
+    return db.session.scalar(select(User.unread_notifications).where(User.id == user_id)) or 0
+
+def _decrement_unread(user_id, count):
+    unread = func.coalesce(User.unread_notifications, 0)
+    db.session.execute(update(User)
+                       .where(User.id == user_id)
+                       .values(unread_notifications=case((unread > count, unread - count), else_=0))
+                       .execution_options(synchronize_session=False))
+
+def mark_read(user_id, notification_id):
+    """Mark one of the user's notifications read; returns whether it was unread"""
+    result = db.session.execute(update(Notification)
+                                .where(Notification.id == notification_id, Notification.user_id == user_id,
+                                       Notification.is_read.is_(False))
+                                .values(is_read=True)
+                                .execution_options(synchronize_session=False))
+    if result.rowcount:
+        _decrement_unread(user_id, result.rowcount)
+    return bool(result.rowcount)
+
+def mark_all_read(user_id):
+    """Mark every unread notification of the user read in one UPDATE; returns how many changed.
+
+    The counter is lowered by the rows actually updated rather than reset, so
+    notifications committed concurrently stay counted.
+    """
+    result = db.session.execute(update(Notification)
+                                .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+                                .values(is_read=True)
+                                .execution_options(synchronize_session=False))
+    if result.rowcount:
+        _decrement_unread(user_id, result.rowcount)
+    return result.rowcount
+
+def recount_unread():
+    """Recompute every user's unread counter from the notifications table"""
+    unread = (select(func.count(Notification.id))
+              .where(Notification.user_id == User.id, Notification.is_read.is_(False))
+              .scalar_subquery())
+    result = db.session.execute(update(User).values(unread_notifications=unread)
+                                .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,207 @@
+"""Occupancy derived from lease dates: overlap checks, occupancy on a day and vacant days over a period.
+
+A property is occupied on every day covered by one of its leases in
+OCCUPYING, both end dates included. Terminated leases ended early on a day
+that is not recorded, so they neither occupy a property nor block a new
+lease on it.
+
+The day and period questions are answered in SQL for the whole portfolio:
+range conditions on start_date and end_date pick the leases touching the
+period from the (status, end_date) index, and a window function merges
+overlapping leases per property so no day is counted twice.
+"""
+from sqlalchemy import Date, Integer, case, cast, func, literal, select
+from sqlalchemy.orm import joinedload
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from app import db
+from app.models import Property, Tenant, Lease
+from app.services.reports import REPORT_ROWS, add_months, cached_report
+from app.services.scoping import owned_property_ids
+
+OCCUPYING = ('active', 'expired')
+TIMELINE_MONTHS = (24, 12)  # months shown before and after today on a property's timeline
+
+# Overlapping leases
+
+def overlapping_leases(property_id, start, end, exclude_id=None):
+    """Occupying leases on the property that share at least one day with [start, end], earliest first"""
+    query = Lease.query.filter(Lease.property_id == property_id, Lease.status.in_(OCCUPYING),
+                               Lease.start_date <= end, Lease.end_date >= start)
+    if exclude_id is not None:
+        query = query.filter(Lease.id != exclude_id)
+    return query.order_by(Lease.start_date)
+
+def lease_conflict(property_id, start, end, status, exclude_id=None):
+    """Why a lease with these dates cannot be saved, or None when it can"""
+    if end < start:
+        return 'The end date is before the start date.'
+    if status not in OCCUPYING:
+        return None
+    other = overlapping_leases(property_id, start, end, exclude_id).first()
+    if other is None:
+        return None
+    return (f'The property is already leased from {other.start_date} to {other.end_date} '
+            f'(lease #{other.id}, {other.status}).')
+
+class IntervalSet:
+    """Occupied days of each property as sorted, disjoint [start, end] date ranges.
+
+    Used where many leases are checked at once (imports): the existing leases
+    are loaded in one query, and each accepted lease is added so later rows
+    are checked against it too.
+    """
+
+    def __init__(self):
+        self.starts, self.ends = {}, {}
+
+    def overlaps(self, property_id, start, end):
+        starts, ends = self.starts.get(property_id, ()), self.ends.get(property_id, ())
+        index = bisect_right(starts, end)  # ranges starting on or before `end`
+        return index > 0 and ends[index - 1] >= start
+
+    def add(self, property_id, start, end):
+        starts, ends = self.starts.setdefault(property_id, []), self.ends.setdefault(property_id, [])
+        # Merge with every range that overlaps or touches [start, end]
+        first = bisect_left(ends, start - timedelta(days=1))
+        last = bisect_right(starts, end + timedelta(days=1))
+        if first < last:
+            start, end = min(start, starts[first]), max(end, ends[last - 1])
+        starts[first:last], ends[first:last] = [start], [end]
+
+    @classmethod
+    def load(cls, property_ids):
+        """Occupied ranges of the given properties, from their occupying leases"""
+        intervals = cls()
+        rows = db.session.execute(select(Lease.property_id, Lease.start_date, Lease.end_date)
+                                  .where(Lease.property_id.in_(property_ids), Lease.status.in_(OCCUPYING))
+                                  .order_by(Lease.property_id, Lease.start_date))
+        for property_id, start, end in rows:
+            intervals.add(property_id, start, end)
+        return intervals
+
+# Occupancy on a day
+
+def _occupying(day, owner_id=None):
+    query = select(Lease.property_id).where(Lease.status.in_(OCCUPYING),
+                                            Lease.start_date <= day, Lease.end_date >= day)
+    if owner_id is not None:
+        query = query.where(Lease.property_id.in_(owned_property_ids(owner_id)))
+    return query
+
+def occupied_property_ids(day, owner_id=None):
+    """Subquery selecting the ids of properties occupied on `day`"""
+    return _occupying(day, owner_id).distinct()
+
+def occupancy_on(day, owner_id=None):
+    """Properties, occupied properties and occupancy rate on `day`"""
+    units = select(func.count(Property.id))
+    if owner_id is not None:
+        units = units.where(Property.owner_id == owner_id)
+    occupied = _occupying(day, owner_id).with_only_columns(func.count(Lease.property_id.distinct()))
+    units, taken = db.session.execute(select(units.scalar_subquery(), occupied.scalar_subquery())).one()
+    return {'day': day, 'units': units, 'occupied': taken, 'rate': taken / units if units else None}
+
+# Vacant days over a period
+
+def _day_number(value):
+    """SQL expression: `value` (a date) as a whole number of days, in the database's own dialect"""
+    dialect = db.session.get_bind(mapper=Lease.__mapper__).dialect.name
+    if dialect == 'postgresql':
+        return value - date(1970, 1, 1)
+    if dialect in ('mysql', 'mariadb'):
+        return func.to_days(value)
+    return cast(func.julianday(value), Integer)
+
+def _occupied_days(start, end, owner_id=None):
+    """Subquery: days each property was occupied in [start, end], with overlapping leases counted once"""
+    first = literal(start, Date)
+    last = literal(end, Date)
+    leases = (select(Lease.property_id,
+                     _day_number(case((Lease.start_date < first, first), else_=Lease.start_date)).label('first'),
+                     _day_number(case((Lease.end_date > last, last), else_=Lease.end_date)).label('last'))
+              .where(Lease.status.in_(OCCUPYING), Lease.start_date <= end, Lease.end_date >= start))
+    if owner_id is not None:
+        leases = leases.where(Lease.property_id.in_(owned_property_ids(owner_id)))
+    leases = leases.subquery()
+    # The last day covered by the property's earlier leases, in start order
+    reach = func.max(leases.c.last).over(partition_by=leases.c.property_id,
+                                         order_by=(leases.c.first, leases.c.last), rows=(None, -1))
+    runs = select(leases.c.property_id, leases.c.first, leases.c.last, reach.label('reach')).subquery()
+    new_days = case((runs.c.reach.is_(None) | (runs.c.first > runs.c.reach), runs.c.last - runs.c.first + 1),
+                    (runs.c.last > runs.c.reach, runs.c.last - runs.c.reach),
+                    else_=0)
+    return (select(runs.c.property_id, func.sum(new_days).label('days'))
+            .group_by(runs.c.property_id).subquery())
+
+def vacancy(owner_id=None, start=None, end=None, limit=REPORT_ROWS):
+    """Occupied and vacant days per property over [start, end], most vacant first, with portfolio totals"""
+    if start is None or end is None:
+        end = date.today()
+        start = end - timedelta(days=364)
+
+    def build():
+        period = (end - start).days + 1
+        occupied = _occupied_days(start, end, owner_id)
+        days = func.coalesce(occupied.c.days, 0)
+        query = (db.session.query(Property.id, Property.address, Property.city, days.label('occupied'),
+                                  func.count().over().label('units'), func.sum(days).over().label('all_occupied'))
+                 .outerjoin(occupied, occupied.c.property_id == Property.id))
+        if owner_id is not None:
+            query = query.filter(Property.owner_id == owner_id)
+        rows = query.order_by(days, Property.id).limit(limit).all()
+        units = rows[0].units if rows else 0
+        occupied_total = rows[0].all_occupied if rows else 0
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'days': period,
+            'units': units,
+            'totals': {
+                'occupied': occupied_total,
+                'vacant': units * period - occupied_total,
+                'rate': occupied_total / (units * period) if units else None,
+            },
+            'rows': [{
+                'key': row.id,
+                'label': row.address,
+                'detail': row.city,
+                'occupied': row.occupied,
+                'vacant': period - row.occupied,
+                'rate': row.occupied / period,
+            } for row in rows],
+        }
+
+    return cached_report(owner_id, 'vacancy', (start, end, limit), build)
+
+# Timeline of one property
+
+def timeline_period(today=None):
+    """First and last day shown on a property's timeline: whole months around today"""
+    this_month = (today or date.today()).replace(day=1)
+    before, after = TIMELINE_MONTHS
+    return add_months(this_month, -before), add_months(this_month, after + 1) - timedelta(days=1)
+
+def timeline(property_id, start, end):
+    """Occupied and vacant stretches of one property over [start, end], in date order.
+
+    Each segment is {'start', 'end', 'days', 'lease'}, with `lease` None for
+    vacant stretches; a lease overlapping an earlier one only adds the days
+    the earlier one did not cover.
+    """
+    segments, cursor = [], start
+    leases = overlapping_leases(property_id, start, end).options(joinedload(Lease.tenant).joinedload(Tenant.user))
+    for lease in leases:
+        first, last = max(lease.start_date, cursor), min(lease.end_date, end)
+        if last < first:
+            continue
+        if first > cursor:
+            segments.append({'start': cursor, 'end': first - timedelta(days=1), 'lease': None})
+        segments.append({'start': first, 'end': last, 'lease': lease})
+        cursor = last + timedelta(days=1)
+    if cursor <= end:
+        segments.append({'start': cursor, 'end': end, 'lease': None})
+    for segment in segments:
+        segment['days'] = (segment['end'] - segment['start']).days + 1
+    return segments
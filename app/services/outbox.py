@@ -0,0 +1,101 @@
+from flask import current_app, render_template
+from flask_mail import Message
+from app import db, mail
+from app.models import OutboxEmail
+from sqlalchemy import select
+from datetime import datetime, timedelta
+import smtplib
+
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+
+# Lost connection mid-batch: stop and retry the unsent rest later. Anything
+# else raised by a send (e.g. a refused recipient) is a per-message failure.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+def queue_email(recipient, subject, template, **context):
+    """Add an email to the outbox in the current transaction.
+
+    Nothing is sent here: the row commits (or rolls back) together with the
+    change that triggered it, and the mail worker delivers it afterwards.
+    `template` is rendered from templates/email/.
+    """
+    if not recipient:
+        return None
+    email = OutboxEmail(recipient=recipient, subject=subject,
+                        body=render_template(f'email/{template}', **context))
+    db.session.add(email)
+    return email
+
+def retry_delay(attempts):
+    """Exponential backoff: 1, 2, 4, ... minutes, capped at RETRY_MAX"""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+def has_due_email():
+    """Cheap check the workers make before starting (and recording) a delivery run"""
+    return db.session.execute(select(OutboxEmail.id)
+                              .where(OutboxEmail.status == 'pending',
+                                     OutboxEmail.next_attempt_at <= datetime.utcnow())
+                              .limit(1)).first() is not None
+
+def _due_emails(now, batch_size):
+    return db.session.scalars(select(OutboxEmail)
+                              .where(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now)
+                              .order_by(OutboxEmail.id)
+                              .limit(batch_size)).all()
+
+def _record_failure(email, error, now, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+def deliver_outbox(batch_size=None, max_batches=20):
+    """Send due outbox emails in batches over one SMTP connection per batch.
+
+    A message the server rejects is retried with backoff and marked failed
+    after MAIL_OUTBOX_MAX_ATTEMPTS. If the connection itself fails, the unsent
+    rest of the batch waits for the next run. Returns counts per outcome.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+    max_attempts = config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 6)
+    counts = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    for _ in range(max_batches):
+        now = datetime.utcnow()
+        emails = _due_emails(now, batch_size)
+        if not emails:
+            break
+        in_flight = None
+        try:
+            with mail.connect() as connection:
+                for email in emails:
+                    in_flight = email
+                    try:
+                        connection.send(Message(subject=email.subject, recipients=[email.recipient],
+                                                body=email.body))
+                    except CONNECTION_ERRORS:
+                        raise
+                    except Exception as e:
+                        _record_failure(email, e, now, max_attempts)
+                        counts['failed' if email.status == 'failed' else 'retrying'] += 1
+                    else:
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                        counts['sent'] += 1
+                    in_flight = None
+        except OSError as e:
+            # Connecting failed or the connection dropped. Only the message being sent counts as an attempt; the rest were never tried
+            if in_flight is not None:
+                _record_failure(in_flight, e, now, max_attempts)
+                counts['failed' if in_flight.status == 'failed' else 'retrying'] += 1
+            db.session.commit()
+            current_app.logger.warning(f'Mail server unavailable: {e}')
+            break
+        db.session.commit()
+        if len(emails) < batch_size:
+            break
+    return counts
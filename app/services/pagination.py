@@ -0,0 +1,177 @@
+from flask import request, url_for
+from sqlalchemy import and_, or_
+from datetime import date, datetime
+import base64
+import json
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+class Page:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, per_page, sort, order, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.sort = sort
+        self.order = order
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def url(self, **changes):
+        """URL for the current view with the given query args replaced (cursor is reset unless given)"""
+        args = request.args.to_dict()
+        args.pop('cursor', None)
+        args.update(changes)
+        args = {key: value for key, value in args.items() if value not in (None, '')}
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    def sort_url(self, column):
+        """URL that sorts by `column`, toggling the direction if it is already the sort key"""
+        order = 'asc' if self.sort == column and self.order == 'desc' else 'desc'
+        return self.url(sort=column, order=order)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _decode_value(value, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(direction, value, row_id):
+    payload = json.dumps([direction, _encode_value(value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, column):
+    """Decode a cursor into (direction, value, id); malformed cursors decode to None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, _decode_value(value, column), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def _after(column, id_column, value, row_id, descending):
+    """Rows strictly after (value, row_id) in the ordering NULLS LAST, column, id"""
+    if value is None:
+        newer_id = id_column < row_id if descending else id_column > row_id
+        return and_(column.is_(None), newer_id)
+    if descending:
+        beyond = or_(column < value, and_(column == value, id_column < row_id))
+    else:
+        beyond = or_(column > value, and_(column == value, id_column > row_id))
+    return or_(beyond, column.is_(None))
+
+def _before(column, id_column, value, row_id, descending):
+    """Rows strictly before (value, row_id) in the ordering NULLS LAST, column, id"""
+    if value is None:
+        older_id = id_column > row_id if descending else id_column < row_id
+        return or_(column.isnot(None), and_(column.is_(None), older_id))
+    if descending:
+        return and_(column.isnot(None), or_(column > value, and_(column == value, id_column > row_id)))
+    return and_(column.isnot(None), or_(column < value, and_(column == value, id_column < row_id)))
+
+def _ordering(column, id_column, descending, reverse=False):
+    """ORDER BY clauses for NULLS LAST, column, id (flipped when walking backwards)"""
+    if reverse:
+        descending = not descending
+        nulls = column.is_(None).desc()
+    else:
+        nulls = column.is_(None).asc()
+    if descending:
+        return [nulls, column.desc(), id_column.desc()]
+    return [nulls, column.asc(), id_column.asc()]
+
+def get_per_page():
+    """Page size from the request, clamped to MAX_PER_PAGE"""
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int) or DEFAULT_PER_PAGE
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+def paginate(query, sort_columns, id_column, default_sort, default_order='desc'):
+    """Keyset-paginate `query` using the sort/order/cursor/per_page request args.
+
+    `sort_columns` maps the sort names accepted from the request to columns;
+    `id_column` is the unique tiebreaker that makes the ordering total.
+    """
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    order = request.args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        order = default_order
+    descending = order == 'desc'
+    column = sort_columns[sort]
+    per_page = get_per_page()
+
+    cursor = request.args.get('cursor')
+    position = decode_cursor(cursor, column) if cursor else None
+    backwards = position is not None and position[0] == 'prev'
+
+    if position is not None:
+        _, value, row_id = position
+        boundary = _before if backwards else _after
+        query = query.filter(boundary(column, id_column, value, row_id, descending))
+
+    # Fetch one extra row to learn whether another page exists in the walking direction
+    rows = (query
+            .add_columns(column.label('_sort_value'))
+            .order_by(*_ordering(column, id_column, descending, reverse=backwards))
+            .limit(per_page + 1)
+            .all())
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    sort_values = [row[-1] for row in rows]
+
+    next_cursor = prev_cursor = None
+    if items:
+        first_cursor = encode_cursor('prev', sort_values[0], items[0].id)
+        last_cursor = encode_cursor('next', sort_values[-1], items[-1].id)
+        if backwards:
+            next_cursor = last_cursor
+            prev_cursor = first_cursor if more else None
+        else:
+            next_cursor = last_cursor if more else None
+            prev_cursor = first_cursor if position is not None else None
+
+    return Page(items, per_page, sort, order, next_cursor, prev_cursor)
+
+def parse_date_arg(name):
+    """Read a YYYY-MM-DD request arg, ignoring blanks and malformed values"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
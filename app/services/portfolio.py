@@ -0,0 +1,346 @@
+from app import db
+from app.models import User, Property, Tenant, Lease, Payment, MaintenanceRequest, PortfolioSummary
+from sqlalchemy import case, delete, event, exists, func, insert, inspect, or_, select, union, update
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime
+
+# Counters kept per owner in portfolio_summaries
+SUMMARY_FIELDS = (
+    'total_properties',
+    'available_properties',
+    'occupied_properties',
+    'active_leases',
+    'total_rent',
+    'pending_payments',
+    'pending_maintenance',
+)
+
+def _empty_summary():
+    return {field: 0 for field in SUMMARY_FIELDS}
+
+# Computing summaries from the source tables
+
+def _summary_queries(owner_id=None):
+    """Grouped-by-owner aggregate queries over the source tables"""
+    def scoped(query):
+        return query if owner_id is None else query.where(Property.owner_id == owner_id)
+
+    properties = scoped(
+        select(Property.owner_id,
+               func.count(Property.id),
+               func.sum(case((Property.availability_status == 'available', 1), else_=0)),
+               func.sum(case((Property.availability_status == 'occupied', 1), else_=0)))
+        .group_by(Property.owner_id))
+    leases = scoped(
+        select(Property.owner_id, func.count(Lease.id), func.coalesce(func.sum(Lease.monthly_rent), 0))
+        .join(Property, Lease.property_id == Property.id)
+        .where(Lease.status == 'active')
+        .group_by(Property.owner_id))
+    payments = scoped(
+        select(Property.owner_id, func.count(Payment.id))
+        .join(Lease, Payment.lease_id == Lease.id)
+        .join(Property, Lease.property_id == Property.id)
+        .where(Payment.status == 'pending')
+        .group_by(Property.owner_id))
+    maintenance = scoped(
+        select(Property.owner_id, func.count(MaintenanceRequest.id))
+        .join(Property, MaintenanceRequest.property_id == Property.id)
+        .where(MaintenanceRequest.status == 'pending')
+        .group_by(Property.owner_id))
+    return properties, leases, payments, maintenance
+
+def compute_summaries(connection, owner_id=None):
+    """Summary counters per owner computed from the source tables"""
+    summaries = defaultdict(_empty_summary)
+    properties, leases, payments, maintenance = _summary_queries(owner_id)
+    for owner, total, available, occupied in connection.execute(properties):
+        summaries[owner].update(total_properties=total, available_properties=available or 0,
+                                occupied_properties=occupied or 0)
+    for owner, count, rent in connection.execute(leases):
+        summaries[owner].update(active_leases=count, total_rent=rent)
+    for owner, count in connection.execute(payments):
+        summaries[owner]['pending_payments'] = count
+    for owner, count in connection.execute(maintenance):
+        summaries[owner]['pending_maintenance'] = count
+    return dict(summaries)
+
+def rebuild_summaries():
+    """Replace portfolio_summaries with counters recomputed from the source tables"""
+    connection = db.session.connection()
+    summaries = compute_summaries(connection)
+    connection.execute(delete(PortfolioSummary))
+    now = datetime.utcnow()
+    if summaries:
+        connection.execute(insert(PortfolioSummary), [
+            {'owner_id': owner_id, 'updated_at': now, **counters}
+            for owner_id, counters in summaries.items()
+        ])
+    db.session.commit()
+    return len(summaries)
+
+def summaries_missing():
+    """Whether some owner with properties has no portfolio_summaries row, e.g. on an upgraded database"""
+    unsummarized = select(Property.id).where(~exists().where(PortfolioSummary.owner_id == Property.owner_id))
+    return db.session.execute(unsummarized.limit(1)).first() is not None
+
+# Reading summaries
+
+def get_summary(owner_id=None):
+    """Counters for one owner (a primary-key lookup), or summed over all owners for admins"""
+    columns = [getattr(PortfolioSummary, field) for field in SUMMARY_FIELDS]
+    if owner_id is None:
+        row = db.session.execute(select(*(func.coalesce(func.sum(column), 0) for column in columns))).one()
+        return dict(zip(SUMMARY_FIELDS, row))
+    row = db.session.execute(select(*columns).where(PortfolioSummary.owner_id == owner_id)).first()
+    if row is None:
+        # Owner has never been written since the table was introduced; fall back to the source tables
+        return compute_summaries(db.session.connection(), owner_id).get(owner_id, _empty_summary())
+    return dict(zip(SUMMARY_FIELDS, row))
+
+# Incremental maintenance
+
+def contribution(model, values):
+    """What one row in the given state adds to its owner's counters"""
+    status_of = values.get
+    if model is Property:
+        return {
+            'total_properties': 1,
+            'available_properties': int(status_of('availability_status') == 'available'),
+            'occupied_properties': int(status_of('availability_status') == 'occupied'),
+        }
+    if model is Lease:
+        if status_of('status') != 'active':
+            return {}
+        return {'active_leases': 1, 'total_rent': status_of('monthly_rent') or 0}
+    if model is Payment:
+        return {'pending_payments': int(status_of('status') == 'pending')}
+    if model is MaintenanceRequest:
+        return {'pending_maintenance': int(status_of('status') == 'pending')}
+    return {}
+
+TRACKED_ATTRIBUTES = {
+    Property: ('owner_id', 'availability_status'),
+    Lease: ('property_id', 'status', 'monthly_rent'),
+    Payment: ('lease_id', 'status'),
+    MaintenanceRequest: ('property_id', 'status'),
+}
+
+def _column_default(obj, attribute):
+    default = type(obj).__table__.c[attribute].default
+    return default.arg if default is not None and default.is_scalar else None
+
+def _state_values(obj, attributes, before):
+    """Attribute values as last committed (before=True) or as about to be flushed"""
+    state = inspect(obj)
+    values = {}
+    for attribute in attributes:
+        value = getattr(obj, attribute)
+        if before:
+            history = state.attrs[attribute].history
+            if history.deleted:
+                value = history.deleted[0]
+        elif value is None and not state.has_identity:
+            # New rows get column defaults (status='pending' etc.) only at INSERT
+            value = _column_default(obj, attribute)
+        values[attribute] = value
+    return values
+
+class _OwnerResolver:
+    """Maps property and lease ids to owner ids, batching lookups per flush"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.property_owners = {}
+        self.lease_owners = {}
+
+    def load(self, property_ids, lease_ids):
+        property_ids = {pid for pid in property_ids if pid is not None} - set(self.property_owners)
+        lease_ids = {lid for lid in lease_ids if lid is not None} - set(self.lease_owners)
+        if property_ids:
+            rows = self.connection.execute(select(Property.id, Property.owner_id)
+                                           .where(Property.id.in_(property_ids)))
+            self.property_owners.update(dict(rows.all()))
+        if lease_ids:
+            rows = self.connection.execute(select(Lease.id, Property.owner_id)
+                                           .join(Property, Lease.property_id == Property.id)
+                                           .where(Lease.id.in_(lease_ids)))
+            self.lease_owners.update(dict(rows.all()))
+
+    def owner_of(self, obj, values):
+        """Owner for a row state; pending related objects are followed through relationships"""
+        if isinstance(obj, Property):
+            return values['owner_id']
+        if isinstance(obj, Payment):
+            if values['lease_id'] is not None:
+                self.load((), {values['lease_id']})
+                return self.lease_owners.get(values['lease_id'])
+            lease = inspect(obj).dict.get('lease')
+            if lease is None:
+                return None
+            values = _state_values(lease, TRACKED_ATTRIBUTES[Lease], before=False)
+            obj = lease
+        if values['property_id'] is not None:
+            self.load({values['property_id']}, ())
+            return self.property_owners.get(values['property_id'])
+        property = inspect(obj).dict.get('property')
+        return property.owner_id if property is not None else None
+
+def _reassigned_owners(session, resolver):
+    """Owners on either side of a property changing owner or a lease changing property.
+
+    Those moves carry every dependent row's counters along, so the owners
+    involved are recomputed after the flush instead of patched with deltas.
+    """
+    owners, property_ids = set(), set()
+    for obj in session.dirty:
+        if isinstance(obj, Property):
+            history = inspect(obj).attrs.owner_id.history
+            if history.deleted:
+                owners.update(history.deleted)
+                owners.update(history.added)
+        elif isinstance(obj, Lease):
+            history = inspect(obj).attrs.property_id.history
+            if history.deleted:
+                property_ids.update(history.deleted)
+                property_ids.update(history.added)
+    resolver.load(property_ids, ())
+    owners.update(resolver.property_owners.get(pid) for pid in property_ids)
+    owners.discard(None)
+    return owners
+
+def affected_owners(connection, properties=None, tenants=None):
+    """Owners of the given properties and of the properties the given tenants lease or reported on.
+
+    `properties` and `tenants` are lists of ids or SELECTs of them.
+    """
+    queries = []
+    if properties is not None:
+        queries.append(select(Property.owner_id).where(Property.id.in_(properties)))
+    if tenants is not None:
+        queries.append(select(Property.owner_id).join(Lease, Lease.property_id == Property.id)
+                       .where(Lease.tenant_id.in_(tenants)))
+        queries.append(select(Property.owner_id)
+                       .join(MaintenanceRequest, MaintenanceRequest.property_id == Property.id)
+                       .where(MaintenanceRequest.tenant_id.in_(tenants)))
+    return set(connection.scalars(union(*queries))) if queries else set()
+
+def _cascading_owners(session, connection):
+    """Owners losing rows that the database deletes along with a deleted property, lease, tenant or user.
+
+    ON DELETE CASCADE removes those leases, payments and maintenance requests
+    without the session seeing them, so their owners are recomputed too.
+    """
+    owners, property_ids, tenant_ids, user_ids = set(), set(), set(), set()
+    for obj in session.deleted:
+        if isinstance(obj, Property):
+            owners.add(_state_values(obj, ('owner_id',), before=True)['owner_id'])
+        elif isinstance(obj, Lease):
+            property_ids.add(_state_values(obj, ('property_id',), before=True)['property_id'])
+        elif isinstance(obj, Tenant):
+            tenant_ids.add(obj.id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+    if tenant_ids or user_ids:
+        tenants = select(Tenant.id).where(or_(Tenant.id.in_(tenant_ids), Tenant.user_id.in_(user_ids)))
+        owners |= affected_owners(connection, tenants=tenants)
+    if property_ids:
+        owners |= affected_owners(connection, properties=property_ids)
+    owners.discard(None)
+    return owners
+
+def _collect_deltas(session, resolver):
+    """Per-owner counter deltas for everything the pending flush will write"""
+    changes = []
+    for objects, before, after in ((session.new, False, True),
+                                   (session.dirty, True, True),
+                                   (session.deleted, True, False)):
+        for obj in objects:
+            attributes = TRACKED_ATTRIBUTES.get(type(obj))
+            if attributes is None:
+                continue
+            if before:
+                changes.append((obj, -1, _state_values(obj, attributes, before=True)))
+            if after:
+                changes.append((obj, 1, _state_values(obj, attributes, before=False)))
+    if not changes:
+        return {}
+
+    resolver.load({values.get('property_id') for _, _, values in changes},
+                  {values.get('lease_id') for _, _, values in changes})
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for obj, sign, values in changes:
+        owner_id = resolver.owner_of(obj, values)
+        if owner_id is None:
+            continue
+        for field, amount in contribution(type(obj), values).items():
+            deltas[owner_id][field] += sign * amount
+    deltas = {owner_id: {field: amount for field, amount in counters.items() if amount}
+              for owner_id, counters in deltas.items()}
+    return {owner_id: counters for owner_id, counters in deltas.items() if counters}
+
+def _write_summary(connection, owner_id, summary, now):
+    result = connection.execute(update(PortfolioSummary)
+                                .where(PortfolioSummary.owner_id == owner_id)
+                                .values(updated_at=now, **summary))
+    if result.rowcount == 0:
+        connection.execute(insert(PortfolioSummary).values(owner_id=owner_id, updated_at=now, **summary))
+
+def _apply_flush_deltas(session, flush_context, instances):
+    """before_flush hook: fold this flush's changes into portfolio_summaries"""
+    if not any(isinstance(obj, tuple(TRACKED_ATTRIBUTES))
+               for obj in (*session.new, *session.dirty, *session.deleted)) \
+            and not any(isinstance(obj, (Tenant, User)) for obj in session.deleted):
+        return
+    connection = session.connection()
+    resolver = _OwnerResolver(connection)
+    recompute = _reassigned_owners(session, resolver) | _cascading_owners(session, connection)
+    if recompute:
+        session.info.setdefault('portfolio_recompute', set()).update(recompute)
+    deltas = _collect_deltas(session, resolver)
+    apply_deltas(connection, {owner_id: counters for owner_id, counters in deltas.items()
+                              if owner_id not in recompute})
+
+def apply_deltas(connection, deltas):
+    """Add {owner_id: {field: amount}} to portfolio_summaries on `connection`.
+
+    Bulk writers that bypass the session (executemany inserts, UPDATE ... WHERE)
+    call this with the counters they changed, before their source rows are written.
+    """
+    now = datetime.utcnow()
+    for owner_id, counters in deltas.items():
+        if not counters:
+            continue
+        values = {field: getattr(PortfolioSummary, field) + amount for field, amount in counters.items()}
+        result = connection.execute(update(PortfolioSummary)
+                                    .where(PortfolioSummary.owner_id == owner_id)
+                                    .values(updated_at=now, **values))
+        if result.rowcount == 0:
+            # First write for this owner: seed from the (still pre-flush) source tables
+            summary = compute_summaries(connection, owner_id).get(owner_id, _empty_summary())
+            for field, amount in counters.items():
+                summary[field] += amount
+            connection.execute(insert(PortfolioSummary).values(owner_id=owner_id, updated_at=now, **summary))
+
+def recompute_owners(connection, owner_ids):
+    """Rewrite the summaries of `owner_ids` from the source tables"""
+    now = datetime.utcnow()
+    for owner_id in owner_ids:
+        summary = compute_summaries(connection, owner_id).get(owner_id, _empty_summary())
+        _write_summary(connection, owner_id, summary, now)
+
+def _recompute_reassigned(session, flush_context):
+    """after_flush hook: recompute owners whose properties or leases changed hands or were cascaded away"""
+    owners = session.info.pop('portfolio_recompute', None)
+    if not owners:
+        return
+    # A deleted owner's summary went with it
+    owners -= {obj.id for obj in session.deleted if isinstance(obj, User)}
+    recompute_owners(session.connection(), owners)
+
+def init_app(app):
+    """Keep portfolio_summaries in step with ORM writes"""
+    if not event.contains(Session, 'before_flush', _apply_flush_deltas):
+        event.listen(Session, 'before_flush', _apply_flush_deltas)
+        event.listen(Session, 'after_flush', _recompute_reassigned)
@@ -0,0 +1,50 @@
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in testing mode when a view issues more SQL statements than allowed"""
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_statement_count = g.get('sql_statement_count', 0) + 1
+
+def query_budget(limit):
+    """Cap the number of SQL statements the decorated view may issue"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+def _check_budget(response):
+    view = current_app.view_functions.get(request.endpoint)
+    limit = getattr(view, 'query_budget', None) or current_app.config.get('QUERY_BUDGET')
+    count = g.get('sql_statement_count', 0)
+    if limit and count > limit:
+        message = f'{request.endpoint} issued {count} SQL statements (budget {limit})'
+        if current_app.testing:
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+@contextmanager
+def count_queries():
+    """Count statements issued inside the block: `with count_queries() as counter: ...; counter['count']`"""
+    counter = {'count': 0}
+
+    def increment(*args):
+        counter['count'] += 1
+
+    event.listen(Engine, 'before_cursor_execute', increment)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, 'before_cursor_execute', increment)
+
+def init_app(app):
+    """Count statements per request and enforce view budgets when QUERY_BUDGET_ENABLED is set"""
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+    if app.config.get('QUERY_BUDGET_ENABLED'):
+        app.after_request(_check_budget)
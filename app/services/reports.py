@@ -0,0 +1,257 @@
+"""Financial reports computed in SQL: aged receivables, rent roll and collection rate.
+
+Each report is one or two grouped queries over payments; the database does
+the aggregation and only the summary rows reach Python. Payments are placed
+in the month they fall due: `billed` is the rent due in a month, `collected`
+the part of it with status paid.
+
+Results are cached per owner scope and parameters for REPORT_CACHE_TTL
+seconds. The keys carry a version stored under cache.reports_key, which the
+cache invalidation hooks drop on every write to the owner's portfolio, so
+a new payment shows up on the next request rather than after the TTL.
+"""
+from flask import current_app
+from sqlalchemy import case, func, null
+from datetime import date, timedelta
+import uuid
+
+from app import db
+from app.models import User, Property, Lease, Payment
+from app.services.cache import cached, get_cache, reports_key
+from app.services.scoping import owned_lease_ids
+
+REPORT_ROWS = 100
+ROLLING_MONTHS = 12
+# (label, oldest day past due, newest day past due)
+AGING_BUCKETS = (('0-30', 30, 0), ('31-60', 60, 31), ('61-90', 90, 61), ('90+', None, 91))
+GROUPS = ('property', 'owner', 'city')
+UNPAID = ('pending', 'overdue')
+
+# Months
+
+def _month_column(column):
+    """`column` formatted as YYYY-MM in the database's own dialect"""
+    dialect = db.session.get_bind(mapper=Payment.__mapper__).dialect.name
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(column, '%Y-%m')
+    return func.substr(column, 1, 7)  # SQLite stores dates as YYYY-MM-DD text
+
+def parse_month(value):
+    """First day of a YYYY-MM month, or None for blank and malformed values"""
+    try:
+        year, month = (int(part) for part in (value or '').split('-'))
+        return date(year, month, 1)
+    except ValueError:
+        return None
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def month_range(start, end):
+    """YYYY-MM labels from the month of `start` through the month of `end`"""
+    months, month = [], start.replace(day=1)
+    while month <= end:
+        months.append(month.strftime('%Y-%m'))
+        month = add_months(month, 1)
+    return months
+
+def default_period(today=None):
+    """The last twelve months, the current one included"""
+    this_month = (today or date.today()).replace(day=1)
+    return add_months(this_month, -11), this_month
+
+# Shared building blocks
+
+def _billed():
+    return func.sum(Payment.amount)
+
+def _collected():
+    return func.sum(case((Payment.status == 'paid', Payment.amount), else_=0))
+
+def _payments(owner_id, *columns):
+    """Query over payments, limited to leases on the owner's properties"""
+    query = db.session.query(*columns).select_from(Payment)
+    if owner_id is not None:
+        query = query.filter(Payment.lease_id.in_(owned_lease_ids(owner_id)))
+    return query
+
+def _by_lease(owner_id, measures, criteria, month=None):
+    """Stage one: `measures` per lease (and month), summed from the payments index alone.
+
+    Grouping by lease first keeps the joins to leases and properties down to
+    one row per lease instead of one per payment.
+    """
+    keys = [Payment.lease_id.label('lease_id')] + ([month.label('month')] if month is not None else [])
+    query = _payments(owner_id, *keys, *(measure.label(name) for name, measure in measures.items()))
+    return query.filter(*criteria).group_by(*(key.element for key in keys)).subquery()
+
+def _group_columns(group):
+    """(key, label, detail) identifying a report group"""
+    if group == 'property':
+        return Property.id, Property.address, Property.city
+    if group == 'owner':
+        return User.id, User.username, User.email
+    if group == 'city':
+        return Property.city, Property.city, None
+    raise ValueError(f'group must be one of {GROUPS}, not {group!r}')
+
+def _rollup(leases, group, names, month=False):
+    """Stage two: the per-lease sums added up per group (and month), labelled"""
+    key, label, detail = _group_columns(group)
+    columns = [key.label('key'), label.label('label'), (null() if detail is None else detail).label('detail')]
+    if month:
+        columns.append(leases.c.month)
+    query = (db.session.query(*columns, *(func.sum(leases.c[name]).label(name) for name in names))
+             .select_from(leases)
+             .join(Lease, Lease.id == leases.c.lease_id)
+             .join(Property, Property.id == Lease.property_id))
+    if group == 'owner':
+        query = query.join(User, User.id == Property.owner_id)
+    grouping = [column for column in (key, label, detail) if column is not None]
+    return query.group_by(*grouping, *([leases.c.month] if month else []))
+
+def _with_totals(query, leases, names):
+    """Add the number of groups and each measure's total over all groups, before any LIMIT"""
+    return query.add_columns(func.count().over().label('groups'),
+                             *(func.sum(func.sum(leases.c[name])).over().label(f'all_{name}') for name in names))
+
+def cached_report(owner_id, name, params, factory):
+    """Cache `factory()` under the owner scope's current report version"""
+    cache = get_cache()
+    if cache is None:
+        return factory()
+    ttl = current_app.config['REPORT_CACHE_TTL']
+    version = cache.get(reports_key(owner_id))
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        cache.set(reports_key(owner_id), version, ttl)
+    key = ':'.join([reports_key(owner_id), version, name, *(str(param) for param in params)])
+    return cached(key, factory, ttl)
+
+# Reports
+
+def aged_receivables(owner_id=None, group='property', as_of=None, limit=REPORT_ROWS):
+    """Unpaid rent by days past due, in AGING_BUCKETS; the `limit` groups owing most come first"""
+    as_of = as_of or date.today()
+    _group_columns(group)
+
+    def build():
+        measures = {}
+        for label, oldest, newest in AGING_BUCKETS:
+            condition = Payment.due_date <= as_of - timedelta(days=newest)
+            if oldest is not None:
+                condition &= Payment.due_date >= as_of - timedelta(days=oldest)
+            measures[label] = func.sum(case((condition, Payment.amount), else_=0))
+        measures['total'] = _billed()
+        leases = _by_lease(owner_id, measures, (Payment.status.in_(UNPAID), Payment.due_date <= as_of))
+        query = _with_totals(_rollup(leases, group, measures), leases, measures)
+        rows = query.order_by(func.sum(leases.c.total).desc(), 'key').limit(limit).all()
+
+        first = rows[0]._mapping if rows else {}
+        return {
+            'as_of': as_of.isoformat(),
+            'buckets': [label for label, _, _ in AGING_BUCKETS],
+            'rows': [{'key': row.key, 'label': row.label, 'detail': row.detail,
+                      **{name: float(row._mapping[name]) for name in measures}} for row in rows],
+            'totals': {name: float(first.get(f'all_{name}') or 0) for name in measures},
+            'groups': first.get('groups', 0),
+        }
+    return cached_report(owner_id, 'aged', (group, as_of, limit), build)
+
+def collection_series(owner_id=None, start=None, end=None):
+    """Billed and collected rent per month from `start` to `end` (first days of months).
+
+    `rolling_rate` is the collection rate over the ROLLING_MONTHS months up to
+    each month, computed with a window function over the monthly totals.
+    """
+    if start is None or end is None:
+        start, end = default_period()
+
+    def build():
+        month = _month_column(Payment.due_date)
+        on_time = func.sum(case(((Payment.status == 'paid') & (Payment.paid_date <= Payment.due_date),
+                                 Payment.amount), else_=0))
+        # Earlier months feed the first rolling windows and are dropped afterwards
+        since = add_months(start, 1 - ROLLING_MONTHS)
+        monthly = (_payments(owner_id, month.label('month'), _billed().label('billed'),
+                             _collected().label('collected'), on_time.label('on_time'))
+                   .filter(Payment.due_date >= since, Payment.due_date < add_months(end, 1))
+                   .group_by(month)
+                   .subquery())
+        window = {'order_by': monthly.c.month, 'rows': (1 - ROLLING_MONTHS, 0)}
+        rows = db.session.query(
+            monthly,
+            func.sum(monthly.c.billed).over(**window).label('rolling_billed'),
+            func.sum(monthly.c.collected).over(**window).label('rolling_collected'),
+        ).order_by(monthly.c.month)
+
+        found = {row.month: row for row in rows}
+        series = []
+        for label in month_range(start, end):
+            row = found.get(label)
+            billed, collected = (float(row.billed), float(row.collected)) if row else (0.0, 0.0)
+            series.append({
+                'month': label,
+                'billed': billed,
+                'collected': collected,
+                'outstanding': billed - collected,
+                'rate': collected / billed if billed else None,
+                'on_time_rate': float(row.on_time) / billed if billed else None,
+                # Months without payments have no row and so no window of their own
+                'rolling_rate': (float(row.rolling_collected) / float(row.rolling_billed)
+                                 if row and row.rolling_billed else None),
+            })
+        return series
+    return cached_report(owner_id, 'collection', (start, end), build)
+
+def rent_roll(owner_id=None, group='property', start=None, end=None, limit=REPORT_ROWS):
+    """Rent billed vs collected per group over the period, largest rent rolls first, with monthly totals"""
+    if start is None or end is None:
+        start, end = default_period()
+    _group_columns(group)
+
+    def build():
+        measures = {'billed': _billed(), 'collected': _collected()}
+        criteria = (Payment.due_date >= start, Payment.due_date < add_months(end, 1))
+        leases = _by_lease(owner_id, measures, criteria)
+        query = _with_totals(_rollup(leases, group, measures), leases, measures)
+        rows = query.order_by(func.sum(leases.c.billed).desc(), 'key').limit(limit).all()
+        result = []
+        for row in rows:
+            billed, collected = float(row.billed), float(row.collected)
+            result.append({'key': row.key, 'label': row.label, 'detail': row.detail, 'billed': billed,
+                           'collected': collected, 'outstanding': billed - collected,
+                           'rate': collected / billed if billed else None})
+        return {'rows': result, 'groups': rows[0].groups if rows else 0}
+
+    months = collection_series(owner_id, start, end)
+    billed = sum(month['billed'] for month in months)
+    collected = sum(month['collected'] for month in months)
+    return {
+        'start': start.strftime('%Y-%m'),
+        'end': end.strftime('%Y-%m'),
+        **cached_report(owner_id, 'rent_roll', (group, start, end, limit), build),
+        'months': months,
+        'totals': {'billed': billed, 'collected': collected, 'outstanding': billed - collected,
+                   'rate': collected / billed if billed else None},
+    }
+
+def rent_roll_export(owner_id=None, group='property', start=None, end=None):
+    """(query, columns) with one row per group and month, for export.export_response to stream"""
+    if start is None or end is None:
+        start, end = default_period()
+    measures = {'billed': _billed(), 'collected': _collected()}
+    criteria = (Payment.due_date >= start, Payment.due_date < add_months(end, 1))
+    leases = _by_lease(owner_id, measures, criteria, month=_month_column(Payment.due_date))
+    key, label, detail = _group_columns(group)
+    query = _rollup(leases, group, measures, month=True).order_by(key, leases.c.month)
+    billed, collected = func.sum(leases.c.billed), func.sum(leases.c.collected)
+    names = {'property': ('property_id', 'address', 'city'), 'owner': ('owner_id', 'owner', 'owner_email'),
+             'city': ('city',)}[group]
+    columns = list(zip(names, (key, label, detail)))
+    columns += [('month', leases.c.month), ('billed', billed), ('collected', collected),
+                ('outstanding', billed - collected)]
+    return query, columns
@@ -0,0 +1,163 @@
+from flask import current_app
+from app import db
+from app.models import JobLock, JobRun
+from app.services.database import write_transactions
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import atexit
+import json
+import os
+import socket
+import time
+import uuid
+
+LOCK_TTL = timedelta(minutes=30)
+
+# Locking
+
+def _holder_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+def acquire_lock(name, holder, ttl=LOCK_TTL):
+    """Take the named lock unless another holder has it and it has not expired.
+
+    The lock is a row in job_locks claimed with a conditional UPDATE, so it
+    works across gunicorn workers and hosts sharing the database. The TTL
+    frees it if the holder dies mid-run.
+    """
+    now = datetime.utcnow()
+    try:
+        db.session.execute(insert(JobLock).values(name=name))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    result = db.session.execute(update(JobLock)
+                                .where(JobLock.name == name,
+                                       or_(JobLock.locked_until.is_(None), JobLock.locked_until < now))
+                                .values(holder=holder, locked_until=now + ttl))
+    db.session.commit()
+    return result.rowcount == 1
+
+def release_lock(name, holder):
+    db.session.execute(update(JobLock)
+                       .where(JobLock.name == name, JobLock.holder == holder)
+                       .values(holder=None, locked_until=None))
+    db.session.commit()
+
+# Running jobs
+
+def run_job(name, job, *args, **kwargs):
+    """Run `job` under the named lock and record it in job_runs.
+
+    `job` returns the number of rows it created or changed, or a dict of counts
+    per step (stored in details, summed into rows_affected). Returns the JobRun,
+    or None when another worker holds the lock. Its transactions take the
+    SQLite write lock up front (see database.write_transactions).
+    """
+    # End the deferred transaction of a has_*() pre-check, so the next one starts IMMEDIATE
+    db.session.commit()
+    with write_transactions():
+        holder = _holder_id()
+        if not acquire_lock(name, holder):
+            current_app.logger.info(f'{name}: skipped, another worker holds the lock')
+            return None
+
+        run = JobRun(job_name=name, status='running', started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+        started = time.perf_counter()
+        try:
+            result = job(*args, **kwargs)
+            if isinstance(result, dict):
+                run.details = json.dumps(result)
+                result = sum(result.values())
+            run.rows_affected = result
+            run.status = 'success'
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception(f'{name} failed')
+            run.status = 'failed'
+            run.error = str(e)
+        finally:
+            run.finished_at = datetime.utcnow()
+            run.duration_ms = (time.perf_counter() - started) * 1000
+            db.session.commit()
+            release_lock(name, holder)
+        current_app.logger.info(f'{name}: {run.status}, {run.rows_affected or 0} row(s) in {run.duration_ms:.0f} ms')
+        return run
+
+def generate_invoices_job():
+    """Scheduled entry point for invoice generation"""
+    from app.services.invoicing import generate_invoices
+    lead_days = current_app.config.get('INVOICE_LEAD_DAYS', 7)
+    return run_job('generate_invoices', generate_invoices, lead_days=lead_days)
+
+def deliver_email_job():
+    """Scheduled entry point for draining the email outbox"""
+    from app.services.outbox import deliver_outbox, has_due_email
+    if not has_due_email():
+        return None
+    return run_job('deliver_email', deliver_outbox)
+
+def process_images_job():
+    """Scheduled entry point for rendering newly uploaded photos"""
+    from app.services.images import has_pending_images, process_pending_images
+    if not has_pending_images():
+        return None
+    return run_job('process_images', process_pending_images)
+
+def collect_images_job():
+    """Scheduled entry point for removing unused photo files"""
+    from app.services.images import collect_garbage
+    return run_job('collect_images', collect_garbage)
+
+def remove_files_job():
+    """Scheduled entry point for removing the files of deleted rows"""
+    from app.services.deletion import has_queued_files, remove_files
+    if not has_queued_files():
+        return None
+    return run_job('remove_files', remove_files)
+
+def sweep_job():
+    """Scheduled entry point for the nightly status sweep"""
+    from app.services.sweeper import sweep
+    notice_days = current_app.config.get('LEASE_EXPIRY_NOTICE_DAYS', 30)
+    return run_job('sweep', sweep, notice_days=notice_days)
+
+# Job name -> (function, APScheduler trigger arguments from config)
+JOBS = {
+    'sweep': (sweep_job, lambda config: {'trigger': 'cron', 'hour': config.get('SWEEP_SCHEDULE_HOUR', 0)}),
+    'generate_invoices': (generate_invoices_job,
+                          lambda config: {'trigger': 'cron', 'hour': config.get('INVOICE_SCHEDULE_HOUR', 1)}),
+    'deliver_email': (deliver_email_job,
+                      lambda config: {'trigger': 'interval', 'seconds': config.get('MAIL_OUTBOX_INTERVAL', 30)}),
+    'process_images': (process_images_job,
+                       lambda config: {'trigger': 'interval', 'seconds': config.get('IMAGE_WORKER_INTERVAL', 10)}),
+    'collect_images': (collect_images_job,
+                       lambda config: {'trigger': 'cron', 'hour': config.get('IMAGE_GC_SCHEDULE_HOUR', 3)}),
+    'remove_files': (remove_files_job,
+                     lambda config: {'trigger': 'interval', 'seconds': config.get('FILE_REMOVAL_INTERVAL', 60)}),
+}
+
+def _run_in_app_context(app, job):
+    with app.app_context():
+        job()
+
+def init_app(app):
+    """Start the background scheduler when SCHEDULER_ENABLED is set.
+
+    Every gunicorn worker starts one; the job lock makes sure each run happens
+    in a single worker. Jobs run in the scheduler's thread, outside requests.
+    """
+    if not app.config.get('SCHEDULER_ENABLED') or app.testing:
+        return
+    from apscheduler.schedulers.background import BackgroundScheduler
+    scheduler = BackgroundScheduler(timezone='UTC')
+    for name, (job, trigger) in JOBS.items():
+        scheduler.add_job(_run_in_app_context, args=(app, job), id=name,
+                          coalesce=True, max_instances=1, misfire_grace_time=3600,
+                          **trigger(app.config))
+    scheduler.start()
+    app.extensions['scheduler'] = scheduler
+    atexit.register(lambda: scheduler.shutdown(wait=False))
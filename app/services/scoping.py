@@ -0,0 +1,32 @@
+from flask_login import current_user
+from app import db
+from app.models import Property, Lease
+
+def current_owner_id():
+    """Owner id to scope the logged-in user's queries by (None for admins)"""
+    return None if current_user.role == 'admin' else current_user.id
+
+def owned_property_ids(owner_id):
+    """Subquery selecting the ids of an owner's properties"""
+    return db.select(Property.id).where(Property.owner_id == owner_id)
+
+def owned_lease_ids(owner_id):
+    """Subquery selecting the ids of leases on an owner's properties"""
+    return db.select(Lease.id).where(Lease.property_id.in_(owned_property_ids(owner_id)))
+
+def scope_to_owner(query, property_column, owner_id):
+    """Restrict `query` to rows whose `property_column` belongs to the owner.
+
+    Ownership is applied as an IN (subquery) inside the same statement, so no
+    property rows are loaded and no bound-parameter list grows with the
+    portfolio. owner_id=None (admins) leaves the query unrestricted.
+    """
+    if owner_id is None:
+        return query
+    return query.filter(property_column.in_(owned_property_ids(owner_id)))
+
+def property_query(owner_id):
+    """Property query limited to the owner's properties (all properties for owner_id=None)"""
+    if owner_id is None:
+        return Property.query
+    return Property.query.filter_by(owner_id=owner_id)
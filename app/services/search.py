@@ -0,0 +1,285 @@
+"""Full-text search over properties, tenants and maintenance requests.
+
+On SQLite with FTS5 every searchable row has a document in the
+`search_index` virtual table. Triggers on the source tables keep it in sync,
+so ORM writes, bulk imports and cascaded deletes are all covered without
+Python-side bookkeeping. The rowid encodes the source row as
+(kind code << 40) + id, so each kind is a contiguous rowid range, and the
+`owners` column holds one `o<owner id>` token per owner the row belongs to;
+both scopes are applied inside the full-text query rather than after it.
+
+Other engines, or SQLite builds without FTS5, fall back to LIKE queries on
+the source tables.
+"""
+from app import db
+from app.models import Lease, MaintenanceRequest, Property, Tenant, User
+from sqlalchemy import and_, event, func, literal, or_, select, text, true, union_all
+from sqlalchemy.exc import OperationalError
+from collections import namedtuple
+import re
+
+# Kind -> rowid code; typeahead lists newest rowids first, so properties lead
+KINDS = {'property': 3, 'tenant': 2, 'maintenance': 1}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+KIND_SHIFT = 40
+ID_MASK = (1 << KIND_SHIFT) - 1
+# Prefix lengths FTS5 keeps a dedicated index for; longer prefixes are
+# answered by merging every matching term's doclist, which is slower
+PREFIX_LENGTHS = (2, 3, 4, 5, 6)
+MAX_TERMS = 8
+TERM = re.compile(r'\w+')
+
+SearchResult = namedtuple('SearchResult', 'kind id label detail')
+
+# One SELECT per kind producing (rowid, owners, title, body, label, detail);
+# {where} restricts it to the source ids being refreshed
+DOCUMENTS = {
+    'property': """
+        SELECT p.id + {offset}, 'o' || p.owner_id,
+               p.address || ' ' || p.city || ' ' || p.state, coalesce(p.description, ''),
+               p.address, p.city || ', ' || p.state
+        FROM properties p {where}""",
+    'tenant': """
+        SELECT t.id + {offset},
+               coalesce((SELECT group_concat(DISTINCT 'o' || p.owner_id)
+                         FROM leases l JOIN properties p ON p.id = l.property_id
+                         WHERE l.tenant_id = t.id), ''),
+               u.username || ' ' || u.email, t.national_id || ' ' || coalesce(t.occupation, ''),
+               u.username, u.email
+        FROM tenants t JOIN users u ON u.id = t.user_id {where}""",
+    'maintenance': """
+        SELECT m.id + {offset}, coalesce('o' || p.owner_id, ''),
+               m.request_type, m.description,
+               m.request_type, coalesce(p.address, '')
+        FROM maintenance_requests m LEFT JOIN properties p ON p.id = m.property_id {where}""",
+}
+DOCUMENT_ALIASES = {'property': 'p', 'tenant': 't', 'maintenance': 'm'}
+
+# (trigger suffix, table, event, WHEN condition, [(kind, SELECT of affected ids AS ref)])
+TRIGGERS = [
+    ('properties_insert', 'properties', 'INSERT', None, [('property', 'SELECT NEW.id AS ref')]),
+    ('properties_update', 'properties', 'UPDATE OF address, city, state, description, owner_id', None, [
+        ('property', 'SELECT NEW.id AS ref'),
+        ('maintenance', 'SELECT id AS ref FROM maintenance_requests WHERE property_id = NEW.id'),
+    ]),
+    ('properties_owner', 'properties', 'UPDATE OF owner_id', 'NEW.owner_id IS NOT OLD.owner_id', [
+        ('tenant', 'SELECT tenant_id AS ref FROM leases WHERE property_id = NEW.id'),
+    ]),
+    ('properties_delete', 'properties', 'DELETE', None, [('property', 'SELECT OLD.id AS ref')]),
+    ('tenants_insert', 'tenants', 'INSERT', None, [('tenant', 'SELECT NEW.id AS ref')]),
+    ('tenants_update', 'tenants', 'UPDATE OF user_id, national_id, occupation', None,
+     [('tenant', 'SELECT NEW.id AS ref')]),
+    ('tenants_delete', 'tenants', 'DELETE', None, [('tenant', 'SELECT OLD.id AS ref')]),
+    ('users_update', 'users', 'UPDATE OF username, email', None,
+     [('tenant', 'SELECT id AS ref FROM tenants WHERE user_id = NEW.id')]),
+    ('leases_insert', 'leases', 'INSERT', None, [('tenant', 'SELECT NEW.tenant_id AS ref')]),
+    ('leases_update', 'leases', 'UPDATE OF tenant_id, property_id', None,
+     [('tenant', 'SELECT NEW.tenant_id AS ref UNION SELECT OLD.tenant_id')]),
+    ('leases_delete', 'leases', 'DELETE', None, [('tenant', 'SELECT OLD.tenant_id AS ref')]),
+    ('maintenance_insert', 'maintenance_requests', 'INSERT', None, [('maintenance', 'SELECT NEW.id AS ref')]),
+    ('maintenance_update', 'maintenance_requests', 'UPDATE OF request_type, description, property_id', None,
+     [('maintenance', 'SELECT NEW.id AS ref')]),
+    ('maintenance_delete', 'maintenance_requests', 'DELETE', None, [('maintenance', 'SELECT OLD.id AS ref')]),
+]
+
+# Engine URL -> whether search_index exists, checked once per process
+_index_ready = {}
+
+# Index maintenance
+
+def _offset(kind):
+    return KINDS[kind] << KIND_SHIFT
+
+def _insert_documents(kind, where=''):
+    return (f'INSERT INTO search_index(rowid, owners, title, body, label, detail)'
+            f'{DOCUMENTS[kind].format(offset=_offset(kind), where=where)}')
+
+def _refresh(kind, ids):
+    """Statements replacing the documents of the `kind` rows selected by `ids`"""
+    alias = DOCUMENT_ALIASES[kind]
+    return [
+        f'DELETE FROM search_index WHERE rowid IN (SELECT ref + {_offset(kind)} FROM ({ids}))',
+        _insert_documents(kind, f'WHERE {alias}.id IN (SELECT ref FROM ({ids}))'),
+    ]
+
+def _trigger_ddl(suffix, table, trigger_event, condition, refreshes):
+    statements = [statement for kind, ids in refreshes for statement in _refresh(kind, ids)]
+    when = f' WHEN {condition}' if condition else ''
+    body = ';\n    '.join(statements)
+    return f'CREATE TRIGGER search_{suffix} AFTER {trigger_event} ON {table}{when}\nBEGIN\n    {body};\nEND'
+
+def fts_supported(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        connection.exec_driver_sql('CREATE VIRTUAL TABLE temp.search_probe USING fts5(x)')
+        connection.exec_driver_sql('DROP TABLE temp.search_probe')
+        return True
+    except OperationalError:
+        return False
+
+def drop_triggers(connection):
+    for suffix, *_ in TRIGGERS:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS search_{suffix}')
+
+def create_triggers(connection):
+    """(Re)create the triggers keeping search_index in step with the source tables"""
+    drop_triggers(connection)
+    for suffix, *definition in TRIGGERS:
+        connection.exec_driver_sql(_trigger_ddl(suffix, *definition))
+
+def create_index(connection):
+    """Create (or recreate) search_index and its triggers and fill it from the source tables.
+
+    Returns the number of documents indexed, or None when FTS5 is unavailable.
+    """
+    if not fts_supported(connection):
+        return None
+    connection.exec_driver_sql('DROP TABLE IF EXISTS search_index')
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "owners, title, body, label UNINDEXED, detail UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', "
+        f"prefix = '{' '.join(map(str, PREFIX_LENGTHS))}')")
+    create_triggers(connection)
+    for kind in KINDS:
+        connection.exec_driver_sql(_insert_documents(kind))
+    connection.exec_driver_sql("INSERT INTO search_index(search_index) VALUES ('optimize')")
+    _index_ready[str(connection.engine.url)] = True
+    return connection.exec_driver_sql('SELECT count(*) FROM search_index').scalar()
+
+def rebuild_index():
+    """Rebuild the index in its own transaction; see create_index"""
+    with db.engine.begin() as connection:
+        return create_index(connection)
+
+def _create_for_new_database(target, connection, tables=(), **kwargs):
+    # Existing databases get the index from `flask upgrade-db` instead, so a
+    # large backfill never runs while the app starts
+    if any(table.name == 'properties' for table in tables):
+        create_index(connection)
+
+def index_ready():
+    key = str(db.engine.url)
+    if key not in _index_ready:
+        with db.engine.connect() as connection:
+            _index_ready[key] = connection.dialect.name == 'sqlite' and connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'search_index'").first() is not None
+    return _index_ready[key]
+
+def init_app(app):
+    if not event.contains(db.metadata, 'after_create', _create_for_new_database):
+        event.listen(db.metadata, 'after_create', _create_for_new_database)
+
+# Queries
+
+def terms(query_text):
+    return TERM.findall((query_text or '').lower())[:MAX_TERMS]
+
+def _match_expression(words, owner_id, prefixes):
+    """FTS5 query matching `words` in title or body; `prefixes` words may be prefixes"""
+    phrases = ' '.join('"{}"{}'.format(word.replace('"', '""'), '*' if index in prefixes else '')
+                       for index, word in enumerate(words))
+    expression = f'{{title body}} : ({phrases})'
+    if owner_id is not None:
+        expression = f'owners : o{int(owner_id)} AND {expression}'
+    return expression
+
+def _fts_results(words, owner_id, kind, limit, offset, ranked, prefixes, before=None):
+    # Ranking weighs title matches (names, addresses) ten times body matches;
+    # typeahead skips it and stops at the first `limit` matches, newest first
+    order = 'bm25(search_index, 0.0, 10.0, 1.0)' if ranked else 'rowid DESC'
+    low, high = (_offset(kind), _offset(kind) + ID_MASK) if kind else (0, (max(KINDS.values()) + 1) << KIND_SHIFT)
+    if before is not None:
+        high = min(high, _offset(kind) + before - 1)
+    rows = db.session.execute(
+        text(f'SELECT rowid, label, detail FROM search_index '
+             f'WHERE search_index MATCH :match AND rowid BETWEEN :low AND :high '
+             f'ORDER BY {order} LIMIT :limit OFFSET :offset'),
+        {'match': _match_expression(words, owner_id, prefixes), 'low': low, 'high': high,
+         'limit': limit, 'offset': offset})
+    return [SearchResult(KIND_NAMES[rowid >> KIND_SHIFT], rowid & ID_MASK, label, detail)
+            for rowid, label, detail in rows]
+
+def _matches_every_word(columns, words):
+    return and_(true(), *[or_(*[func.lower(column).contains(word, autoescape=True) for column in columns])
+                  for word in words])
+
+def _fallback_results(words, owner_id, kind, limit, offset, before=None):
+    """Substring matching on the source tables, for engines without FTS5"""
+    owned = select(Property.id).where(Property.owner_id == owner_id)
+    selects = {
+        'property': select(literal('property').label('kind'), Property.id, Property.address.label('label'),
+                           (Property.city + ', ' + Property.state).label('detail'))
+        .where(_matches_every_word([Property.address, Property.city, Property.state, Property.description], words),
+               *([Property.owner_id == owner_id] if owner_id is not None else [])),
+        'tenant': select(literal('tenant').label('kind'), Tenant.id, User.username.label('label'),
+                         User.email.label('detail'))
+        .join(User, User.id == Tenant.user_id)
+        .where(_matches_every_word([User.username, User.email, Tenant.national_id, Tenant.occupation], words),
+               *([Tenant.id.in_(select(Lease.tenant_id).where(Lease.property_id.in_(owned)))]
+                 if owner_id is not None else [])),
+        'maintenance': select(literal('maintenance').label('kind'), MaintenanceRequest.id,
+                              MaintenanceRequest.request_type.label('label'), Property.address.label('detail'))
+        .join(Property, Property.id == MaintenanceRequest.property_id)
+        .where(_matches_every_word([MaintenanceRequest.request_type, MaintenanceRequest.description], words),
+               *([Property.owner_id == owner_id] if owner_id is not None else [])),
+    }
+    if kind:
+        # A single kind reads its primary key index backwards instead of sorting
+        combined = selects[kind].subquery()
+        order = [combined.c.id.desc()]
+    else:
+        combined = union_all(*selects.values()).subquery()
+        order = [combined.c.kind.desc(), combined.c.id.desc()]
+    query = select(combined).order_by(*order).limit(limit).offset(offset)
+    if before is not None:
+        query = query.where(combined.c.id < before)
+    rows = db.session.execute(query)
+    return [SearchResult(*row) for row in rows]
+
+def search(query_text, owner_id=None, kind=None, limit=20, offset=0):
+    """Ranked results matching every word of `query_text` as a prefix.
+
+    `owner_id` limits results to that owner's properties, their maintenance
+    requests and the tenants leasing them (None for admins); `kind` limits
+    them to one of KINDS.
+    """
+    words = terms(query_text)
+    if not words:
+        return []
+    if index_ready():
+        return _fts_results(words, owner_id, kind, limit, offset, True, set(range(len(words))))
+    return _fallback_results(words, owner_id, kind, limit, offset)
+
+def typeahead(query_text, owner_id=None, kind=None, limit=8, before=None):
+    """Suggestions while typing, newest first: earlier words must be complete
+    and the last one is a prefix, ignored while shorter than two characters.
+
+    With a `kind`, `before` continues a previous page below that id.
+    """
+    words = terms(query_text)
+    if words and len(words[-1]) < PREFIX_LENGTHS[0]:
+        words.pop()
+    if not words:
+        return []
+    if not index_ready():
+        return _fallback_results(words, owner_id, kind, limit, 0, before)
+    last = {len(words) - 1}
+    if len(words[-1]) <= PREFIX_LENGTHS[-1]:
+        return _fts_results(words, owner_id, kind, limit, 0, False, last, before)
+    # Beyond the prefix index a prefix query merges every matching term's
+    # doclist; a finished word is found far cheaper as an exact term
+    results = _fts_results(words, owner_id, kind, limit, 0, False, set(), before)
+    if len(results) < limit:
+        found = {(result.kind, result.id) for result in results}
+        results += [result for result in _fts_results(words, owner_id, kind, limit, 0, False, last, before)
+                    if (result.kind, result.id) not in found][:limit - len(results)]
+    return results
+
+def lookup(kind, query_text, owner_id=None, limit=10, before=None):
+    """One page of `kind` rows for a form picker, newest first, continuing
+    below id `before`; a blank query lists every row in scope"""
+    if terms(query_text):
+        return typeahead(query_text, owner_id, kind, limit, before)
+    return _fallback_results([], owner_id, kind, limit, 0, before)
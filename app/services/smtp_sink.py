@@ -0,0 +1,78 @@
+"""A minimal SMTP server that accepts every message and keeps it in memory.
+
+Stands in for a real mail server in development and tests:
+
+    flask --app run smtp-sink --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false flask --app run mail-worker
+"""
+from email import message_from_bytes
+import socketserver
+import threading
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data in iter(self.rfile.readline, b''):
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                self.server.deliver(sender, recipients, b''.join(lines))
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Collects messages in `messages`; `on_message(message)` is called for each one"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='localhost', port=1025, on_message=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.on_message = on_message
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+    def deliver(self, sender, recipients, data):
+        message = message_from_bytes(data)
+        self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def start(self):
+        """Serve in a background thread (for tests); returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,160 @@
+from app import db
+from app.models import Lease, Payment, Property, Tenant
+from app.services import cache, notifications, portfolio
+from sqlalchemy import exists, or_, select, update
+from collections import defaultdict
+from datetime import date, timedelta
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_NOTICE_DAYS = 30
+
+def _has_active_lease():
+    return exists().where(Lease.property_id == Property.id, Lease.status == 'active')
+
+def _sweep(candidates, apply_batch, batch_size, landing=False, notify_batch=None):
+    """Run one status transition in batches until no candidate rows are left.
+
+    `candidates` selects (id, owner_id, ...) of rows still needing the change;
+    `apply_batch(rows)` returns the portfolio deltas and the guarded UPDATE for
+    those rows, and `notify_batch(rows)`, if given, records notifications in the
+    same transaction. Each batch is its own short transaction, so locks are held
+    briefly and the work per statement stays bounded however many rows match.
+
+    A row another writer changed between the SELECT and the UPDATE fails the
+    UPDATE's guard. When the UPDATE changes fewer rows than were selected, the
+    batch's owners are recomputed from the source tables instead of trusting
+    the deltas; where the database has UPDATE ... RETURNING, only the rows it
+    changed are notified about.
+    """
+    changed = 0
+    while True:
+        rows = db.session.execute(candidates.limit(batch_size)).all()
+        if not rows:
+            return changed
+        fetched = len(rows)
+        deltas, statement = apply_batch(rows)
+        statement = statement.execution_options(synchronize_session=False)
+        connection = db.session.connection()
+        portfolio.apply_deltas(connection, deltas)
+        if connection.dialect.update_returning:
+            updated = set(db.session.scalars(statement.returning(statement.table.c.id)))
+            rows = [row for row in rows if row.id in updated]
+            count = len(rows)
+        else:
+            count = db.session.execute(statement).rowcount
+        if count < fetched:
+            portfolio.recompute_owners(connection, set(deltas))
+        if notify_batch and rows:
+            notify_batch(rows)
+        db.session.commit()
+        cache.invalidate(deltas, landing=landing)
+        changed += count
+        if fetched < batch_size:
+            return changed
+
+def expire_leases(today, batch_size=DEFAULT_BATCH_SIZE):
+    """active -> expired for leases whose end_date has passed"""
+    candidates = (select(Lease.id, Property.owner_id, Lease.monthly_rent)
+                  .join(Property, Lease.property_id == Property.id)
+                  .where(Lease.status == 'active', Lease.end_date < today))
+
+    def apply_batch(rows):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for _, owner_id, rent in rows:
+            deltas[owner_id]['active_leases'] -= 1
+            deltas[owner_id]['total_rent'] -= rent or 0
+        return deltas, (update(Lease)
+                        .where(Lease.id.in_([row.id for row in rows]), Lease.status == 'active')
+                        .values(status='expired'))
+    return _sweep(candidates, apply_batch, batch_size)
+
+def _set_availability(from_status, to_status, lease_condition, batch_size):
+    candidates = (select(Property.id, Property.owner_id)
+                  .where(Property.availability_status == from_status, lease_condition))
+
+    def apply_batch(rows):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for _, owner_id in rows:
+            deltas[owner_id][f'{from_status}_properties'] -= 1
+            deltas[owner_id][f'{to_status}_properties'] += 1
+        return deltas, (update(Property)
+                        .where(Property.id.in_([row.id for row in rows]),
+                               Property.availability_status == from_status)
+                        .values(availability_status=to_status))
+    return _sweep(candidates, apply_batch, batch_size, landing=True)
+
+def free_properties(batch_size=DEFAULT_BATCH_SIZE):
+    """occupied -> available for properties left without an active lease"""
+    return _set_availability('occupied', 'available', ~_has_active_lease(), batch_size)
+
+def occupy_properties(batch_size=DEFAULT_BATCH_SIZE):
+    """available -> occupied for properties that do have an active lease"""
+    return _set_availability('available', 'occupied', _has_active_lease(), batch_size)
+
+def mark_overdue_payments(today, batch_size=DEFAULT_BATCH_SIZE):
+    """pending -> overdue for payments whose due_date has passed"""
+    candidates = (select(Payment.id, Property.owner_id, Tenant.user_id.label('tenant_user_id'),
+                         Payment.amount, Payment.due_date, Property.address)
+                  .join(Lease, Payment.lease_id == Lease.id)
+                  .join(Property, Lease.property_id == Property.id)
+                  .join(Tenant, Lease.tenant_id == Tenant.id)
+                  .where(Payment.status == 'pending', Payment.due_date < today))
+
+    def apply_batch(rows):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            deltas[row.owner_id]['pending_payments'] -= 1
+        return deltas, (update(Payment)
+                        .where(Payment.id.in_([row.id for row in rows]), Payment.status == 'pending')
+                        .values(status='overdue'))
+
+    def notify_batch(rows):
+        recipients = []
+        for row in rows:
+            due = f'${row.amount:,.2f} due {row.due_date:%Y-%m-%d}'
+            recipients.append((row.owner_id, f'Payment of {due} for {row.address} is overdue.'))
+            recipients.append((row.tenant_user_id, f'Your rent payment of {due} for {row.address} is overdue.'))
+        notifications.notify('payment_overdue', recipients)
+    return _sweep(candidates, apply_batch, batch_size, notify_batch=notify_batch)
+
+def notify_expiring_leases(today, notice_days, batch_size=DEFAULT_BATCH_SIZE):
+    """Tell owner and tenant once about each active lease ending within `notice_days`.
+
+    expiry_notice_for remembers the end date that was announced, so reruns do
+    not repeat the notice and a renewed lease (new end date) gets a fresh one.
+    """
+    candidates = (select(Lease.id, Property.owner_id, Tenant.user_id.label('tenant_user_id'),
+                         Property.address, Lease.end_date)
+                  .join(Property, Lease.property_id == Property.id)
+                  .join(Tenant, Lease.tenant_id == Tenant.id)
+                  .where(Lease.status == 'active',
+                         Lease.end_date >= today, Lease.end_date <= today + timedelta(days=notice_days),
+                         or_(Lease.expiry_notice_for.is_(None), Lease.expiry_notice_for != Lease.end_date)))
+
+    def apply_batch(rows):
+        return {}, (update(Lease)
+                    .where(Lease.id.in_([row.id for row in rows]))
+                    .values(expiry_notice_for=Lease.end_date))
+
+    def notify_batch(rows):
+        recipients = []
+        for row in rows:
+            recipients.append((row.owner_id, f'The lease for {row.address} ends on {row.end_date:%Y-%m-%d}.'))
+            recipients.append((row.tenant_user_id, f'Your lease for {row.address} ends on {row.end_date:%Y-%m-%d}.'))
+        notifications.notify('lease_expiring', recipients)
+    return _sweep(candidates, apply_batch, batch_size, notify_batch=notify_batch)
+
+def sweep(today=None, batch_size=DEFAULT_BATCH_SIZE, notice_days=DEFAULT_NOTICE_DAYS):
+    """Apply the date-driven status transitions; returns how many rows each step changed.
+
+    Properties under maintenance are left alone; only occupied/available are
+    reconciled against whether the property has an active lease.
+    """
+    today = today or date.today()
+    return {
+        'leases_expiring': notify_expiring_leases(today, notice_days, batch_size),
+        'leases_expired': expire_leases(today, batch_size),
+        'properties_freed': free_properties(batch_size),
+        'properties_occupied': occupy_properties(batch_size),
+        'payments_overdue': mark_overdue_payments(today, batch_size),
+    }
@@ -0,0 +1,359 @@
+"""Generate CSS for the Tailwind utility classes the templates use.
+
+Covers the subset of Tailwind CSS v3 (MIT) that RentalHub's templates rely
+on, with the same class names and values, so the bundle can be built from
+the Python side without Node or network access. Class names it does not
+know are reported by `generate` instead of silently dropped.
+"""
+import re
+
+PALETTE = {
+    'gray': ['#f9fafb', '#f3f4f6', '#e5e7eb', '#d1d5db', '#9ca3af', '#6b7280', '#4b5563', '#374151', '#1f2937', '#111827'],
+    'red': ['#fef2f2', '#fee2e2', '#fecaca', '#fca5a5', '#f87171', '#ef4444', '#dc2626', '#b91c1c', '#991b1b', '#7f1d1d'],
+    'orange': ['#fff7ed', '#ffedd5', '#fed7aa', '#fdba74', '#fb923c', '#f97316', '#ea580c', '#c2410c', '#9a3412', '#7c2d12'],
+    'yellow': ['#fefce8', '#fef9c3', '#fef08a', '#fde047', '#facc15', '#eab308', '#ca8a04', '#a16207', '#854d0e', '#713f12'],
+    'green': ['#f0fdf4', '#dcfce7', '#bbf7d0', '#86efac', '#4ade80', '#22c55e', '#16a34a', '#15803d', '#166534', '#14532d'],
+    'blue': ['#eff6ff', '#dbeafe', '#bfdbfe', '#93c5fd', '#60a5fa', '#3b82f6', '#2563eb', '#1d4ed8', '#1e40af', '#1e3a8a'],
+    'indigo': ['#eef2ff', '#e0e7ff', '#c7d2fe', '#a5b4fc', '#818cf8', '#6366f1', '#4f46e5', '#4338ca', '#3730a3', '#312e81'],
+    'purple': ['#faf5ff', '#f3e8ff', '#e9d5ff', '#d8b4fe', '#c084fc', '#a855f7', '#9333ea', '#7e22ce', '#6b21a8', '#581c87'],
+}
+SHADES = ['50', '100', '200', '300', '400', '500', '600', '700', '800', '900']
+COLORS = {f'{name}-{shade}': hex_value
+          for name, values in PALETTE.items() for shade, hex_value in zip(SHADES, values)}
+COLORS.update({'white': '#ffffff', 'black': '#000000'})
+
+SCREENS = {'sm': 640, 'md': 768, 'lg': 1024, 'xl': 1280}
+STATES = {'hover': ':hover', 'focus': ':focus'}
+
+FONT_SIZES = {
+    'xs': ('0.75rem', '1rem'), 'sm': ('0.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'),
+    'lg': ('1.125rem', '1.75rem'), 'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'),
+    '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'), '5xl': ('3rem', '1'),
+    '6xl': ('3.75rem', '1'), '7xl': ('4.5rem', '1'), '8xl': ('6rem', '1'), '9xl': ('8rem', '1'),
+}
+MAX_WIDTHS = {
+    'xs': '20rem', 'sm': '24rem', 'md': '28rem', 'lg': '32rem', 'xl': '36rem', '2xl': '42rem',
+    '3xl': '48rem', '4xl': '56rem', '5xl': '64rem', '6xl': '72rem', '7xl': '80rem', 'full': '100%',
+}
+SHADOWS = {
+    'shadow-sm': '0 1px 2px 0 rgb(0 0 0 / 0.05)',
+    'shadow': '0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)',
+    'shadow-md': '0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)',
+    'shadow-lg': '0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)',
+    'shadow-xl': '0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)',
+    'shadow-2xl': '0 25px 50px -12px rgb(0 0 0 / 0.25)',
+}
+GRADIENT_DIRECTIONS = {'t': 'top', 'tr': 'top right', 'r': 'right', 'br': 'bottom right',
+                       'b': 'bottom', 'bl': 'bottom left', 'l': 'left', 'tl': 'top left'}
+
+# Prefixes of utility families; unresolved candidates with one are reported
+UTILITY_LIKE = re.compile(r'-?(bg|text|border|divide|from|via|to|ring|shadow|rounded|font|leading|tracking'
+                          r'|w|h|min-w|min-h|max-w|max-h|m[xytrbl]?|p[xytrbl]?|gap|space-[xy]|grid-cols|col-span'
+                          r'|z|opacity|top|right|bottom|left|inset)-[\w.]+$')
+
+# Selector suffix for utilities that style the children between siblings
+BETWEEN_CHILDREN = ' > :not([hidden]) ~ :not([hidden])'
+
+def _spacing(value):
+    if value == '0':
+        return '0px'
+    if value == 'px':
+        return '1px'
+    return f'{float(value) * 0.25:g}rem'
+
+def _rgb(hex_value):
+    return ' '.join(str(int(hex_value[i:i + 2], 16)) for i in (1, 3, 5))
+
+SPACING = r'(px|\d+(?:\.5)?)'
+SPACING_SIDES = {
+    '': ('{}',), 'x': ('{}-left', '{}-right'), 'y': ('{}-top', '{}-bottom'),
+    't': ('{}-top',), 'r': ('{}-right',), 'b': ('{}-bottom',), 'l': ('{}-left',),
+}
+
+STATIC = {
+    'layout': {
+        'static': 'position:static', 'fixed': 'position:fixed', 'absolute': 'position:absolute',
+        'relative': 'position:relative', 'sticky': 'position:sticky', 'inset-0': 'inset:0px',
+    },
+    'display': {
+        'block': 'display:block', 'inline-block': 'display:inline-block', 'inline': 'display:inline',
+        'flex': 'display:flex', 'inline-flex': 'display:inline-flex', 'grid': 'display:grid',
+        'table': 'display:table', 'hidden': 'display:none',
+    },
+    'sizing': {
+        'w-full': 'width:100%', 'w-auto': 'width:auto', 'h-full': 'height:100%', 'h-screen': 'height:100vh',
+        'min-h-screen': 'min-height:100vh', 'min-w-full': 'min-width:100%',
+    },
+    'flexbox': {
+        'flex-1': 'flex:1 1 0%', 'flex-auto': 'flex:1 1 auto', 'flex-none': 'flex:none',
+        'flex-shrink-0': 'flex-shrink:0', 'flex-grow': 'flex-grow:1',
+        'flex-row': 'flex-direction:row', 'flex-col': 'flex-direction:column', 'flex-wrap': 'flex-wrap:wrap',
+        'items-start': 'align-items:flex-start', 'items-end': 'align-items:flex-end',
+        'items-center': 'align-items:center', 'items-baseline': 'align-items:baseline',
+        'justify-start': 'justify-content:flex-start', 'justify-end': 'justify-content:flex-end',
+        'justify-center': 'justify-content:center', 'justify-between': 'justify-content:space-between',
+    },
+    'overflow': {
+        'overflow-hidden': 'overflow:hidden', 'overflow-auto': 'overflow:auto',
+        'overflow-x-auto': 'overflow-x:auto', 'overflow-y-auto': 'overflow-y:auto',
+        'whitespace-nowrap': 'white-space:nowrap', 'truncate': 'overflow:hidden;text-overflow:ellipsis;white-space:nowrap',
+    },
+    'borders': {
+        'rounded-none': 'border-radius:0px', 'rounded-sm': 'border-radius:0.125rem', 'rounded': 'border-radius:0.25rem',
+        'rounded-md': 'border-radius:0.375rem', 'rounded-lg': 'border-radius:0.5rem', 'rounded-xl': 'border-radius:0.75rem',
+        'rounded-2xl': 'border-radius:1rem', 'rounded-full': 'border-radius:9999px',
+        'border-0': 'border-width:0px', 'border': 'border-width:1px', 'border-2': 'border-width:2px',
+        'border-4': 'border-width:4px', 'border-t': 'border-top-width:1px', 'border-b': 'border-bottom-width:1px',
+        'border-l': 'border-left-width:1px', 'border-r': 'border-right-width:1px',
+        'border-solid': 'border-style:solid', 'border-dashed': 'border-style:dashed',
+        'border-transparent': 'border-color:transparent',
+    },
+    'typography': {
+        'text-left': 'text-align:left', 'text-center': 'text-align:center', 'text-right': 'text-align:right',
+        'font-sans': 'font-family:Inter,ui-sans-serif,system-ui,-apple-system,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
+        'font-mono': 'font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace',
+        'font-light': 'font-weight:300', 'font-normal': 'font-weight:400', 'font-medium': 'font-weight:500',
+        'font-semibold': 'font-weight:600', 'font-bold': 'font-weight:700',
+        'uppercase': 'text-transform:uppercase', 'lowercase': 'text-transform:lowercase', 'capitalize': 'text-transform:capitalize',
+        'italic': 'font-style:italic', 'underline': 'text-decoration-line:underline',
+        'leading-none': 'line-height:1', 'leading-tight': 'line-height:1.25', 'leading-normal': 'line-height:1.5',
+        'leading-relaxed': 'line-height:1.625', 'tracking-wide': 'letter-spacing:0.025em',
+        'tracking-wider': 'letter-spacing:0.05em',
+    },
+    'effects': {
+        'transition': 'transition-property:color,background-color,border-color,text-decoration-color,fill,stroke,'
+                      'opacity,box-shadow,transform,filter,backdrop-filter;'
+                      'transition-timing-function:cubic-bezier(0.4,0,0.2,1);transition-duration:150ms',
+        'outline-none': 'outline:2px solid transparent;outline-offset:2px',
+        'cursor-pointer': 'cursor:pointer',
+    },
+}
+
+def _static(group):
+    table = STATIC[group]
+    return lambda utility: table.get(utility)
+
+def _spacing_utility(prefixes, negative=False):
+    """m-4, mx-auto, -top-2, ... for the given property prefixes"""
+    pattern = re.compile(rf'(-?)({prefixes})-({SPACING}|auto)$')
+
+    def rule(utility):
+        match = pattern.match(utility)
+        if not match or (match.group(1) and not negative):
+            return None
+        sign, name, value = match.group(1), match.group(2), match.group(3)
+        value = 'auto' if value == 'auto' else f'{sign}{_spacing(value)}' if value != '0' else '0px'
+        if name in ('top', 'right', 'bottom', 'left'):
+            return f'{name}:{value}'
+        prop = {'m': 'margin', 'p': 'padding'}[name[0]]
+        return ';'.join(template.format(prop) + f':{value}' for template in SPACING_SIDES[name[1:]])
+    return rule
+
+def _sizing(utility):
+    match = re.match(rf'(w|h|min-h|max-h)-{SPACING}$', utility)
+    if match:
+        prop = {'w': 'width', 'h': 'height', 'min-h': 'min-height', 'max-h': 'max-height'}[match.group(1)]
+        return f'{prop}:{_spacing(match.group(2))}'
+    match = re.match(r'max-w-(\w+)$', utility)
+    if match and match.group(1) in MAX_WIDTHS:
+        return f'max-width:{MAX_WIDTHS[match.group(1)]}'
+    return None
+
+def _grid(utility):
+    match = re.match(r'grid-cols-(\d+)$', utility)
+    if match:
+        return f'grid-template-columns:repeat({match.group(1)},minmax(0,1fr))'
+    match = re.match(r'col-span-(\d+)$', utility)
+    if match:
+        return f'grid-column:span {match.group(1)} / span {match.group(1)}'
+    match = re.match(rf'gap-{SPACING}$', utility)
+    if match:
+        return f'gap:{_spacing(match.group(1))}'
+    return None
+
+def _z_index(utility):
+    match = re.match(r'z-(\d+)$', utility)
+    return f'z-index:{match.group(1)}' if match else None
+
+def _between_children(utility):
+    """space-x-4, space-y-2, divide-y, divide-gray-200: returns (declarations, selector suffix)"""
+    match = re.match(rf'space-(x|y)-{SPACING}$', utility)
+    if match:
+        side = 'left' if match.group(1) == 'x' else 'top'
+        return f'margin-{side}:{_spacing(match.group(2))}', BETWEEN_CHILDREN
+    if utility == 'divide-y':
+        return 'border-top-width:1px;border-bottom-width:0px', BETWEEN_CHILDREN
+    if utility == 'divide-x':
+        return 'border-left-width:1px;border-right-width:0px', BETWEEN_CHILDREN
+    match = re.match(r'divide-(.+)$', utility)
+    if match and match.group(1) in COLORS:
+        return f'border-color:{COLORS[match.group(1)]}', BETWEEN_CHILDREN
+    return None
+
+def _color(prefix, prop, opacity_var=None):
+    def rule(utility):
+        if not utility.startswith(prefix + '-'):
+            return None
+        color = COLORS.get(utility[len(prefix) + 1:])
+        if color is None:
+            return None
+        if opacity_var:
+            return f'{opacity_var}:1;{prop}:rgb({_rgb(color)} / var({opacity_var}))'
+        return f'{prop}:{color}'
+    return rule
+
+def _opacity(utility):
+    match = re.match(r'(bg-opacity|opacity)-(\d+)$', utility)
+    if not match:
+        return None
+    value = f'{int(match.group(2)) / 100:g}'
+    return f'--tw-bg-opacity:{value}' if match.group(1) == 'bg-opacity' else f'opacity:{value}'
+
+def _gradient(utility):
+    match = re.match(r'bg-gradient-to-(\w+)$', utility)
+    if match and match.group(1) in GRADIENT_DIRECTIONS:
+        return f'background-image:linear-gradient(to {GRADIENT_DIRECTIONS[match.group(1)]},var(--tw-gradient-stops))'
+    match = re.match(r'(from|via|to)-(.+)$', utility)
+    if not match or match.group(2) not in COLORS:
+        return None
+    color = COLORS[match.group(2)]
+    if match.group(1) == 'from':
+        return (f'--tw-gradient-from:{color};--tw-gradient-to:rgb({_rgb(color)} / 0);'
+                '--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)')
+    if match.group(1) == 'via':
+        return (f'--tw-gradient-to:rgb({_rgb(color)} / 0);'
+                f'--tw-gradient-stops:var(--tw-gradient-from),{color},var(--tw-gradient-to)')
+    return f'--tw-gradient-to:{color}'
+
+def _font_size(utility):
+    match = re.match(r'text-(\w+)$', utility)
+    if not match or match.group(1) not in FONT_SIZES:
+        return None
+    size, line_height = FONT_SIZES[match.group(1)]
+    return f'font-size:{size};line-height:{line_height}'
+
+def _line_height(utility):
+    match = re.match(r'leading-(\d+)$', utility)
+    return f'line-height:{_spacing(match.group(1))}' if match else None
+
+def _shadow(utility):
+    if utility not in SHADOWS:
+        return None
+    return (f'--tw-shadow:{SHADOWS[utility]};'
+            'box-shadow:var(--tw-ring-offset-shadow,0 0 #0000),var(--tw-ring-shadow,0 0 #0000),var(--tw-shadow)')
+
+def _ring(utility):
+    match = re.match(r'ring(?:-(\d+))?$', utility)
+    if match:
+        width = match.group(1) or '3'
+        return ('--tw-ring-offset-shadow:var(--tw-ring-inset,) 0 0 0 var(--tw-ring-offset-width,0px) '
+                'var(--tw-ring-offset-color,#fff);'
+                f'--tw-ring-shadow:var(--tw-ring-inset,) 0 0 0 calc({width}px + var(--tw-ring-offset-width,0px)) '
+                'var(--tw-ring-color,rgb(59 130 246 / 0.5));'
+                'box-shadow:var(--tw-ring-offset-shadow),var(--tw-ring-shadow),var(--tw-shadow,0 0 #0000)')
+    match = re.match(r'ring-(.+)$', utility)
+    if match and match.group(1) in COLORS:
+        return f'--tw-ring-color:{COLORS[match.group(1)]}'
+    return None
+
+# In Tailwind's order, so later utilities win where two apply to the same property
+PLUGINS = [
+    _static('layout'),
+    _spacing_utility('top|right|bottom|left', negative=True),
+    _z_index,
+    _grid,
+    _spacing_utility('m|mx|my', negative=True),
+    _spacing_utility('mt|mr|mb|ml', negative=True),
+    _static('display'),
+    _static('sizing'),
+    _sizing,
+    _static('flexbox'),
+    _between_children,
+    _static('overflow'),
+    _static('borders'),
+    _color('border', 'border-color', '--tw-border-opacity'),
+    _color('bg', 'background-color', '--tw-bg-opacity'),
+    _opacity,
+    _gradient,
+    _spacing_utility('p|px|py'),
+    _spacing_utility('pt|pr|pb|pl'),
+    _static('typography'),
+    _font_size,
+    _line_height,
+    _color('text', 'color', '--tw-text-opacity'),
+    _shadow,
+    _ring,
+    _static('effects'),
+]
+
+def _escape(class_name):
+    return re.sub(r'([^a-zA-Z0-9_-])', r'\\\1', class_name)
+
+def _resolve(utility):
+    """(plugin index, declarations, selector suffix) for a bare utility, or None"""
+    for index, plugin in enumerate(PLUGINS):
+        result = plugin(utility)
+        if result:
+            declarations, suffix = result if isinstance(result, tuple) else (result, '')
+            return index, declarations, suffix
+    return None
+
+def _split_variants(class_name):
+    *variants, utility = class_name.split(':')
+    screen = None
+    states = []
+    for variant in variants:
+        if variant in SCREENS and screen is None:
+            screen = variant
+        elif variant in STATES or variant == 'group-hover':
+            states.append(variant)
+        else:
+            return None
+    return screen, states, utility
+
+def _selector(class_name, states, suffix):
+    selector = '.' + _escape(class_name)
+    for state in states:
+        if state == 'group-hover':
+            selector = '.group:hover ' + selector
+        else:
+            selector += STATES[state]
+    return selector + suffix
+
+def generate(candidates):
+    """Return (css, unknown) for the candidate class names.
+
+    Candidates that are not utilities (custom classes, stray words) are
+    skipped; `unknown` lists the ones that look like utilities but are not
+    supported here, so the build can warn about them.
+    """
+    rules = []
+    unknown = set()
+    for candidate in set(candidates):
+        parsed = _split_variants(candidate)
+        if parsed is None:
+            continue
+        screen, states, utility = parsed
+        resolved = _resolve(utility)
+        if resolved is None:
+            if screen or states or UTILITY_LIKE.match(utility):
+                unknown.add(candidate)
+            continue
+        index, declarations, suffix = resolved
+        screen_order = list(SCREENS).index(screen) + 1 if screen else 0
+        rules.append(((screen_order, bool(states), index, candidate), screen,
+                      f'{_selector(candidate, states, suffix)}{{{declarations}}}'))
+
+    lines = []
+    current_screen = None
+    for _, screen, rule in sorted(rules):
+        if screen != current_screen:
+            if current_screen:
+                lines.append('}')
+            if screen:
+                lines.append(f'@media (min-width:{SCREENS[screen]}px){{')
+            current_screen = screen
+        lines.append(rule)
+    if current_screen:
+        lines.append('}')
+    return '\n'.join(lines) + '\n', sorted(unknown)
@@ -0,0 +1,59 @@
+"""Time the rent forecast projection on random lease arrays, without a database.
+
+    python benchmarks/forecast.py --leases 100000 --months 36
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.forecast import GROUPS, project, summarize
+from app.services.importer import PROPERTY_TYPES
+
+CITIES = np.array(['Lahore', 'Karachi', 'Islamabad', 'Rawalpindi', 'Faisalabad', 'Multan'], dtype=object)
+
+def random_units(leases, seed=42, today=None):
+    """Arrays shaped like forecast.load_units(): 95% leased units ending over the next two years"""
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    month = today.year * 12 + today.month - 1
+    leased = rng.random(leases) < 0.95
+    return {
+        'owner': rng.integers(1, max(leases // 100, 2), leases),
+        'city': rng.choice(CITIES, leases),
+        'property_type': rng.choice(np.array(PROPERTY_TYPES, dtype=object), leases),
+        'asking': rng.uniform(15000, 250000, leases).round(),
+        'start': month - rng.integers(0, 24, leases),
+        'end': month + rng.integers(-1, 24, leases),
+        'rent': np.where(leased, rng.uniform(15000, 250000, leases).round(), 0.0),
+        'leased': leased,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leases', type=int, default=100000)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    units = random_units(args.leases)
+    best = {}
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        projection = project(units, date.today(), args.months, renewal=0.7, downtime=2)
+        timings = {'project': time.perf_counter() - started}
+        for group in GROUPS:
+            started = time.perf_counter()
+            summarize(units, projection, group)
+            timings[f'summarize {group}'] = time.perf_counter() - started
+        best = {name: min(seconds, best.get(name, seconds)) for name, seconds in timings.items()}
+    print(f'{args.leases} leases x {args.months} months (best of {args.repeat})')
+    for name, seconds in best.items():
+        print(f'  {name:<26} {seconds * 1000:8.1f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Show how the model indexes change SQLite query plans on a large seeded database.
+
+Seeds a throwaway database (1M payments by default) with every secondary index
+dropped, runs EXPLAIN QUERY PLAN and times the hot route queries, then creates
+the declared indexes and runs them again.
+
+    python benchmarks/index_plans.py --payments 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+from config import Config
+from app import create_app, db
+from app.commands import create_missing_indexes
+from app.models import User, Property, Tenant, Lease, Payment, MaintenanceRequest
+
+TODAY = date.today()
+
+# Hot queries issued by the routes, as raw SQL so the plans are easy to read
+QUERIES = {
+    'owner properties by status': (
+        "SELECT count(*) FROM properties WHERE owner_id = :owner AND availability_status = 'available'", {}),
+    'owner active rent roll': (
+        "SELECT count(*), sum(monthly_rent) FROM leases WHERE status = 'active' AND property_id IN "
+        "(SELECT id FROM properties WHERE owner_id = :owner)", {}),
+    'owner pending payments': (
+        "SELECT count(*) FROM payments JOIN leases ON leases.id = payments.lease_id "
+        "WHERE payments.status = 'pending' AND leases.property_id IN "
+        "(SELECT id FROM properties WHERE owner_id = :owner)", {}),
+    'overdue candidates': (
+        "SELECT count(*) FROM payments WHERE status = 'pending' AND due_date < :today", {}),
+    'recent payments': (
+        "SELECT id FROM payments ORDER BY created_at DESC LIMIT 5", {}),
+    'expiring leases': (
+        "SELECT id FROM leases WHERE end_date >= :today AND end_date <= :horizon", {}),
+    'payments for a lease': (
+        "SELECT id, status FROM payments WHERE lease_id = :lease", {}),
+    'pending maintenance for a property': (
+        "SELECT count(*) FROM maintenance_requests WHERE property_id = :property AND status = 'pending'", {}),
+}
+
+def seed(payment_count, chunk=50000):
+    """Bulk insert a portfolio sized so that it holds `payment_count` payments"""
+    rng = random.Random(42)
+    lease_count = max(1, payment_count // 24)
+    property_count = lease_count
+    owner_count = max(1, property_count // 200)
+    now = datetime.utcnow()
+
+    db.session.execute(insert(User), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+         'role': 'owner' if i < owner_count else 'tenant', 'created_at': now}
+        for i in range(owner_count + lease_count)
+    ])
+    db.session.execute(insert(Property), [
+        {'owner_id': 2 + i % owner_count, 'property_type': 'apartment', 'address': f'{i} Main St',
+         'city': rng.choice(['Lahore', 'Karachi', 'Islamabad']), 'state': 'PB', 'rent_amount': 1000.0,
+         'availability_status': rng.choice(['available', 'occupied', 'occupied']), 'created_at': now}
+        for i in range(property_count)
+    ])
+    db.session.execute(insert(Tenant), [
+        {'user_id': 2 + owner_count + i, 'national_id': f'N{i}'} for i in range(lease_count)
+    ])
+    leases = []
+    for i in range(lease_count):
+        start = TODAY - timedelta(days=rng.randint(0, 3650))
+        leases.append({'property_id': 1 + i, 'tenant_id': 1 + i, 'start_date': start,
+                       'end_date': start + timedelta(days=365 * rng.randint(1, 3)),
+                       'monthly_rent': 1000.0, 'status': rng.choice(['active', 'active', 'expired']),
+                       'created_at': now})
+    db.session.execute(insert(Lease), leases)
+    db.session.execute(insert(MaintenanceRequest), [
+        {'property_id': 1 + rng.randrange(property_count), 'tenant_id': 1 + rng.randrange(lease_count),
+         'request_type': 'plumbing', 'description': 'leak', 'status': rng.choice(['pending', 'resolved']),
+         'created_at': now - timedelta(days=rng.randint(0, 3650))}
+        for _ in range(lease_count)
+    ])
+
+    rows = []
+    for i in range(payment_count):
+        lease = i % lease_count
+        due = leases[lease]['start_date'] + timedelta(days=30 * (i // lease_count))
+        rows.append({'lease_id': 1 + lease, 'amount': 1000.0, 'due_date': due,
+                     'status': 'paid' if due < TODAY - timedelta(days=60) else rng.choice(['paid', 'pending']),
+                     'created_at': datetime.combine(due, datetime.min.time())})
+        if len(rows) == chunk:
+            db.session.execute(insert(Payment), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Payment), rows)
+    db.session.commit()
+    return owner_count, lease_count, property_count
+
+def drop_secondary_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    db.session.commit()
+
+def measure(params, repeat=5):
+    results = {}
+    for name, (sql, extra) in QUERIES.items():
+        bound = {**params, **extra}
+        plan = [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), bound)]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(text(sql), bound).all()
+        results[name] = ((time.perf_counter() - started) / repeat * 1000, plan)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payments', type=int, default=1_000_000)
+    parser.add_argument('--keep', help='write the database to this path instead of a temp file')
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        drop_secondary_indexes()
+        started = time.perf_counter()
+        owners, leases, properties = seed(args.payments)
+        print(f'Seeded {args.payments:,} payments, {leases:,} leases, {owners:,} owners '
+              f'in {time.perf_counter() - started:.1f}s ({path})')
+
+        params = {'owner': 2, 'today': TODAY.isoformat(), 'horizon': (TODAY + timedelta(days=30)).isoformat(),
+                  'lease': leases // 2, 'property': properties // 2}
+        before = measure(params)
+
+        started = time.perf_counter()
+        create_missing_indexes()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        print(f'Created indexes in {time.perf_counter() - started:.1f}s\n')
+        after = measure(params)
+
+    for name in QUERIES:
+        (ms_before, plan_before), (ms_after, plan_after) = before[name], after[name]
+        print(f'{name}: {ms_before:.2f} ms -> {ms_after:.2f} ms')
+        print('  before: ' + ' | '.join(plan_before))
+        print('  after:  ' + ' | '.join(plan_after))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Time every GET route against a synthetic portfolio and compare with a baseline.
+
+Seeds a database with benchmarks/synthetic.py (or reuses --db), then requests
+each route as the admin, as one owner and, for public pages, anonymously.
+Per route it reports p50/p95/p99 latency, the SQL statement count (from the
+Server-Timing header) and the peak RSS of the process serving it.
+
+    --server test-client   requests go through Flask's test client in-process;
+                           latency is the app alone, RSS is this process
+    --server gunicorn      requests go over HTTP to one local gunicorn worker;
+                           RSS is that worker's high-water mark
+
+Peak RSS only grows, so a route that allocates shows up as a step in the
+column rather than in its own row alone.
+
+    python benchmarks/routes.py --size small --output benchmarks/baseline.json
+    python benchmarks/routes.py --size small --compare benchmarks/baseline.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import url_for
+from sqlalchemy import select
+from config import Config
+from app import create_app, db
+from app.models import User, Property, Tenant, Lease, Payment, MaintenanceRequest
+from synthetic import PASSWORD, SIZES, generate
+
+ADMIN = ('admin@rental.com', 'admin123')
+PUBLIC = {'main.index', 'auth.login', 'auth.register'}
+# Streams, logout, metrics and static files say nothing about page performance
+SKIP = {'static', 'assets.serve', 'auth.logout', 'notifications.stream', 'metrics.metrics'}
+QUERY = {
+    'search.search': {'q': 'canal road'},
+    'search.typeahead': {'q': 'gar'},
+    'search.lookup': {'q': 'ahm'},
+}
+ARGUMENTS = {'kind': 'properties', 'export_format': 'csv'}
+LOOKUP_KIND = 'property'
+# p95 must also grow by this much to count, so sub-millisecond jitter is not a regression
+MIN_DELTA_MS = 5.0
+STATEMENTS = re.compile(r'desc="(\d+) statements"')
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of `samples`"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def owner_ids(owner_id):
+    """One id of each model within `owner_id`'s portfolio, keyed by blueprint"""
+    lease = db.session.scalars(select(Lease).join(Property).where(Property.owner_id == owner_id)
+                               .order_by(Lease.id.desc())).first()
+    return {
+        'properties': lease.property_id,
+        'leases': lease.id,
+        'tenants': lease.tenant_id,
+        'payments': db.session.scalar(select(Payment.id).where(Payment.lease_id == lease.id)),
+        'maintenance': db.session.scalar(select(MaintenanceRequest.id).join(Property)
+                                         .where(Property.owner_id == owner_id)),
+    }
+
+def build_paths(app, ids):
+    """(endpoint, path) for every GET route worth timing"""
+    paths = []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.endpoint):
+            if rule.endpoint in SKIP or 'GET' not in rule.methods:
+                continue
+            values = {name: ARGUMENTS.get(name) for name in rule.arguments}
+            if 'id' in values:
+                values['id'] = ids[rule.endpoint.split('.')[0]]
+            if 'kind' in values and rule.endpoint == 'search.lookup':
+                values['kind'] = LOOKUP_KIND
+            paths.append((rule.endpoint, url_for(rule.endpoint, **values, **QUERY.get(rule.endpoint, {}))))
+    return paths
+
+class TestClient:
+    """Requests through the app in-process"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self, credentials):
+        client = self.app.test_client()
+        if credentials:
+            response = client.post('/auth/login', data={'email': credentials[0], 'password': credentials[1]})
+            assert response.status_code == 302, f'login failed for {credentials[0]}'
+
+        def get(path):
+            response = client.get(path)
+            response.get_data()
+            return response.status_code, response.headers.get('Server-Timing', '')
+        return get
+
+    def peak_rss_mb(self):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def close(self):
+        pass
+
+class Gunicorn:
+    """Requests over HTTP to a single gunicorn worker"""
+
+    def __init__(self, database_url):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self.base = f'http://127.0.0.1:{port}'
+        env = {**os.environ, 'DATABASE_URL': database_url, 'METRICS_ENABLED': 'true',
+               'SERVER_TIMING_ENABLED': 'true', 'SERVER_TIMING_PUBLIC': 'true', 'SCHEDULER_ENABLED': 'false'}
+        self.process = subprocess.Popen(
+            ['gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(self.base + '/auth/login').close()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.close()
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+
+    def session(self, credentials):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        if credentials:
+            data = urllib.parse.urlencode({'email': credentials[0], 'password': credentials[1]}).encode()
+            with opener.open(self.base + '/auth/login', data) as response:
+                assert not response.url.endswith('/auth/login'), f'login failed for {credentials[0]}'
+
+        def get(path):
+            try:
+                with opener.open(self.base + path) as response:
+                    response.read()
+                    return response.status, response.headers.get('Server-Timing', '')
+            except urllib.error.HTTPError as error:
+                return error.code, error.headers.get('Server-Timing', '')
+        return get
+
+    def peak_rss_mb(self):
+        children = open(f'/proc/{self.process.pid}/task/{self.process.pid}/children').read().split()
+        for line in open(f'/proc/{children[0]}/status'):
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+def time_route(get, path, warmup, iterations):
+    for _ in range(warmup):
+        get(path)
+    samples, statuses, statements = [], set(), 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        status, timing = get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        statuses.add(status)
+        match = STATEMENTS.search(timing)
+        statements = max(statements, int(match.group(1))) if match else statements
+    return samples, statuses, statements
+
+def run(server, paths, credentials, warmup, iterations):
+    results = {}
+    personas = {'admin': ADMIN, 'owner': credentials, 'anonymous': None}
+    for persona, login in personas.items():
+        get = server.session(login)
+        for endpoint, path in paths:
+            if (persona == 'anonymous') != (endpoint in PUBLIC):
+                continue
+            samples, statuses, statements = time_route(get, path, warmup, iterations)
+            results[f'{endpoint} [{persona}]'] = {
+                'path': path,
+                'status': sorted(statuses),
+                'p50_ms': round(percentile(samples, 0.50), 2),
+                'p95_ms': round(percentile(samples, 0.95), 2),
+                'p99_ms': round(percentile(samples, 0.99), 2),
+                'sql': statements,
+                'peak_rss_mb': round(server.peak_rss_mb(), 1),
+            }
+    return results
+
+def compare(baseline, current, tolerance):
+    """Routes whose status changed, whose p95 grew by more than `tolerance` or that issue more SQL"""
+    regressions = []
+    for name, result in current['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(f"{name}: HTTP {before['status']} -> {result['status']}")
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance) and result['p95_ms'] - before['p95_ms'] > MIN_DELTA_MS:
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result['sql'] > before['sql']:
+            regressions.append(f"{name}: SQL statements {before['sql']} -> {result['sql']}")
+    return regressions
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help='SQLite file to use; seeded first if it does not exist')
+    parser.add_argument('--server', choices=['test-client', 'gunicorn'], default='test-client')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--output', help='write the results as JSON, e.g. a new baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against; exits 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p95 growth (default 0.5 = 50%%)')
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(), 'routes.db'))
+    seeded = os.path.exists(path)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SCHEDULER_ENABLED = False
+        METRICS_ENABLED = True
+        SERVER_TIMING_ENABLED = True
+        SERVER_TIMING_PUBLIC = True  # the owner and anonymous sessions need the statement counts too
+
+    app = create_app(BenchConfig)
+    app.logger.setLevel(logging.CRITICAL)  # failing routes are reported in the table
+    with app.app_context():
+        if not seeded:
+            print(f'Seeding a {args.size} portfolio into {path}...', file=sys.stderr)
+            generate(*SIZES[args.size], seed=args.seed)
+        owner = db.session.scalars(select(User).where(User.role == 'owner').order_by(User.id)).first()
+        paths = build_paths(app, owner_ids(owner.id))
+        counts = {model.__tablename__: db.session.query(model).count()
+                  for model in (User, Property, Tenant, Lease, Payment, MaintenanceRequest)}
+        credentials = (owner.email, PASSWORD)
+
+    server = TestClient(app) if args.server == 'test-client' else Gunicorn(f'sqlite:///{path}')
+    try:
+        routes = run(server, paths, credentials, args.warmup, args.iterations)
+    finally:
+        server.close()
+
+    current = {
+        'meta': {'commit': commit(), 'created': datetime.utcnow().isoformat(timespec='seconds'),
+                 'size': None if seeded else args.size, 'counts': counts,
+                 'server': args.server, 'iterations': args.iterations},
+        'routes': routes,
+    }
+    print(f'{"route":48} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"SQL":>5} {"RSS MB":>7}')
+    for name, result in routes.items():
+        flag = '' if result['status'] == [200] else f"  HTTP {','.join(map(str, result['status']))}"
+        print(f"{name:48} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['sql']:>5} {result['peak_rss_mb']:>7.1f}{flag}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+            output.write('\n')
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), current, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.compare}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Compare SQLite write throughput and lock errors across engine profiles.
+
+Runs writer and reader processes (like gunicorn workers) against a throwaway
+database for each profile:
+
+    pysqlite defaults   rollback journal, pysqlite's implicit transactions
+    deferred BEGIN      the engine profile, but every transaction deferred
+    engine profile      WAL and pragmas from config, writers BEGIN IMMEDIATE
+
+Writers run a read-then-write transaction (what a form post does), readers
+a read-only one (a list page). The middle row shows why writers take the
+lock up front: a deferred transaction cannot wait for the lock once it has
+read, so it fails as soon as another writer gets there first.
+
+    python benchmarks/sqlite_concurrency.py --writers 8 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app.services.database import configure_engine, engine_options
+
+PROFILES = ['pysqlite defaults', 'deferred BEGIN', 'engine profile']
+
+def profile_config():
+    return {key: getattr(Config, key) for key in dir(Config) if key.startswith(('DB_', 'SQLITE_'))}
+
+def make_engine(url, profile, writer):
+    if profile == 'pysqlite defaults':
+        return create_engine(url)
+    config = profile_config()
+    engine = create_engine(url, **engine_options(config, url))
+    immediate = writer and profile == 'engine profile'
+    configure_engine(engine, {**config, 'SQLITE_TRANSACTION_MODE': 'immediate' if immediate else 'deferred'})
+    return engine
+
+def worker(url, profile, writer, seconds):
+    """Run transactions for `seconds`; returns (committed, lock errors)"""
+    engine = make_engine(url, profile, writer)
+    committed = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                value = connection.execute(text('SELECT value FROM counters WHERE id = 1')).scalar()
+                connection.execute(text('SELECT count(*), sum(value) FROM '
+                                        '(SELECT value FROM events ORDER BY id DESC LIMIT 500)')).one()
+                if writer:
+                    connection.execute(text('INSERT INTO events (value) VALUES (:value)'), [{'value': value}] * 20)
+                    connection.execute(text('UPDATE counters SET value = value + 1 WHERE id = 1'))
+            committed += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    return committed, errors
+
+def run(folder, profile, writers, readers, seconds):
+    url = f"sqlite:///{os.path.join(folder, profile.replace(' ', '_') + '.db')}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE counters (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)'))
+        connection.execute(text('CREATE TABLE events (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)'))
+        connection.execute(text('INSERT INTO counters (id, value) VALUES (1, 0)'))
+    engine.dispose()
+
+    with ProcessPoolExecutor(writers + readers) as pool:
+        futures = [pool.submit(worker, url, profile, index < writers, seconds) for index in range(writers + readers)]
+        outcomes = [future.result() for future in futures]
+    return (sum(committed for committed, _ in outcomes[:writers]) / seconds,
+            sum(committed for committed, _ in outcomes[writers:]) / seconds,
+            sum(errors for _, errors in outcomes))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{"profile":20} {"writes/s":>10} {"reads/s":>10} {"lock errors":>12}')
+    with tempfile.TemporaryDirectory() as folder:
+        for profile in PROFILES:
+            writes, reads, errors = run(folder, profile, args.writers, args.readers, args.seconds)
+            print(f'{profile:20} {writes:>10.1f} {reads:>10.1f} {errors:>12}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Seed a database with a realistic synthetic portfolio.
+
+Owners hold properties; each property has a history of consecutive leases
+(6 to 24 months, with vacant gaps) running up to today, a payment for every
+month of every lease and maintenance requests raised by its tenants. Rows go
+in with bulk inserts, so portfolio summaries are rebuilt at the end; the
+search index is kept by its triggers.
+
+Every generated user has the password `password`.
+
+    python benchmarks/synthetic.py --size medium --keep /tmp/medium.db
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+from config import Config
+from app import create_app, db
+from app.models import User, Property, Tenant, Lease, Payment, MaintenanceRequest
+from app.services.importer import PAYMENT_METHODS, PROPERTY_TYPES
+from app.services.portfolio import rebuild_summaries
+
+PASSWORD = 'password'
+
+# owners, properties, tenants, years of lease history
+SIZES = {
+    'small': (5, 200, 260, 3),
+    'medium': (50, 5000, 6500, 5),
+    'large': (500, 50000, 65000, 8),
+}
+
+CITIES = {'Lahore': 'PB', 'Karachi': 'SD', 'Islamabad': 'IS', 'Rawalpindi': 'PB', 'Faisalabad': 'PB',
+          'Multan': 'PB', 'Peshawar': 'KP', 'Quetta': 'BL'}
+STREETS = ['Canal', 'Mall', 'Garden', 'Park', 'Jinnah', 'Iqbal', 'Model Town', 'Gulberg', 'Clifton', 'Defence']
+FIRST_NAMES = ['ahmed', 'ali', 'sara', 'fatima', 'omar', 'zainab', 'bilal', 'ayesha', 'hassan', 'maryam',
+               'usman', 'hina', 'imran', 'sana', 'kamran', 'nadia']
+OCCUPATIONS = ['engineer', 'teacher', 'doctor', 'accountant', 'designer', 'student', 'nurse', 'developer']
+REQUEST_TYPES = ['plumbing', 'electrical', 'heating', 'appliance', 'painting', 'pest control', 'roofing']
+LEASE_MONTHS = [6, 12, 12, 12, 24]
+MAINTENANCE_PER_PROPERTY_YEAR = 1.5
+CHUNK = 10000
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[start:start + CHUNK])
+
+def generate(owners, properties, tenants, years, seed=42, today=None):
+    """Insert the portfolio and commit; returns the number of rows per table"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+    user_id, property_id, tenant_id = _next_id(User), _next_id(Property), _next_id(Tenant)
+    lease_id = _next_id(Lease)
+
+    users = [{'id': user_id + i, 'username': f'owner{user_id + i}', 'email': f'owner{user_id + i}@example.com',
+              'password_hash': password_hash, 'role': 'owner', 'created_at': now} for i in range(owners)]
+    owner_ids = [row['id'] for row in users]
+    tenant_rows = []
+    for i in range(tenants):
+        uid = user_id + owners + i
+        name = rng.choice(FIRST_NAMES)
+        users.append({'id': uid, 'username': f'{name}{uid}', 'email': f'{name}.{uid}@example.com',
+                      'password_hash': password_hash, 'role': 'tenant', 'phone': f'0300{uid:07d}', 'created_at': now})
+        tenant_rows.append({'id': tenant_id + i, 'user_id': uid, 'national_id': f'35202-{uid:07d}-{i % 10}',
+                            'occupation': rng.choice(OCCUPATIONS), 'emergency_contact': f'0321{uid:07d}'})
+
+    property_rows, lease_rows, payment_rows, request_rows = [], [], [], []
+    history_start = today - timedelta(days=365 * years)
+    for i in range(properties):
+        pid = property_id + i
+        city = rng.choice(list(CITIES))
+        rent = float(rng.randrange(25, 400) * 1000)
+        occupied = False
+        cursor = history_start + timedelta(days=rng.randint(0, 180))
+        while cursor <= today:
+            start = cursor.replace(day=1)
+            end = add_months(start, rng.choice(LEASE_MONTHS)) - timedelta(days=1)
+            status = 'active' if end >= today else rng.choices(['expired', 'terminated'], [19, 1])[0]
+            occupied = occupied or status == 'active'
+            tid = tenant_id + rng.randrange(tenants)
+            monthly_rent = round(rent * rng.uniform(0.9, 1.1), -2)
+            lease_rows.append({'id': lease_id, 'property_id': pid, 'tenant_id': tid, 'start_date': start,
+                               'end_date': end, 'monthly_rent': monthly_rent, 'security_deposit': monthly_rent * 2,
+                               'status': status, 'created_at': datetime.combine(start, datetime.min.time())})
+            period = start
+            while period <= min(end, today):
+                due = period + timedelta(days=4)
+                if due >= today - timedelta(days=5):
+                    paid = rng.random() < 0.3
+                else:
+                    paid = rng.random() < 0.97
+                payment_rows.append({
+                    'lease_id': lease_id, 'amount': monthly_rent, 'period': period, 'due_date': due,
+                    'status': 'paid' if paid else 'pending' if due >= today else 'overdue',
+                    'paid_date': due + timedelta(days=rng.randint(-3, 10)) if paid else None,
+                    'payment_method': rng.choice(PAYMENT_METHODS) if paid else None,
+                    'created_at': datetime.combine(period, datetime.min.time()),
+                })
+                period = add_months(period, 1)
+            lease_days = (min(end, today) - start).days
+            for _ in range(int(rng.random() + lease_days / 365 * MAINTENANCE_PER_PROPERTY_YEAR)):
+                created = datetime.combine(start + timedelta(days=rng.randint(0, max(lease_days, 0))),
+                                           datetime.min.time()) + timedelta(hours=rng.randint(8, 20))
+                resolved = created < now - timedelta(days=30) or rng.random() < 0.4
+                request_rows.append({
+                    'property_id': pid, 'tenant_id': tid, 'request_type': rng.choice(REQUEST_TYPES),
+                    'description': f'{rng.choice(REQUEST_TYPES).capitalize()} issue reported by the tenant.',
+                    'priority': rng.choices(['low', 'medium', 'high'], [3, 5, 2])[0],
+                    'status': 'resolved' if resolved else rng.choice(['pending', 'in_progress']),
+                    'created_at': created,
+                    'resolved_at': created + timedelta(days=rng.randint(1, 20)) if resolved else None,
+                })
+            lease_id += 1
+            cursor = end + timedelta(days=1 + rng.choice([0, 0, 0, 15, 30, 60]))
+        property_rows.append({
+            'id': pid, 'owner_id': owner_ids[i % owners], 'property_type': rng.choice(PROPERTY_TYPES),
+            'address': f'{rng.randint(1, 999)} {rng.choice(STREETS)} Road, Block {chr(65 + i % 26)}',
+            'city': city, 'state': CITIES[city], 'rent_amount': rent,
+            'availability_status': 'occupied' if occupied else 'available',
+            'bedrooms': rng.randint(1, 6), 'bathrooms': rng.randint(1, 4), 'area_sqft': float(rng.randrange(500, 5000, 50)),
+            'description': f'{rng.choice(["Bright", "Spacious", "Quiet", "Renovated"])} home near {rng.choice(STREETS)}.',
+            'created_at': datetime.combine(history_start, datetime.min.time()),
+        })
+
+    for model, rows in [(User, users), (Property, property_rows), (Tenant, tenant_rows), (Lease, lease_rows),
+                        (Payment, payment_rows), (MaintenanceRequest, request_rows)]:
+        _insert(model, rows)
+    db.session.commit()
+    rebuild_summaries()
+    return {'users': len(users), 'properties': len(property_rows), 'tenants': len(tenant_rows),
+            'leases': len(lease_rows), 'payments': len(payment_rows), 'maintenance_requests': len(request_rows)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', help='write the database to this path instead of a temp file')
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'synthetic.db')
+
+    class SeedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(SeedConfig)
+    with app.app_context():
+        started = time.perf_counter()
+        counts = generate(*SIZES[args.size], seed=args.seed)
+    print(', '.join(f'{count:,} {table}' for table, count in counts.items()) +
+          f' in {time.perf_counter() - started:.1f}s ({path})')
+
+if __name__ == '__main__':
+    main()
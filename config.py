@@ -6,18 +6,85 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///rental_management.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Database engine profile (app/services/database.py); pool settings apply to every engine
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)  # seconds; server databases only
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT') or 30000)  # ms; PostgreSQL only, 0 for none
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'  # durable in WAL mode except on power loss
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)  # ms to wait for the write lock
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or 64 * 1024)  # KiB of page cache per connection
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)  # bytes
+    SQLITE_TRANSACTION_MODE = os.environ.get('SQLITE_TRANSACTION_MODE') or 'auto'  # auto, deferred or immediate
+    
+    # Optional read replica: GET requests read from it, except for users who wrote within the staleness window
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_STALENESS_WINDOW = int(os.environ.get('REPLICA_STALENESS_WINDOW') or 5)  # seconds
+    
     # Upload settings
     UPLOAD_FOLDER = 'app/static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+    IMAGE_WORKER_INTERVAL = int(os.environ.get('IMAGE_WORKER_INTERVAL') or 10)  # seconds between scheduler runs
+    IMAGE_GC_SCHEDULE_HOUR = int(os.environ.get('IMAGE_GC_SCHEDULE_HOUR') or 3)  # UTC
+    FILE_REMOVAL_INTERVAL = int(os.environ.get('FILE_REMOVAL_INTERVAL') or 60)  # seconds between scheduler runs
+    
+    # Deleting a property, tenant, lease or user clears a history longer than this many rows in batches of it
+    DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE') or 5000)
     
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
-    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') or True
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true')
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'RentalHub <noreply@rentalhub.local>'
+    
+    # Outbox delivery: emails are queued in the database and sent in batches by the mail worker
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE') or 50)
+    MAIL_OUTBOX_INTERVAL = int(os.environ.get('MAIL_OUTBOX_INTERVAL') or 30)  # seconds between scheduler runs
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS') or 6)
+    
+    # Query budget: per-request SQL statement limits (raise in testing, log otherwise)
+    QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', '').lower() in ('1', 'true')
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET') or 0) or None
+    
+    # Per-request metrics: Prometheus text at /metrics (bearer METRICS_TOKEN or an admin login) and a Server-Timing
+    # header for admins and debug mode; SERVER_TIMING_PUBLIC sends it to everyone, e.g. for benchmarks
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true')
+    SERVER_TIMING_PUBLIC = os.environ.get('SERVER_TIMING_PUBLIC', '').lower() in ('1', 'true')
+    
+    # Cache for dashboard / landing statistics: 'memory' (per worker) or 'redis' (shared)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 60)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL') or 300)  # seconds; writes invalidate sooner
+    
+    # Rent forecast: months ahead, chance a tenant renews, months empty before re-letting, renewal term and rent rise
+    FORECAST_MONTHS = int(os.environ.get('FORECAST_MONTHS') or 36)
+    FORECAST_RENEWAL_PROBABILITY = float(os.environ.get('FORECAST_RENEWAL_PROBABILITY') or 0.7)
+    FORECAST_DOWNTIME_MONTHS = int(os.environ.get('FORECAST_DOWNTIME_MONTHS') or 2)
+    FORECAST_RENEWAL_TERM_MONTHS = int(os.environ.get('FORECAST_RENEWAL_TERM_MONTHS') or 12)
+    FORECAST_RENEWAL_UPLIFT = float(os.environ.get('FORECAST_RENEWAL_UPLIFT') or 0.03)
+    
+    # Background jobs (APScheduler): off by default; enable in the web workers or run them from cron via the CLI
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '').lower() in ('1', 'true')
+    SWEEP_SCHEDULE_HOUR = int(os.environ.get('SWEEP_SCHEDULE_HOUR') or 0)  # UTC
+    INVOICE_SCHEDULE_HOUR = int(os.environ.get('INVOICE_SCHEDULE_HOUR') or 1)  # UTC
+    INVOICE_LEAD_DAYS = int(os.environ.get('INVOICE_LEAD_DAYS') or 7)
+    LEASE_EXPIRY_NOTICE_DAYS = int(os.environ.get('LEASE_EXPIRY_NOTICE_DAYS') or 30)
+    
+    # Notifications: the unread badge polls a JSON count every NOTIFICATION_POLL_INTERVAL seconds. The
+    # server-sent events stream holds a worker per open tab, so only enable it with threaded or async workers
+    NOTIFICATION_POLL_INTERVAL = int(os.environ.get('NOTIFICATION_POLL_INTERVAL') or 30)
+    NOTIFICATION_STREAM_ENABLED = os.environ.get('NOTIFICATION_STREAM_ENABLED', '').lower() in ('1', 'true')
+    NOTIFICATION_STREAM_INTERVAL = int(os.environ.get('NOTIFICATION_STREAM_INTERVAL') or 5)
+    NOTIFICATION_STREAM_TIMEOUT = int(os.environ.get('NOTIFICATION_STREAM_TIMEOUT') or 55)
     
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)